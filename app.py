@@ -1,15 +1,26 @@
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, render_template, jsonify, request, Response, g
 import os
+import re
 import datetime
 import json
 import logging
 import threading
 import time
-import pandas as pd
-from io import BytesIO
 
 # 导入数据抓取模块
-from scraper import get_data, cache_data, load_cached_data
+from scraper import get_data, cache_data, load_cached_data, get_refresh_stats, last_sources, fetch_board_stocks
+import snapshot
+import sse
+import history_store
+import leader
+import metrics
+import exports
+import search_index
+import scheduler
+import fetch_cache
+import source_health
+import intraday
+from cloud_storage import get_cache_dir, atomic_write
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
@@ -18,120 +29,440 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# 全局变量保存缓存数据和最后更新时间
+# 全局变量保存缓存数据、预先序列化的快照和最后更新时间
 cached_data = None
+current_snapshot = None
 last_update = None
+# 从主进程共享快照中读到的附加信息（刷新统计等）
+shared_meta = None
 
-def update_cache():
-    """后台任务：定期更新数据缓存"""
-    global cached_data, last_update
+# 共享快照文件，主进程每轮刷新后写入，其他worker轮询文件变化后重新映射
+SHARED_SNAPSHOT_PATH = os.environ.get('SHARED_SNAPSHOT_PATH') or os.path.join(get_cache_dir(), 'snapshot_shared.bin')
+SHARED_POLL_SECONDS = float(os.environ.get('SHARED_POLL_SECONDS', '2'))
+
+# 板块成分股按板块缓存：交易时段内 BOARD_STOCKS_TTL 秒，休市时缓存到下一次开盘（最长 BOARD_STOCKS_TTL_CLOSED 秒）
+BOARD_STOCKS_CACHE_SIZE = int(os.environ.get('BOARD_STOCKS_CACHE_SIZE', '200'))
+BOARD_STOCKS_TTL = float(os.environ.get('BOARD_STOCKS_TTL', '60'))
+BOARD_STOCKS_TTL_CLOSED = float(os.environ.get('BOARD_STOCKS_TTL_CLOSED', '3600'))
+BOARD_ID_PATTERN = re.compile(r'^BK\d{4,}$')
+
+def board_stocks_ttl():
+    """成分股缓存的有效期，取决于当前是否在交易时段"""
+    now = scheduler.now()
+    if scheduler.is_market_open(now):
+        return BOARD_STOCKS_TTL
+    opening = scheduler.next_open(now)
+    if opening is None:
+        return BOARD_STOCKS_TTL_CLOSED
+    return max(BOARD_STOCKS_TTL, min((opening - now).total_seconds(), BOARD_STOCKS_TTL_CLOSED))
+
+# 交易时段内过期后的一个有效期内先返回旧的成分股；休市时的有效期更长，开盘后不再返回休市期间的结果
+board_stocks_cache = fetch_cache.CoalescingCache('stocks', BOARD_STOCKS_CACHE_SIZE, board_stocks_ttl,
+                                                 max_stale=BOARD_STOCKS_TTL * 2)
+
+_background_started = False
+_background_lock = threading.Lock()
+
+def publish_cache(data, record=True, combos=None):
+    """发布新一轮的缓存数据，并一次性生成API使用的快照
+    
+    Args:
+        data: cache_data() 的结果
+        record: 是否写入历史数据库（从缓存文件恢复的数据不重复记录）
+        combos: 本轮实际刷新的 (board_type, period) 列表，只把这些组合写入历史数据库，默认全部写入
+    """
+    global cached_data, current_snapshot, last_update
+    if data:
+        new_snapshot = snapshot.build_snapshot(data, current_snapshot, dict(last_sources))
+        cached_data = data
+        current_snapshot = new_snapshot
+    last_update = datetime.datetime.now()
+    
+    if data and record:
+        if combos is not None:
+            recorded = {}
+            for board_type, period in combos:
+                recorded.setdefault(board_type, {})[period] = data.get(board_type, {}).get(period, [])
+        else:
+            recorded = data
+        history_store.record_snapshot(recorded, last_update)
+    
+    if data and record:
+        record_intraday(data, combos)
+    
+    if data and leader.is_leader():
+        write_shared_snapshot()
+    
+    if data:
+        search_index.update_from_snapshot(current_snapshot)
+        exports.prebuild_async(current_snapshot)
+    
+    # 通知所有订阅者有新的快照，客户端再用带ETag的请求拉取变化的数据
+    if current_snapshot:
+        sse.publish('snapshot', snapshot_event())
+
+def record_intraday(data, combos=None):
+    """把本轮实际刷新的今日数据写入日内分钟曲线"""
+    today = {board_type: {'today': periods.get('today')} for board_type, periods in data.items()
+             if isinstance(periods, dict) and (combos is None or (board_type, 'today') in combos)}
+    if today:
+        intraday.record(today, last_update)
+
+def write_shared_snapshot():
+    """主进程把当前快照写入共享文件，供其他worker读取"""
+    try:
+        meta = {
+            'last_update': last_update.isoformat(),
+            'refresh': get_refresh_stats(),
+            'sources': source_health.get_status()
+        }
+        payload = snapshot.dump_shared(current_snapshot, cached_data, meta)
+        atomic_write(SHARED_SNAPSHOT_PATH, payload, keep_generations=False, durable=False)
+        logger.info(f"Shared snapshot {current_snapshot['version']} written ({len(payload)} bytes)")
+    except Exception as e:
+        logger.error(f"Failed to write shared snapshot: {str(e)}")
+
+def apply_shared_snapshot():
+    """读取主进程发布的共享快照，替换本进程的快照，成功时返回True"""
+    global cached_data, current_snapshot, last_update, shared_meta
+    try:
+        new_snapshot, data, meta = snapshot.load_shared(SHARED_SNAPSHOT_PATH)
+    except Exception as e:
+        logger.error(f"Failed to load shared snapshot: {str(e)}")
+        return False
     
+    cached_data = data
+    current_snapshot = new_snapshot
+    shared_meta = meta
+    last_update = datetime.datetime.fromisoformat(meta['last_update']) if meta.get('last_update') else datetime.datetime.now()
+    logger.info(f"Loaded shared snapshot {new_snapshot['version']}")
+    refreshed = meta.get('refresh', {}).get('refreshed')
+    record_intraday(data, None if refreshed is None else [tuple(key.split('/', 1)) for key in refreshed])
+    search_index.update_from_snapshot(current_snapshot)
+    exports.prebuild_async(current_snapshot)
+    sse.publish('snapshot', snapshot_event())
+    return True
+
+def snapshot_event():
+    """生成推送给前端的快照通知"""
+    return {
+        'version': current_snapshot['version'],
+        'last_update': last_update.strftime("%Y-%m-%d %H:%M:%S"),
+        'entries': {f"{board_type}/{period}": entry['version']
+                    for (board_type, period), entry in current_snapshot['entries'].items()}
+    }
+
+def update_cache():
+    """后台任务：按交易日历和各组合的刷新频率更新数据缓存（见 scheduler.py）"""
     while True:
         try:
-            logger.info("Updating data cache...")
-            cached_data = cache_data()
-            last_update = datetime.datetime.now()
-            logger.info(f"Cache updated at {last_update}")
+            combos = scheduler.due_combos()
+            if combos:
+                logger.info(f"Updating data cache for {', '.join(f'{b}/{p}' for b, p in combos)}...")
+                data = cache_data(previous=cached_data, combos=combos)
+                if not data:
+                    logger.error("Refresh cycle failed, retrying in 5 minutes")
+                    time.sleep(5 * 60)
+                    continue
+                publish_cache(data, combos=combos)
+                scheduler.mark_refreshed(combos)
+                logger.info(f"Cache updated at {last_update}")
             
-            # 市场交易时间内（9:30-15:00）每15分钟更新一次，非交易时间每2小时更新一次
-            now = datetime.datetime.now()
-            is_trading_hours = (
-                9 <= now.hour <= 15 and 
-                not (now.hour == 9 and now.minute < 30) and
-                not (now.hour == 15 and now.minute > 0)
-            )
-            
-            sleep_time = 15 * 60 if is_trading_hours else 2 * 60 * 60
-            time.sleep(sleep_time)
+            time.sleep(scheduler.seconds_until_next())
         
         except Exception as e:
             logger.error(f"Error updating cache: {str(e)}")
             time.sleep(5 * 60)  # 发生错误后等待5分钟重试
 
-# 启动后台线程更新数据
-def start_background_tasks():
-    """启动后台任务"""
-    # 首次加载尝试从文件加载缓存
-    global cached_data, last_update
-    cached_data = load_cached_data()
-    
-    if cached_data:
-        last_update = datetime.datetime.now()
-        logger.info("Loaded data from cache file")
-    else:
-        # 如果没有缓存文件，立即抓取新数据
-        logger.info("No cache file found, fetching new data...")
-        cached_data = cache_data()
-        last_update = datetime.datetime.now()
+def start_leader_tasks():
+    """主进程的后台任务：独立SSE服务器和数据刷新线程"""
+    # 配置了独立端口时启动事件循环方式的SSE服务器
+    sse_port = os.environ.get('SSE_PORT')
+    if sse_port:
+        sse.start_server('0.0.0.0', int(sse_port))
     
     # 启动后台更新线程
     thread = threading.Thread(target=update_cache, daemon=True)
     thread.start()
     logger.info("Background update task started")
 
+def follow_shared_snapshot():
+    """非主进程的后台任务：轮询共享快照文件的变化，主进程退出后接替刷新"""
+    last_seen = None
+    while True:
+        try:
+            if leader.try_acquire():
+                logger.info("Refresh leader is gone, taking over background refresh")
+                start_leader_tasks()
+                return
+            
+            try:
+                stat = os.stat(SHARED_SNAPSHOT_PATH)
+                seen = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                seen = None
+            if seen is not None and seen != last_seen and apply_shared_snapshot():
+                last_seen = seen
+        except Exception as e:
+            logger.error(f"Error following shared snapshot: {str(e)}")
+        time.sleep(SHARED_POLL_SECONDS)
+
+# 启动后台线程更新数据
+def start_background_tasks():
+    """启动后台任务，重复调用时直接返回
+    
+    同一台机器上的多个worker中只有一个（持有文件锁的主进程）会抓取数据，
+    其余worker读取主进程发布的共享快照。
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    
+    if leader.try_acquire():
+        # 上一个主进程留下的共享快照优先，版本号和ETag在所有worker之间保持一致
+        if os.path.exists(SHARED_SNAPSHOT_PATH) and apply_shared_snapshot():
+            logger.info("Loaded data from shared snapshot")
+        else:
+            # 首次加载尝试从文件加载缓存
+            data = load_cached_data()
+            
+            if data:
+                publish_cache(data, record=False)
+                logger.info("Loaded data from cache file")
+            else:
+                # 如果没有缓存文件，立即抓取新数据
+                logger.info("No cache file found, fetching new data...")
+                publish_cache(cache_data())
+        
+        start_leader_tasks()
+    else:
+        logger.info("Another worker is the refresh leader, following its shared snapshot")
+        if not (os.path.exists(SHARED_SNAPSHOT_PATH) and apply_shared_snapshot()):
+            # 主进程还没有发布快照时先用缓存文件顶上
+            data = load_cached_data()
+            if data:
+                publish_cache(data, record=False)
+        
+        thread = threading.Thread(target=follow_shared_snapshot, daemon=True)
+        thread.start()
+
+def is_valid_combo(board_type, period):
+    """板块类型和周期是否合法
+
+    这两个参数来自查询字符串，会成为抓取缓存的键、熔断状态的键和指标的标签，
+    任意取值都会让它们无限增长，所以在路由中先检查，不合法时返回400。
+    """
+    return board_type in scheduler.BOARD_TYPES and period in scheduler.PERIODS
+
 # 获取数据的函数，优先使用缓存
 def get_cached_data(board_type, period):
-    """获取缓存的数据，如果缓存不可用则直接抓取"""
-    global cached_data
+    """获取缓存的数据（已转换为前端格式），快照中没有时直接抓取
     
+    直接抓取经过 fetch_cache：同一组合的并发请求只抓取一次，过期不久的结果先返回再在后台更新。
+    """
     try:
-        if cached_data and board_type in cached_data and period in cached_data[board_type]:
+        entry = snapshot.get_entry(current_snapshot, board_type, period)
+        if entry is not None:
             logger.info(f"Returning cached data for {board_type} {period}")
-            raw_data = cached_data[board_type][period]
-            
-            # 转换字段名以保持与前端的兼容性
-            converted_data = []
-            for item in raw_data:
-                converted_item = item.copy()
-                
-                # 将新字段名转换为前端期望的老字段名
-                field_mapping = {
-                    'main_inflow': 'main_net_inflow',
-                    'main_inflow_percent': 'main_net_ratio', 
-                    'super_large_inflow': 'super_net_inflow',
-                    'super_large_inflow_percent': 'super_net_ratio',
-                    'stock_name': 'top_stock'
-                }
-                
-                for new_field, old_field in field_mapping.items():
-                    if new_field in converted_item:
-                        converted_item[old_field] = converted_item[new_field]
-                        # 保留原字段以确保兼容性
-                        
-                # 格式化百分比字段为字符串（如果前端期望字符串格式）
-                percent_fields = ['change_percent', 'main_net_ratio', 'super_net_ratio']
-                for field in percent_fields:
-                    if field in converted_item and isinstance(converted_item[field], (int, float)):
-                        converted_item[field] = f"{converted_item[field] * 100:.2f}%"
-                
-                converted_data.append(converted_item)
-            
-            return converted_data
+            metrics.inc('fund_flow_cache_requests_total', result='hit')
+            return entry['rows']
     except Exception as e:
         logger.error(f"Error accessing cached data: {str(e)}")
     
+    if not is_valid_combo(board_type, period):
+        logger.warning(f"Refusing to fetch unknown combo {board_type} {period}")
+        return []
+    
     # 如果缓存不可用，直接抓取
     logger.info(f"Cache miss for {board_type} {period}, fetching directly...")
-    return get_data(board_type, period)
+    metrics.inc('fund_flow_cache_requests_total', result='miss')
+    try:
+        return fetch_cache.get((board_type, period), lambda: get_data(board_type, period))
+    except Exception as e:
+        logger.error(f"Error fetching {board_type} {period} data directly: {str(e)}")
+        return []
+
+def add_validators(response, entry, etag_suffix=''):
+    """为响应添加ETag/Last-Modified等缓存校验头，以及该组合使用的数据源"""
+    response.set_etag(entry['etag'] + etag_suffix)
+    response.last_modified = entry['last_modified']
+    if entry.get('source'):
+        response.headers['X-Data-Source'] = entry['source']
+    response.cache_control.no_cache = True
+    response.headers['X-Snapshot-Version'] = str(entry['version'])
+    return response
+
+def choose_encoding(entry):
+    """根据 Accept-Encoding 选择预先压缩好的版本，返回编码名称，不压缩时返回None"""
+    accept = request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if encoding in entry['encoded'] and accept[encoding] > 0:
+            return encoding
+    return None
+
+def not_modified_response(entry, etag_suffix=''):
+    """客户端持有的版本仍然有效时返回304响应，否则返回None"""
+    if request.if_none_match:
+        # If-None-Match 优先于 If-Modified-Since；任意压缩版本的ETag都算命中
+        etag = entry['etag'] + etag_suffix
+        matched = any(request.if_none_match.contains(etag + variant)
+                      for variant in ('', '-gzip', '-br'))
+    elif request.if_modified_since:
+        matched = entry['last_modified'] <= request.if_modified_since
+    else:
+        matched = False
+    
+    if not matched:
+        return None
+    return add_validators(Response(status=304), entry, etag_suffix)
+
+# 服务端排序、过滤和分页的查询参数，带任意一个时返回分页结构
+PAGE_ARGS = ('sort', 'order', 'q', 'offset', 'limit')
+
+def parse_page_args():
+    """解析分页参数，参数无效时抛出ValueError"""
+    sort = request.args.get('sort') or None
+    if sort is not None and sort not in snapshot.SORT_FIELDS and sort not in snapshot.SORT_ALIASES:
+        raise ValueError(f"unsupported sort field: {sort}")
+    order = request.args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        raise ValueError(f"unsupported order: {order}")
+    offset = int(request.args.get('offset') or 0)
+    limit = request.args.get('limit')
+    limit = int(limit) if limit else None
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must not be negative")
+    q = request.args.get('q', '').strip() or None
+    return {'sort': sort, 'order': order, 'q': q, 'offset': offset, 'limit': limit}
+
+def board_page_response(board_type, period):
+    """返回排序、过滤后的一页数据：{total, offset, limit, version, rows}"""
+    try:
+        args = parse_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    entry = snapshot.get_entry(current_snapshot, board_type, period)
+    if entry is None:
+        data = get_cached_data(board_type, period)
+        rows, total = snapshot.query_entry({'rows': data, 'index': snapshot.build_index(data)}, **args)
+        return jsonify({'total': total, 'offset': args['offset'], 'limit': args['limit'], 'version': None,
+                        'source': None, 'rows': rows})
+    
+    metrics.inc('fund_flow_cache_requests_total', result='hit')
+    # 同一数据版本、同一组参数的结果不变，ETag在数据版本的基础上加上参数的哈希
+    etag_suffix = '-p' + snapshot.content_hash(json.dumps(args, sort_keys=True).encode('utf-8'))[:12]
+    response = not_modified_response(entry, etag_suffix)
+    if response is None:
+        rows, total = snapshot.query_entry(entry, **args)
+        logger.info(f"Returning {len(rows)} of {total} {board_type} data items from snapshot")
+        body = snapshot.serialize({'total': total, 'offset': args['offset'], 'limit': args['limit'],
+                                   'version': entry['version'], 'source': entry.get('source'), 'rows': rows})
+        response = Response(body, mimetype='application/json')
+    return add_validators(response, entry, etag_suffix)
+
+def board_data_response(board_type, period):
+    """返回板块数据的响应，命中快照时直接返回预先序列化的JSON字节
+    
+    带 sort/order/q/offset/limit 参数时改为返回服务端排序、过滤后的一页数据
+    """
+    if any(arg in request.args for arg in PAGE_ARGS):
+        return board_page_response(board_type, period)
+    
+    entry = snapshot.get_entry(current_snapshot, board_type, period)
+    if entry is not None:
+        metrics.inc('fund_flow_cache_requests_total', result='hit')
+        encoding = choose_encoding(entry)
+        etag_suffix = f"-{encoding}" if encoding else ''
+        response = not_modified_response(entry)
+        if response is None:
+            body = entry['encoded'][encoding] if encoding else entry['body']
+            logger.info(f"Returning {board_type} {period} data from snapshot ({len(body)} bytes)")
+            # 共享快照中的响应体是memoryview，WSGI服务器只接受bytes
+            response = Response(bytes(body), mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return add_validators(response, entry, etag_suffix)
+    
+    data = get_cached_data(board_type, period)
+    logger.info(f"Returning {len(data)} {board_type} data items")
+    return jsonify(data)
+
+@app.before_request
+def start_request_timer():
+    """记录请求开始时间，用于统计各路由的耗时"""
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """记录路由耗时和响应体大小；流式响应（SSE、分块导出）没有固定长度，只记录耗时"""
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('fund_flow_http_request_seconds', time.perf_counter() - start,
+                        route=route, status=response.status_code)
+        if response.content_length is not None:
+            metrics.observe('fund_flow_http_response_bytes', response.content_length, route=route)
+    return response
+
+def snapshot_ages():
+    """各板块/周期数据距最近一次变化的秒数"""
+    if not current_snapshot:
+        return []
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [({'board_type': board_type, 'period': period}, round((now - entry['last_modified']).total_seconds(), 3))
+            for (board_type, period), entry in current_snapshot['entries'].items()]
+
+def snapshot_publish_age():
+    """当前快照距发布的秒数"""
+    if not current_snapshot:
+        return []
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [({}, round((now - current_snapshot['created_at']).total_seconds(), 3))]
+
+metrics.gauge('fund_flow_snapshot_age_seconds', "Seconds since each board/period snapshot entry last changed", snapshot_ages)
+metrics.gauge('fund_flow_snapshot_published_age_seconds', "Seconds since the current snapshot was published", snapshot_publish_age)
+
+def source_health_samples(field):
+    """数据源健康状态中的一个字段，作为按 source/combo 区分的仪表值"""
+    samples = []
+    for combo, sources in source_health.get_status().items():
+        for source, status in sources.items():
+            value = status[field]
+            if field == 'state':
+                value = source_health.STATE_VALUES[value]
+            if value is not None:
+                samples.append(({'source': source, 'combo': combo}, value))
+    return samples
+
+metrics.gauge('fund_flow_source_circuit_state', "Circuit breaker state per data source and combo (0 closed, 1 half-open, 2 open)",
+              lambda: source_health_samples('state'))
+metrics.gauge('fund_flow_source_error_ratio', "Share of failed fetches in the rolling health window",
+              lambda: source_health_samples('error_rate'))
+metrics.gauge('fund_flow_source_latency_seconds', "Mean fetch time in the rolling health window",
+              lambda: source_health_samples('avg_seconds'))
 
 @app.route('/')
 def index():
     """主页"""
-    global last_update
     update_time = last_update.strftime("%Y-%m-%d %H:%M:%S") if last_update else "未更新"
     logger.info(f"Rendering index page with update time: {update_time}")
-    return render_template('index.html', current_time=update_time)
+    stream_url = os.environ.get('SSE_PUBLIC_URL', '/api/stream')
+    return render_template('index.html', current_time=update_time, stream_url=stream_url)
 
 @app.route('/api/industry_data')
 def get_industry_data():
     """获取行业板块资金流数据"""
     period = request.args.get('period', 'today')  # today, 5days, 10days
+    if not is_valid_combo('industry', period):
+        return jsonify({'error': 'invalid period'}), 400
     logger.info(f"API request for industry data, period: {period}")
     
     try:
-        data = get_cached_data('industry', period)
-        logger.info(f"Returning {len(data)} industry data items")
-        return jsonify(data)
+        return board_data_response('industry', period)
     except Exception as e:
         logger.error(f"Error fetching industry data: {str(e)}", exc_info=True)
         return jsonify([]), 500
@@ -140,20 +471,101 @@ def get_industry_data():
 def get_concept_data():
     """获取概念板块资金流数据"""
     period = request.args.get('period', 'today')  # today, 5days, 10days
+    if not is_valid_combo('concept', period):
+        return jsonify({'error': 'invalid period'}), 400
     logger.info(f"API request for concept data, period: {period}")
     
     try:
-        data = get_cached_data('concept', period)
-        logger.info(f"Returning {len(data)} concept data items")
-        return jsonify(data)
+        return board_data_response('concept', period)
     except Exception as e:
         logger.error(f"Error fetching concept data: {str(e)}", exc_info=True)
         return jsonify([]), 500
 
+def parse_time_arg(value):
+    """解析时间参数，支持Unix时间戳（秒）和ISO格式的日期时间"""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    return int(datetime.datetime.fromisoformat(value).timestamp())
+
+def load_board_stocks(board_id):
+    """抓取板块成分股，并把股票名称加入搜索索引"""
+    stocks = fetch_board_stocks(board_id)
+    search_index.sync(f"stocks:{board_id}", {
+        f"stock:{stock['code']}": search_index.make_doc('stock', stock['code'], stock['name'])
+        for stock in stocks if stock['code']
+    })
+    return stocks
+
+@app.route('/api/board/<board_id>/stocks')
+def get_board_stocks(board_id):
+    """获取板块成分股的今日资金流，按主力净流入从大到小排序"""
+    if not BOARD_ID_PATTERN.match(board_id):
+        return jsonify({'error': 'invalid board id'}), 400
+    limit = request.args.get('limit', type=int)
+    logger.info(f"API request for constituent stocks of {board_id}")
+    
+    try:
+        stocks = board_stocks_cache.get(board_id, lambda: load_board_stocks(board_id))
+    except fetch_cache.FetchTimeout:
+        return jsonify({'error': 'upstream timeout'}), 504
+    except Exception as e:
+        logger.error(f"Error fetching stocks of {board_id}: {str(e)}")
+        return jsonify({'error': 'upstream error'}), 502
+    
+    return jsonify({
+        'board_id': board_id,
+        'total': len(stocks),
+        'stocks': stocks[:limit] if limit and limit > 0 else stocks
+    })
+
+@app.route('/api/board/<board_id>/intraday')
+def get_board_intraday(board_id):
+    """获取板块当天的分钟级累计净流入曲线"""
+    board_type = request.args.get('type') or None
+    if board_type is not None and board_type not in scheduler.BOARD_TYPES:
+        return jsonify({'error': 'invalid type'}), 400
+    series = intraday.get_series(board_id, board_type)
+    if series is None:
+        return jsonify({'error': 'no intraday data'}), 404
+    return jsonify(series)
+
+@app.route('/api/board/<board_id>/history')
+def get_board_history(board_id):
+    """获取单个板块的历史资金流数据"""
+    period = request.args.get('period', 'today')
+    if period not in scheduler.PERIODS:
+        return jsonify({'error': 'invalid period'}), 400
+    try:
+        start = parse_time_arg(request.args.get('start'))
+        end = parse_time_arg(request.args.get('end'))
+        limit = request.args.get('limit', type=int)
+    except ValueError:
+        return jsonify({'error': 'invalid time range'}), 400
+    logger.info(f"API request for history of {board_id}, period: {period}")
+    
+    try:
+        rows = history_store.query_board_history(board_id, period, start, end, limit)
+        for row in rows:
+            row['time'] = datetime.datetime.fromtimestamp(row['ts']).strftime("%Y-%m-%d %H:%M:%S")
+        return jsonify(rows)
+    except Exception as e:
+        logger.error(f"Error querying history: {str(e)}", exc_info=True)
+        return jsonify([]), 500
+
+@app.route('/api/search')
+def search():
+    """按名称、代码或拼音首字母搜索板块和股票，用于输入联想"""
+    query = request.args.get('q', '')
+    kind = request.args.get('type') or None
+    limit = request.args.get('limit', search_index.DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, search_index.MAX_LIMIT))
+    return jsonify(search_index.search(query, limit, kind))
+
 @app.route('/api/last_update')
 def get_last_update():
     """获取最后更新时间"""
-    global last_update
     logger.info("API request for last update time")
     
     update_time = last_update.strftime("%Y-%m-%d %H:%M:%S") if last_update else "未更新"
@@ -161,73 +573,86 @@ def get_last_update():
         'last_update': update_time
     })
 
+@app.route('/api/stream')
+def stream():
+    """Server-Sent Events 推送新快照通知（未配置独立SSE服务器时使用）"""
+    if not request.environ.get('wsgi.multithread'):
+        # 单线程的worker（gunicorn默认的sync）被一个推送连接占住后无法处理其他请求
+        logger.warning("Inline SSE needs a multithreaded server, asking client to fall back to polling")
+        return jsonify({'error': 'stream not available'}), 503
+    if not sse.acquire_inline_slot():
+        logger.warning("Too many inline SSE clients, asking client to fall back to polling")
+        return jsonify({'error': 'too many stream clients'}), 503
+    
+    last_event_id = request.headers.get('Last-Event-ID')
+    response = Response(sse.stream_events(last_event_id), mimetype='text/event-stream')
+    response.call_on_close(sse.release_inline_slot)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def artifact_response(board_type, period, fmt, suffix=''):
+    """返回当前快照的导出文件，数据版本不变时直接使用缓存中已生成的文件"""
+    entry = snapshot.get_entry(current_snapshot, board_type, period)
+    if entry is not None:
+        response = not_modified_response(entry, f'-{fmt}')
+        if response is not None:
+            return response
+        body = exports.get_artifact(board_type, period, entry['version'], fmt, entry['rows'])
+    else:
+        # 没有快照时直接抓取，结果不进入缓存
+        body = exports.BUILDERS[fmt](get_cached_data(board_type, period))
+    
+    filename = exports.export_filename(board_type, period, fmt)
+    logger.info(f"Exporting {fmt} file: {filename}")
+    response = Response(body, mimetype=exports.MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = exports.content_disposition(filename)
+    if entry is not None:
+        add_validators(response, entry, f'-{fmt}')
+    return response
+
 @app.route('/export/excel')
 def export_excel():
     """导出Excel数据"""
     board_type = request.args.get('type', 'industry')
     period = request.args.get('period', 'today')
+    if not is_valid_combo(board_type, period):
+        return "无效的板块类型或周期", 400
     logger.info(f"Export Excel request for {board_type}, period: {period}")
     
     try:
-        data = get_cached_data(board_type, period)
-        
-        # 创建DataFrame
-        df = pd.DataFrame(data)
-        
-        # 使用BytesIO在内存中创建Excel文件
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='资金流数据')
-        
-        output.seek(0)
-        
-        # 设置文件名
-        board_type_name = "行业板块" if board_type == "industry" else "概念板块"
-        period_name = "今日" if period == "today" else ("5日" if period == "5days" else "10日")
-        filename = f"{board_type_name}资金流_{period_name}_{datetime.datetime.now().strftime('%Y%m%d')}.xlsx"
-        
-        logger.info(f"Exporting Excel file: {filename}")
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        return artifact_response(board_type, period, 'xlsx')
     except Exception as e:
         logger.error(f"Error exporting Excel: {str(e)}", exc_info=True)
         return "导出失败", 500
 
 @app.route('/export/csv')
 def export_csv():
-    """导出CSV数据"""
+    """导出CSV数据
+    
+    带 start/end 参数时以分块传输逐批导出历史数据库中该时间范围内的所有记录，
+    否则导出当前快照（按数据版本缓存）
+    """
     board_type = request.args.get('type', 'industry')
     period = request.args.get('period', 'today')
+    if not is_valid_combo(board_type, period):
+        return "无效的板块类型或周期", 400
+    try:
+        start = parse_time_arg(request.args.get('start'))
+        end = parse_time_arg(request.args.get('end'))
+    except ValueError:
+        return "无效的时间范围", 400
     logger.info(f"Export CSV request for {board_type}, period: {period}")
     
     try:
-        data = get_cached_data(board_type, period)
+        if start is None and end is None:
+            return artifact_response(board_type, period, 'csv')
         
-        # 创建DataFrame
-        df = pd.DataFrame(data)
-        
-        # 使用BytesIO在内存中创建CSV文件
-        output = BytesIO()
-        df.to_csv(output, index=False, encoding='utf-8-sig')  # 使用带BOM的UTF-8编码确保Excel可以正确打开中文
-        
-        output.seek(0)
-        
-        # 设置文件名
-        board_type_name = "行业板块" if board_type == "industry" else "概念板块"
-        period_name = "今日" if period == "today" else ("5日" if period == "5days" else "10日")
-        filename = f"{board_type_name}资金流_{period_name}_{datetime.datetime.now().strftime('%Y%m%d')}.csv"
-        
-        logger.info(f"Exporting CSV file: {filename}")
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='text/csv'
-        )
+        filename = exports.export_filename(board_type, period, 'csv', '_历史')
+        logger.info(f"Streaming history CSV file: {filename}")
+        response = Response(exports.iter_history_csv(board_type, period, start, end), mimetype='text/csv')
+        response.headers['Content-Disposition'] = exports.content_disposition(filename)
+        return response
     except Exception as e:
         logger.error(f"Error exporting CSV: {str(e)}", exc_info=True)
         return "导出失败", 500
@@ -239,16 +664,29 @@ def test_api():
     logger.info("Test API endpoint called")
     return jsonify({"status": "ok", "message": "API is working"})
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus格式的运行指标（仅本进程）"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/health')
 def health_check():
     """健康检查端点，用于云平台监控"""
-    global last_update, cached_data
-    
     status = {
         "status": "healthy",
         "timestamp": datetime.datetime.now().isoformat(),
         "last_data_update": last_update.isoformat() if last_update else None,
-        "cache_status": "loaded" if cached_data else "empty"
+        "cache_status": "loaded" if cached_data else "empty",
+        "role": "leader" if leader.is_leader() else "follower",
+        "pid": os.getpid(),
+        "refresh": get_refresh_stats() if leader.is_leader() else (shared_meta or {}).get('refresh', {}),
+        "schedule": scheduler.get_status() if leader.is_leader() else None,
+        "sources": source_health.get_status() if leader.is_leader() else (shared_meta or {}).get('sources', {}),
+        "export_cache": exports.get_cache_stats(),
+        "search_index": search_index.get_stats(),
+        "fetch_cache": fetch_cache.get_stats(),
+        "board_stocks_cache": board_stocks_cache.get_stats(),
+        "intraday": intraday.get_stats()
     }
     
     return jsonify(status), 200
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能基准脚本：用本地模拟的东方财富接口（fake_eastmoney.py）测量全量数据下的刷新耗时和API延迟
+
+模拟接口按请求的页码和每页条数返回数据，每个请求固定延迟 --latency 秒，
+用来比较分页串行抓取和并发抓取的耗时，以及约500条数据时各个API的响应时间。
+--error-rate、--truncate-rate、--rate-limit 向模拟接口注入故障，测量重试和回退链路下的刷新耗时。
+
+用法：
+    python benchmark.py [--rows 500] [--latency 0.05] [--page-size 100] [--requests 200] [--json]
+    python benchmark.py --error-rate 0.1 --truncate-rate 0.05 --rate-limit 50
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+import fake_eastmoney
+
+def percentile(values, pct):
+    """计算百分位数"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run_refresh_benchmark(scraper, runs=3):
+    """测量一轮完整刷新的耗时，分别使用串行分页和并发分页"""
+    results = {}
+    page_workers = scraper.PAGE_WORKERS
+    for label, workers in (('cycle_sequential_pages', 1), ('cycle_concurrent_pages', page_workers)):
+        scraper.PAGE_WORKERS = workers
+        timings = []
+        data = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            data = scraper.cache_data()
+            timings.append(time.perf_counter() - start)
+        stats = scraper.get_refresh_stats()
+        results[label] = {
+            'page_workers': workers,
+            'cycle_ms': round(min(timings) * 1000, 1),
+            'rows': {key: combo['rows'] for key, combo in stats['combos'].items()},
+            'requests': sum(host['requests'] for host in stats['http'].values())
+        }
+    scraper.PAGE_WORKERS = page_workers
+
+    # 单个组合的分页抓取：没有其他组合争用单主机并发名额时，并发分页的效果最明显
+    for label, workers in (('single_combo_sequential', 1), ('single_combo_concurrent', page_workers)):
+        scraper.PAGE_WORKERS = workers
+        timings = []
+        rows = 0
+        for _ in range(runs):
+            start = time.perf_counter()
+            rows = len(scraper.fetch_data_primary('concept', 'today'))
+            timings.append(time.perf_counter() - start)
+        results[label] = {'page_workers': workers, 'cycle_ms': round(min(timings) * 1000, 1),
+                          'rows': {'concept/today': rows}, 'requests': None}
+    scraper.PAGE_WORKERS = page_workers
+    return results, data
+
+def run_api_benchmark(app_module, data, requests_count):
+    """测量快照构建耗时和各个API的响应时间"""
+    import snapshot
+    import exports
+
+    start = time.perf_counter()
+    snapshot.build_snapshot(data)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    app_module.publish_cache(data, record=False)
+    client = app_module.app.test_client()
+    entry = snapshot.get_entry(app_module.current_snapshot, 'industry', 'today')
+    etag = f'"{entry["etag"]}"'
+
+    cases = [
+        ('industry_data identity', '/api/industry_data?period=today', {'Accept-Encoding': 'identity'}),
+        ('industry_data gzip', '/api/industry_data?period=today', {'Accept-Encoding': 'gzip'}),
+        ('industry_data br', '/api/industry_data?period=today', {'Accept-Encoding': 'br, gzip'}),
+        ('industry_data 304', '/api/industry_data?period=today', {'If-None-Match': etag}),
+        ('concept_data gzip', '/api/concept_data?period=5days', {'Accept-Encoding': 'gzip'}),
+        # 导出文件按数据版本缓存：第一个用例每次先清空缓存，测量生成文件的耗时；第二个测量缓存命中
+        ('export csv', '/export/csv?type=concept&period=today', {}, exports.clear_cache),
+        ('export csv cached', '/export/csv?type=concept&period=today', {}),
+    ]
+    results = {'snapshot_build_ms': round(build_ms, 2), 'routes': {}}
+    for name, url, headers, *setup in cases:
+        timings = []
+        size = 0
+        status = None
+        for _ in range(requests_count):
+            for prepare in setup:
+                prepare()
+            start = time.perf_counter()
+            response = client.get(url, headers=headers)
+            body = response.get_data()
+            timings.append((time.perf_counter() - start) * 1000)
+            size = len(body)
+            status = response.status_code
+        results['routes'][name] = {
+            'status': status,
+            'bytes': size,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3)
+        }
+    return results
+
+def print_report(report):
+    """输出可读的结果"""
+    print(f"rows per combo: {report['config']['rows']}, upstream latency: {report['config']['latency']}s, "
+          f"page size: {report['config']['page_size']}")
+    faults = {key: report['config'][key] for key in ('error_rate', 'truncate_rate', 'rate_limit') if report['config'][key]}
+    if faults:
+        print(f"injected faults: {faults}")
+    print("\nRefresh (a full cycle runs 6 combos that share the per-host concurrency limit):")
+    for label, result in report['refresh'].items():
+        rows = sorted(set(result['rows'].values()))
+        requests_info = f"  requests={result['requests']}" if result['requests'] is not None else ''
+        print(f"  {label:<24} {result['cycle_ms']:>9.1f} ms{requests_info}  rows/combo={rows}")
+    print(f"\nSnapshot build: {report['api']['snapshot_build_ms']:.2f} ms")
+    print("\nAPI latency:")
+    for name, result in report['api']['routes'].items():
+        print(f"  {name:<24} status={result['status']}  {result['bytes']:>8} B  "
+              f"p50={result['p50_ms']:.3f} ms  p95={result['p95_ms']:.3f} ms")
+    print(f"\nUpstream responses: {report['upstream']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="全量数据下的刷新和API性能基准")
+    parser.add_argument('--rows', type=int, default=500, help="每种板块的数据条数")
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟接口每个请求的延迟（秒）")
+    parser.add_argument('--page-size', type=int, default=100, help="每页条数")
+    parser.add_argument('--requests', type=int, default=200, help="每个API测量的请求次数")
+    parser.add_argument('--runs', type=int, default=3, help="刷新测量的轮数，取最快的一轮")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="模拟接口返回5xx错误的比例")
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help="模拟接口截断响应体的比例")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="模拟接口每秒允许的请求数，0为不限流")
+    parser.add_argument('--json', action='store_true', help="以JSON格式输出结果")
+    args = parser.parse_args(argv)
+
+    # 在临时目录中运行，不影响当前目录下的缓存文件、锁文件和历史数据库
+    os.environ['EASTMONEY_PAGE_SIZE'] = str(args.page_size)
+    # 没有注入故障时关闭重试；注入故障时保留重试，测量的就是重试和回退链路的耗时
+    faults = args.error_rate or args.truncate_rate or args.rate_limit
+    os.environ.setdefault('HTTP_MAX_RETRIES', '2' if faults else '0')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp(prefix='fund-flow-bench-'))
+    logging.disable(logging.CRITICAL)
+
+    server = fake_eastmoney.start_server(rows=args.rows, latency=args.latency, error_rate=args.error_rate,
+                                         truncate_rate=args.truncate_rate, rate_limit=args.rate_limit)
+    os.environ['EASTMONEY_PUSH2_BASE'] = server.base_url
+    os.environ['EASTMONEY_DATACENTER_BASE'] = server.base_url
+    import scraper
+
+    # 导入app时会直接调用 cache_data() 完成首次抓取并启动后台刷新线程；
+    # 先把所有组合标记为刚刚刷新过，刷新线程在下一次到期之前一直休眠，不会和测量同时访问模拟接口
+    import scheduler
+    scheduler.mark_refreshed(scheduler.COMBOS)
+    import app as app_module
+
+    refresh, data = run_refresh_benchmark(scraper, args.runs)
+    report = {
+        'config': {'rows': args.rows, 'latency': args.latency, 'page_size': args.page_size,
+                   'error_rate': args.error_rate, 'truncate_rate': args.truncate_rate,
+                   'rate_limit': args.rate_limit},
+        'refresh': refresh,
+        'api': run_api_benchmark(app_module, data, args.requests),
+        'upstream': server.get_stats()
+    }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,34 @@
 """
 用于云环境的数据持久化模块
+
+写入时先写临时文件并fsync，再用原子重命名替换正式文件，其他进程任何时候读到的都是完整的文件；
+替换前保留最近几代旧文件，当前文件损坏时自动回退到上一代。
+刷新线程通过 save_cache_async() 把数据交给后台写入线程，不会因为磁盘写入而阻塞。
 """
 import os
 import json
+import atexit
+import shutil
 import logging
+import threading
+
+import packed_cache
 
 logger = logging.getLogger(__name__)
 
+# 缓存文件格式：packed（默认，紧凑的列式格式，启动时内存映射读取）或 json
+CACHE_FORMAT = os.environ.get('CACHE_FORMAT', 'packed').lower()
+JSON_CACHE_FILE = 'data_cache.json'
+PACKED_CACHE_FILE = 'data_cache.bin'
+# 保留的旧版本数量，例如 data_cache.bin.1 为上一代
+CACHE_GENERATIONS = int(os.environ.get('CACHE_GENERATIONS', '3'))
+
+# 后台写入线程的状态：只保留最新一份待写入的数据，旧的直接被覆盖
+_pending = None
+_writing = False
+_writer_thread = None
+_writer_condition = threading.Condition()
+
 def is_cloud_env():
     """检测是否在云环境（如Render）中运行"""
     return os.environ.get('RENDER') == 'true'
@@ -22,36 +44,190 @@ def get_cache_dir():
         # 本地环境直接使用当前目录
         return os.getcwd()
 
+def generation_path(path, generation):
+    """第generation代旧文件的路径，0表示当前文件"""
+    return path if generation == 0 else f"{path}.{generation}"
+
+def _fsync_dir(directory):
+    """同步目录项，保证重命名在断电后依然有效（Windows不支持，直接跳过）"""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _rotate_generations(path):
+    """把当前文件保留为第1代，更早的依次后移，超过上限的丢弃"""
+    if CACHE_GENERATIONS <= 0 or not os.path.exists(path):
+        return
+    for generation in range(CACHE_GENERATIONS - 1, 0, -1):
+        older = generation_path(path, generation)
+        if os.path.exists(older):
+            os.replace(older, generation_path(path, generation + 1))
+    previous = generation_path(path, 1)
+    if os.path.exists(previous):
+        os.remove(previous)
+    # 用硬链接保留当前文件，正式文件在整个过程中始终存在
+    try:
+        os.link(path, previous)
+    except OSError:
+        shutil.copy2(path, previous)
+
+def atomic_write(path, payload, keep_generations=True, durable=True):
+    """原子地写入文件：写临时文件、fsync、保留旧版本，再重命名为正式文件
+
+    Args:
+        keep_generations: 是否保留旧版本
+        durable: 是否fsync，只用于进程间交换、重启后可以重建的文件可以关闭
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    # 临时文件带上进程号，多个worker同时写入时互不覆盖
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        if keep_generations:
+            _rotate_generations(path)
+        os.replace(tmp_path, path)
+        if durable:
+            _fsync_dir(directory)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def cache_file_name():
+    """当前 CACHE_FORMAT 对应的缓存文件名"""
+    return JSON_CACHE_FILE if CACHE_FORMAT == 'json' else PACKED_CACHE_FILE
+
+def serialize_cache(data):
+    """按 CACHE_FORMAT 序列化缓存数据，返回 (文件名, 字节)"""
+    if CACHE_FORMAT == 'json':
+        payload = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    else:
+        payload = packed_cache.pack(data)
+    return cache_file_name(), payload
+
 def save_cache_to_cloud(data):
-    """保存缓存到云存储"""
+    """保存缓存到云存储（在调用线程中同步写入）"""
     try:
-        cache_dir = get_cache_dir()
-        cache_file = os.path.join(cache_dir, 'data_cache.json')
-        
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"Cache saved to cloud storage: {cache_file}")
+        file_name, payload = serialize_cache(data)
+        cache_file = os.path.join(get_cache_dir(), file_name)
+        atomic_write(cache_file, payload)
+
+        logger.info(f"Cache saved to cloud storage: {cache_file} ({len(payload)} bytes)")
         return True
     except Exception as e:
         logger.error(f"Failed to save cache to cloud: {str(e)}")
         return False
 
+def _writer_loop():
+    """后台写入线程：每次取出最新的一份数据写入磁盘"""
+    global _pending, _writing
+    while True:
+        with _writer_condition:
+            while _pending is None:
+                _writer_condition.wait()
+            data, _pending = _pending, None
+            _writing = True
+        try:
+            save_cache_to_cloud(data)
+        finally:
+            with _writer_condition:
+                _writing = False
+                _writer_condition.notify_all()
+
+def save_cache_async(data):
+    """把缓存数据交给后台线程写入，立即返回
+
+    写入线程忙时只保留最新的一份数据，中间的版本不再写入。
+    """
+    global _pending, _writer_thread
+    with _writer_condition:
+        if _writer_thread is None:
+            _writer_thread = threading.Thread(target=_writer_loop, daemon=True, name='cache-writer')
+            _writer_thread.start()
+        if _pending is not None:
+            logger.info("Cache writer is busy, replacing pending snapshot with the latest one")
+        _pending = data
+        _writer_condition.notify_all()
+
+def flush(timeout=None):
+    """等待后台写入完成，返回是否已全部写入"""
+    with _writer_condition:
+        return _writer_condition.wait_for(lambda: _pending is None and not _writing, timeout)
+
+# 正常退出时尽量把最后一份数据写完
+atexit.register(flush, 10)
+
+def _read_cache_file(path):
+    """读取一个缓存文件，自动识别格式"""
+    if packed_cache.is_packed_file(path):
+        return packed_cache.load_packed(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def list_generations():
+    """列出当前格式的缓存文件及保留的旧版本，按从新到旧排列"""
+    path = os.path.join(get_cache_dir(), cache_file_name())
+    paths = [generation_path(path, generation) for generation in range(CACHE_GENERATIONS + 1)]
+    return [item for item in paths if os.path.exists(item)]
+
+def rollback_cache(generation=1):
+    """用第generation代旧文件替换当前缓存文件，成功时返回True"""
+    try:
+        path = os.path.join(get_cache_dir(), cache_file_name())
+        source = generation_path(path, generation)
+        if not os.path.exists(source):
+            logger.warning(f"Cache generation not found: {source}")
+            return False
+        with open(source, 'rb') as f:
+            payload = f.read()
+        # 先校验旧文件可以正常读取
+        _read_cache_file(source)
+        atomic_write(path, payload)
+        logger.info(f"Cache rolled back to {source}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to roll back cache: {str(e)}")
+        return False
+
 def load_cache_from_cloud():
-    """从云存储加载缓存"""
+    """从云存储加载缓存
+
+    两种格式的文件都存在时先读较新的一个；文件损坏时依次尝试保留的旧版本。
+    """
     try:
         cache_dir = get_cache_dir()
-        cache_file = os.path.join(cache_dir, 'data_cache.json')
-        
-        if not os.path.exists(cache_file):
-            logger.warning(f"Cache file not found: {cache_file}")
+        files = [
+            os.path.join(cache_dir, PACKED_CACHE_FILE),
+            os.path.join(cache_dir, JSON_CACHE_FILE)
+        ]
+        files = sorted((path for path in files if os.path.exists(path)), key=os.path.getmtime, reverse=True)
+
+        if not files:
+            logger.warning(f"Cache file not found in {cache_dir}")
             return None
-        
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        logger.info(f"Cache loaded from cloud storage: {cache_file}")
-        return data
+
+        for path in files:
+            for generation in range(CACHE_GENERATIONS + 1):
+                cache_file = generation_path(path, generation)
+                if not os.path.exists(cache_file):
+                    continue
+                try:
+                    data = _read_cache_file(cache_file)
+                except Exception as e:
+                    logger.error(f"Failed to read cache file {cache_file}: {str(e)}")
+                    continue
+                logger.info(f"Cache loaded from cloud storage: {cache_file}")
+                return data
+
+        logger.error("No readable cache file found")
+        return None
     except Exception as e:
         logger.error(f"Failed to load cache from cloud: {str(e)}")
-        return None 
\ No newline at end of file
+        return None
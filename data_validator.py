@@ -4,15 +4,15 @@
 数据验证工具 - 用于对比我们的数据与东方财富网站数据
 """
 
-import json
-import requests
+import http_client
+from scraper import PUSH2_BASE, DATACENTER_BASE
+from cloud_storage import load_cache_from_cloud
 from datetime import datetime
 
 def load_our_data():
     """加载我们缓存的数据"""
     try:
-        with open('data_cache.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_cache_from_cloud()
     except Exception as e:
         print(f"加载缓存数据失败: {e}")
         return None
@@ -109,8 +109,8 @@ def test_api_endpoints():
     
     # 测试主API
     try:
-        url = "https://push2.eastmoney.com/api/qt/clist/get?cb=jQuery&pn=1&pz=10&po=1&np=1&ut=bd1d9ddb04089700cf9c27f6f7426281&fltt=2&invt=2&fid=f62&fs=m:90+t:2&fields=f12,f14,f2,f3,f62,f184,f66,f69,f72,f75,f78,f81,f84,f87,f204,f205,f124&_=1640995200000"
-        response = requests.get(url, timeout=10)
+        url = PUSH2_BASE + "/api/qt/clist/get?cb=jQuery&pn=1&pz=10&po=1&np=1&ut=bd1d9ddb04089700cf9c27f6f7426281&fltt=2&invt=2&fid=f62&fs=m:90+t:2&fields=f12,f14,f2,f3,f62,f184,f66,f69,f72,f75,f78,f81,f84,f87,f204,f205,f124&_=1640995200000"
+        response = http_client.get(url, timeout=10)
         if response.status_code == 200:
             print("✅ 主API连接成功")
         else:
@@ -121,8 +121,8 @@ def test_api_endpoints():
     # 测试备用API
     try:
         current_date = datetime.now().strftime('%Y-%m-%d')
-        url = f"https://datacenter-web.eastmoney.com/api/data/v1/get?sortColumns=TRADE_DATE,SECURITY_CODE&sortTypes=-1,-1&pageSize=10&pageNumber=1&reportName=RPT_SECTOR_FUND_FLOW&columns=SECURITY_CODE,SECURITY_NAME_ABBR,CHANGE_RATE,MAIN_FORCE_NET,MAIN_FORCE_NET_RATE&source=WEB&client=WEB&filter=(TRADE_DATE='{current_date}')AND(MARKET_TYPE=\"行业板块\")"
-        response = requests.get(url, timeout=10)
+        url = DATACENTER_BASE + f"/api/data/v1/get?sortColumns=TRADE_DATE,SECURITY_CODE&sortTypes=-1,-1&pageSize=10&pageNumber=1&reportName=RPT_SECTOR_FUND_FLOW&columns=SECURITY_CODE,SECURITY_NAME_ABBR,CHANGE_RATE,MAIN_FORCE_NET,MAIN_FORCE_NET_RATE&source=WEB&client=WEB&filter=(TRADE_DATE='{current_date}')AND(MARKET_TYPE=\"行业板块\")"
+        response = http_client.get(url, timeout=10)
         if response.status_code == 200:
             print("✅ 备用API连接成功")
         else:
@@ -0,0 +1,213 @@
+"""
+数据导出模块：以生成器方式逐批输出CSV，内存占用与导出的行数无关；
+当前快照的CSV/Excel文件按 (板块类型, 周期, 数据版本, 格式) 缓存，数据不变时直接返回已生成的字节
+
+CSV以带BOM的UTF-8编码输出，保证Excel可以正确识别中文。
+"""
+import io
+import os
+import csv
+import math
+import logging
+import datetime
+import threading
+import unicodedata
+from collections import OrderedDict
+from urllib.parse import quote
+
+import pandas as pd
+
+import history_store
+
+logger = logging.getLogger(__name__)
+
+# 每次向客户端输出的行数
+CSV_BATCH_ROWS = 500
+BOM = '\ufeff'
+
+# 导出文件缓存的条数上限（6个板块/周期组合 x 2种格式，默认可以保留两轮刷新的结果）
+EXPORT_CACHE_SIZE = int(os.environ.get('EXPORT_CACHE_SIZE', '24'))
+# 每轮刷新后在后台预先生成的格式，例如 "xlsx,csv"，为空时不预先生成
+EXPORT_PREBUILD = [fmt.strip() for fmt in os.environ.get('EXPORT_PREBUILD', '').split(',') if fmt.strip()]
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+_cache = OrderedDict()
+# 正在生成的文件：key -> Event，同一个文件同时只生成一次，其他请求等待结果
+_building = {}
+_cache_lock = threading.Lock()
+_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+_prebuild_pending = None
+_prebuild_thread = None
+_prebuild_condition = threading.Condition()
+
+def board_type_name(board_type):
+    return "行业板块" if board_type == "industry" else "概念板块"
+
+def period_name(period):
+    return "今日" if period == "today" else ("5日" if period == "5days" else "10日")
+
+def export_filename(board_type, period, extension, suffix=''):
+    """导出文件名，例如 行业板块资金流_今日_20240102.csv"""
+    date = datetime.datetime.now().strftime('%Y%m%d')
+    return f"{board_type_name(board_type)}资金流_{period_name(period)}{suffix}_{date}.{extension}"
+
+def content_disposition(filename):
+    """附件下载的 Content-Disposition 头，非ASCII文件名按RFC 5987编码（与 send_file 的处理相同）"""
+    ascii_name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    ascii_name = ascii_name.replace('"', '') or 'export'
+    if ascii_name == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+def row_columns(rows):
+    """按首次出现的顺序收集所有行的字段名（与 pd.DataFrame(rows) 的列顺序相同）"""
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, None)
+    return list(columns)
+
+def _cell(value):
+    """CSV单元格的值：None和NaN输出为空"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return value
+
+def iter_csv(columns, rows, batch_rows=CSV_BATCH_ROWS):
+    """逐批生成CSV的字节块，第一块包含BOM和表头
+
+    Args:
+        columns: 列名列表
+        rows: 行字典的可迭代对象（可以是生成器）
+        batch_rows: 每块包含的行数
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    buffer.write(BOM)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([_cell(row.get(column)) for column in columns])
+        count += 1
+        if count >= batch_rows:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def iter_snapshot_csv(rows):
+    """导出当前快照中的一个板块/周期"""
+    return iter_csv(row_columns(rows), rows)
+
+# 历史数据导出的列：可读的时间放在最前面
+HISTORY_COLUMNS = ['time'] + history_store.COLUMNS
+
+def _history_rows(board_type, period, start, end):
+    for row in history_store.iter_range(board_type, period, start, end):
+        row['time'] = datetime.datetime.fromtimestamp(row['ts']).strftime("%Y-%m-%d %H:%M:%S")
+        yield row
+
+def iter_history_csv(board_type, period, start=None, end=None):
+    """导出历史数据库中某类板块在时间范围内的所有记录，按时间顺序逐批读取"""
+    return iter_csv(HISTORY_COLUMNS, _history_rows(board_type, period, start, end))
+
+def build_csv(rows):
+    """生成完整的CSV文件字节"""
+    return b''.join(iter_snapshot_csv(rows))
+
+def build_xlsx(rows):
+    """生成Excel文件字节"""
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        pd.DataFrame(rows).to_excel(writer, index=False, sheet_name='资金流数据')
+    return output.getvalue()
+
+BUILDERS = {'csv': build_csv, 'xlsx': build_xlsx}
+
+def get_artifact(board_type, period, version, fmt, rows):
+    """获取某个板块/周期在指定数据版本下的导出文件，缓存中没有时生成并放入缓存
+
+    多个请求同时导出同一个文件时只生成一次，其余请求等待生成结果。
+    """
+    key = (board_type, period, version, fmt)
+    while True:
+        with _cache_lock:
+            body = _cache.get(key)
+            if body is not None:
+                _cache.move_to_end(key)
+                _cache_stats['hits'] += 1
+                return body
+            event = _building.get(key)
+            if event is None:
+                event = _building[key] = threading.Event()
+                _cache_stats['misses'] += 1
+                break
+        # 其他线程正在生成，等待后重新查缓存；生成失败时由本线程重新生成
+        event.wait()
+
+    try:
+        body = BUILDERS[fmt](rows)
+        with _cache_lock:
+            _cache[key] = body
+            _cache.move_to_end(key)
+            while len(_cache) > EXPORT_CACHE_SIZE:
+                _cache.popitem(last=False)
+                _cache_stats['evictions'] += 1
+        return body
+    finally:
+        with _cache_lock:
+            _building.pop(key, None)
+        event.set()
+
+def clear_cache():
+    """清空导出文件缓存（用于测试和基准脚本）"""
+    with _cache_lock:
+        _cache.clear()
+
+def get_cache_stats():
+    """导出缓存的命中统计"""
+    with _cache_lock:
+        return dict(_cache_stats, entries=len(_cache), bytes=sum(len(body) for body in _cache.values()))
+
+def _prebuild(current_snapshot):
+    for (board_type, period), entry in current_snapshot['entries'].items():
+        for fmt in EXPORT_PREBUILD:
+            if fmt not in BUILDERS:
+                continue
+            try:
+                get_artifact(board_type, period, entry['version'], fmt, entry['rows'])
+            except Exception as e:
+                logger.error(f"Failed to prebuild {fmt} export for {board_type} {period}: {str(e)}")
+
+def _prebuild_loop():
+    """后台线程：为最新的快照预先生成导出文件"""
+    global _prebuild_pending
+    while True:
+        with _prebuild_condition:
+            while _prebuild_pending is None:
+                _prebuild_condition.wait()
+            current_snapshot, _prebuild_pending = _prebuild_pending, None
+        _prebuild(current_snapshot)
+        logger.info(f"Export files prebuilt for snapshot {current_snapshot['version']}")
+
+def prebuild_async(current_snapshot):
+    """刷新后在后台预先生成配置的导出格式（EXPORT_PREBUILD），未配置时不做任何事
+
+    后台线程忙时只保留最新的快照，中间的版本不再生成。
+    """
+    global _prebuild_pending, _prebuild_thread
+    if not EXPORT_PREBUILD or not current_snapshot:
+        return
+    with _prebuild_condition:
+        if _prebuild_thread is None:
+            _prebuild_thread = threading.Thread(target=_prebuild_loop, daemon=True, name='export-prebuild')
+            _prebuild_thread.start()
+        _prebuild_pending = current_snapshot
+        _prebuild_condition.notify_all()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地模拟的东方财富接口，用于压测刷新链路，避免频繁请求真实接口
+
+模拟两个接口，返回格式与线上一致：
+- push2 的 /api/qt/clist/get（JSONP，按 pn/pz 分页，按 fid 排序；fs=b:<板块代码> 时返回该板块的成分股）
+- datacenter-web 的 /api/data/v1/get（RPT_SECTOR_FUND_FLOW、_5、_10 报表，按 pageNumber/pageSize 分页）
+
+可以注入故障：固定延迟加随机抖动、按比例返回5xx错误、按比例截断响应体（声明完整长度后只发送一半并断开连接）、
+令牌桶限流（超出时返回429和Retry-After）。/stats 返回各类请求的计数。
+
+把应用指向模拟接口：
+    python fake_eastmoney.py --port 8900 --rows 500 --latency 0.05 --error-rate 0.05
+    EASTMONEY_PUSH2_BASE=http://127.0.0.1:8900 EASTMONEY_DATACENTER_BASE=http://127.0.0.1:8900 python app.py
+"""
+
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# clist 接口三个周期的全部数值字段，以及其中的百分比字段
+CLIST_NUMERIC_FIELDS = [
+    'f2', 'f3', 'f62', 'f184', 'f66', 'f69', 'f72', 'f75', 'f78', 'f81', 'f84', 'f87',
+    'f267', 'f268', 'f269', 'f270', 'f271', 'f272', 'f273', 'f274', 'f275', 'f276',
+    'f160', 'f161', 'f162', 'f163', 'f164', 'f165', 'f166', 'f167', 'f168', 'f169'
+]
+CLIST_PERCENT_FIELDS = {'f2', 'f3', 'f184', 'f69', 'f75', 'f81', 'f87', 'f268', 'f270', 'f272',
+                        'f274', 'f276', 'f161', 'f163', 'f165', 'f167', 'f169'}
+
+# datacenter 报表字段与各周期 clist 字段的对应关系，两个接口返回同一份数据
+DATACENTER_REPORTS = {
+    'RPT_SECTOR_FUND_FLOW': {
+        'MAIN_FORCE_NET': 'f62', 'MAIN_FORCE_NET_RATE': 'f184', 'SUPER_NET': 'f66', 'SUPER_NET_RATE': 'f69',
+        'BIG_NET': 'f72', 'BIG_NET_RATE': 'f75', 'MID_NET': 'f78', 'MID_NET_RATE': 'f81',
+        'SMALL_NET': 'f84', 'SMALL_NET_RATE': 'f87'
+    },
+    'RPT_SECTOR_FUND_FLOW_5': {
+        'MAIN_FORCE_NET': 'f267', 'MAIN_FORCE_NET_RATE': 'f268', 'SUPER_NET': 'f269', 'SUPER_NET_RATE': 'f270',
+        'BIG_NET': 'f271', 'BIG_NET_RATE': 'f272', 'MID_NET': 'f273', 'MID_NET_RATE': 'f274',
+        'SMALL_NET': 'f275', 'SMALL_NET_RATE': 'f276'
+    },
+    'RPT_SECTOR_FUND_FLOW_10': {
+        'MAIN_FORCE_NET': 'f160', 'MAIN_FORCE_NET_RATE': 'f161', 'SUPER_NET': 'f162', 'SUPER_NET_RATE': 'f163',
+        'BIG_NET': 'f164', 'BIG_NET_RATE': 'f165', 'MID_NET': 'f166', 'MID_NET_RATE': 'f167',
+        'SMALL_NET': 'f168', 'SMALL_NET_RATE': 'f169'
+    }
+}
+# clist 的 fs 参数中的板块类型与 datacenter 的 MARKET_TYPE
+MARKET_TYPES = {'2': '行业板块', '3': '概念板块'}
+
+DEFAULT_CONFIG = {
+    'latency': 0.0,        # 每个请求的固定延迟（秒）
+    'jitter': 0.0,         # 在固定延迟之上增加 0~jitter 秒的随机延迟
+    'error_rate': 0.0,     # 返回5xx错误的比例
+    'truncate_rate': 0.0,  # 截断响应体的比例
+    'rate_limit': 0.0,     # 每秒允许的请求数，0表示不限流
+    'burst': 10,           # 令牌桶容量
+    'max_page_size': 0,    # 单页最多返回的条数，0表示不限制
+}
+
+def make_universe(rows, board, seed=None):
+    """生成一个板块类型的全部模拟数据，board 为 '2'（行业）或 '3'（概念）"""
+    rng = random.Random(seed if seed is not None else int(board))
+    universe = []
+    for i in range(rows):
+        item = {'f12': f"BK{board}{i:04d}", 'f14': f"{MARKET_TYPES[board][:2]}{i}",
+                'f204': f"股票{i}", 'f205': f"{600000 + i % 4000:06d}", 'f124': int(time.time())}
+        for field in CLIST_NUMERIC_FIELDS:
+            if field in CLIST_PERCENT_FIELDS:
+                item[field] = round(rng.uniform(-10, 10), 2)
+            else:
+                item[field] = round(rng.uniform(-5e9, 5e9), 2)
+        universe.append(item)
+    return universe
+
+def make_constituents(board_id):
+    """生成一个板块的模拟成分股（10~60只），同一板块代码每次生成的结果相同"""
+    rng = random.Random(zlib.crc32(board_id.encode('utf-8')))
+    stocks = []
+    for i in range(rng.randint(10, 60)):
+        code = f"{rng.choice((600000, 0, 300000)) + rng.randrange(4000):06d}"
+        item = {'f12': code, 'f14': f"{board_id}股{i}", 'f2': round(rng.uniform(2, 200), 2),
+                'f124': int(time.time())}
+        for field in ('f3', 'f184', 'f69', 'f75', 'f81', 'f87'):
+            item[field] = round(rng.uniform(-10, 10), 2)
+        for field in ('f62', 'f66', 'f72', 'f78', 'f84'):
+            item[field] = round(rng.uniform(-5e8, 5e8), 2)
+        stocks.append(item)
+    return stocks
+
+class TokenBucket:
+    """令牌桶限流"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个令牌时返回True，令牌用完时返回False"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+class FakeEastmoneyHandler(BaseHTTPRequestHandler):
+    """处理模拟接口请求，数据和故障配置保存在 server 对象上"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        if parts.path == '/stats':
+            self.send_body(200, json.dumps(server.get_stats()).encode('utf-8'), 'application/json')
+            return
+        if parts.path == '/api/qt/clist/get':
+            build = self.clist_body
+        elif parts.path == '/api/data/v1/get':
+            build = self.datacenter_body
+        else:
+            server.count('not_found')
+            self.send_body(404, b'', 'text/plain')
+            return
+
+        config = server.config
+        if server.bucket is not None and not server.bucket.acquire():
+            server.count('rate_limited')
+            self.send_body(429, b'{"message":"too many requests"}', 'application/json', {'Retry-After': '1'})
+            return
+
+        delay = config['latency'] + (random.uniform(0, config['jitter']) if config['jitter'] else 0)
+        if delay:
+            time.sleep(delay)
+
+        if config['error_rate'] and random.random() < config['error_rate']:
+            server.count('errors')
+            self.send_body(random.choice((500, 502, 503)), b'upstream error', 'text/plain')
+            return
+
+        body, content_type = build(query)
+        if config['truncate_rate'] and random.random() < config['truncate_rate']:
+            server.count('truncated')
+            # 声明完整长度，只发送一半后断开连接，客户端会得到不完整的响应体
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+
+        server.count('ok')
+        self.send_body(200, body, content_type)
+
+    def page_args(self, query, page_key, size_key):
+        page = max(int(query.get(page_key, ['1'])[0]), 1)
+        page_size = max(int(query.get(size_key, ['20'])[0]), 1)
+        max_page_size = self.server.config['max_page_size']
+        if max_page_size:
+            page_size = min(page_size, max_page_size)
+        return page, page_size
+
+    def clist_body(self, query):
+        """clist 接口：fs=m:90+t:2 为行业板块，t:3 为概念板块"""
+        page, page_size = self.page_args(query, 'pn', 'pz')
+        fid = query.get('fid', ['f62'])[0]
+        ascending = query.get('po', ['1'])[0] == '0'
+        fs = query.get('fs', ['m:90 t:2'])[0]
+        fields = query.get('fields', [''])[0].split(',')
+        items = self.server.get_constituents(fs[2:]) if fs.startswith('b:') else self.server.universes.get(fs[-1], [])
+        universe = sorted(items, key=lambda item: item.get(fid, 0), reverse=not ascending)
+
+        rows = universe[(page - 1) * page_size:page * page_size]
+        if fields and fields != ['']:
+            rows = [{field: item[field] for field in fields if field in item} for item in rows]
+        payload = {'rc': 0, 'rt': 6, 'svr': 0, 'lt': 1, 'full': 1, 'dlmkts': '',
+                   'data': {'total': len(universe), 'diff': rows} if rows else None}
+        text = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+        callback = query.get('cb', [''])[0]
+        if callback:
+            text = f"{callback}({text});"
+        return text.encode('utf-8'), 'application/javascript; charset=utf-8'
+
+    def datacenter_body(self, query):
+        """datacenter 接口：filter 中的 MARKET_TYPE 决定板块类型"""
+        page, page_size = self.page_args(query, 'pageNumber', 'pageSize')
+        report = DATACENTER_REPORTS.get(query.get('reportName', [''])[0])
+        filter_text = query.get('filter', [''])[0]
+        board = '3' if MARKET_TYPES['3'] in filter_text else '2'
+        if report is None:
+            payload = {'version': None, 'result': None, 'success': False, 'message': '报表不存在', 'code': 9501}
+        else:
+            universe = self.server.universes.get(board, [])
+            rows = []
+            for item in universe[(page - 1) * page_size:page * page_size]:
+                row = {'SECURITY_CODE': item['f12'], 'SECURITY_NAME_ABBR': item['f14'], 'CHANGE_RATE': item['f3']}
+                row.update({column: item[field] for column, field in report.items()})
+                rows.append(row)
+            if rows:
+                pages = -(-len(universe) // page_size)
+                payload = {'version': None, 'result': {'pages': pages, 'data': rows, 'count': len(universe)},
+                           'success': True, 'message': 'ok', 'code': 0}
+            else:
+                payload = {'version': None, 'result': None, 'success': False, 'message': '返回数据为空', 'code': 9201}
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), \
+            'application/json; charset=utf-8'
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeEastmoneyServer(ThreadingHTTPServer):
+    """带数据和故障配置的模拟服务器"""
+    daemon_threads = True
+
+    def __init__(self, address, rows=500, seed=None, **config):
+        super().__init__(address, FakeEastmoneyHandler)
+        self.universes = {board: make_universe(rows, board, None if seed is None else seed + int(board))
+                          for board in MARKET_TYPES}
+        self.config = dict(DEFAULT_CONFIG)
+        self.bucket = None
+        self.configure(**config)
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+        self.constituents = {}
+
+    def configure(self, **config):
+        """运行中调整故障配置"""
+        unknown = set(config) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown options: {', '.join(sorted(unknown))}")
+        self.config.update(config)
+        rate = self.config['rate_limit']
+        self.bucket = TokenBucket(rate, self.config['burst']) if rate else None
+
+    def get_constituents(self, board_id):
+        """板块的成分股，只有模拟数据中存在的板块代码才有成分股"""
+        with self.stats_lock:
+            stocks = self.constituents.get(board_id)
+            if stocks is None:
+                known = any(item['f12'] == board_id for universe in self.universes.values() for item in universe)
+                stocks = self.constituents[board_id] = make_constituents(board_id) if known else []
+            return stocks
+
+    def count(self, outcome):
+        with self.stats_lock:
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+
+    def get_stats(self):
+        with self.stats_lock:
+            return dict(self.stats)
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+def start_server(host='127.0.0.1', port=0, rows=500, seed=None, **config):
+    """在后台线程中启动模拟接口，返回服务器对象（base_url 属性为基础地址）"""
+    server = FakeEastmoneyServer((host, port), rows=rows, seed=seed, **config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地模拟的东方财富板块资金流接口")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--rows', type=int, default=500, help="每种板块的数据条数")
+    parser.add_argument('--seed', type=int, help="随机种子")
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.0, help="附加的随机延迟上限（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回5xx错误的比例")
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help="截断响应体的比例")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="每秒允许的请求数，0为不限流")
+    parser.add_argument('--burst', type=int, default=10, help="限流的令牌桶容量")
+    parser.add_argument('--max-page-size', type=int, default=0, help="单页最多返回的条数，0为不限制")
+    args = parser.parse_args(argv)
+
+    server = FakeEastmoneyServer((args.host, args.port), rows=args.rows, seed=args.seed,
+                                 latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                 truncate_rate=args.truncate_rate, rate_limit=args.rate_limit,
+                                 burst=args.burst, max_page_size=args.max_page_size)
+    print(f"Fake eastmoney listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+向量化解析使用的数值工具
+
+按列把接口返回的原始值一次性转换为numpy数组，再统一完成缩放、四舍五入和排序。
+每个函数的结果都与 scraper.py 中逐条调用 safe_float_conversion / round / list.sort
+的结果完全一致，无法保证一致的少数值会退回到Python的逐个计算。
+"""
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+
+# 经 float64 乘法放大后的舍入误差不超过 |x|·2^-53，这里留足余量
+_HALF_TOLERANCE_FACTOR = 2.0 ** -50
+
+def records(items, keys, defaults):
+    """一次遍历取出每一行的多个字段，返回与items对应的元组列表
+
+    接口返回的每一行通常字段齐全，这时用 itemgetter 在C层面一次取出全部字段；
+    有行缺少字段时退回逐个 dict.get，缺失的字段使用defaults中对应的默认值。
+    """
+    if not keys:
+        return [() for _ in items]
+    try:
+        if len(keys) == 1:
+            return [(value,) for value in map(itemgetter(keys[0]), items)]
+        return list(map(itemgetter(*keys), items))
+    except KeyError:
+        pairs = list(zip(keys, defaults))
+        return [tuple(item.get(key, default) for key, default in pairs) for item in items]
+
+def to_float_array(values, convert):
+    """把一列原始值转换为float64数组
+
+    Args:
+        values: 原始值列表
+        convert: 单个值的转换函数（safe_float_conversion），用于非数字的值
+
+    全部是int/float时直接由numpy转换；含有字符串、None等其他类型时，
+    数字仍然直接使用，其余的值逐个交给convert，保证结果一致。
+    """
+    types = set(map(type, values))
+    if types <= {float, int}:
+        return np.array(values, dtype=np.float64)
+    return np.fromiter(
+        (value if type(value) is float else convert(value) for value in values),
+        dtype=np.float64,
+        count=len(values)
+    )
+
+def float_matrix(items, keys, defaults, convert):
+    """把多个数值字段一次性转换为 (行数, 字段数) 的float64矩阵
+
+    全部是数字或Python float()能直接解析的字符串时由numpy一次完成转换；
+    出现None、'-'、带百分号或千分位的字符串、缺失字段等情况时退回逐列 to_float_array，
+    保证每个值都与 convert（safe_float_conversion）的结果一致。
+    """
+    try:
+        values = np.fromiter(chain.from_iterable(records(items, keys, defaults)), dtype=np.float64,
+                             count=len(items) * len(keys)).reshape(len(items), len(keys))
+        # None会被numpy转成NaN，而convert把它转成默认值，含NaN时按列重新转换
+        if not np.isnan(values).any():
+            return values
+    except (TypeError, ValueError, OverflowError):
+        pass
+    columns = [list(column) for column in zip(*records(items, keys, defaults))] or [[] for _ in keys]
+    return np.array([to_float_array(column, convert) for column in columns],
+                    dtype=np.float64).reshape(len(keys), len(items)).T
+
+def scale(values, amount_count, ndigits=2):
+    """把 float_matrix 的结果换算为输出单位
+
+    前amount_count列是金额（元），换算为亿元并保留ndigits位小数；其余列是百分数，换算为小数。
+    """
+    return np.concatenate((round_half_even(values[:, :amount_count] / 1e8, ndigits),
+                           values[:, amount_count:] / 100), axis=1)
+
+def round_half_even(values, ndigits=2):
+    """与Python内置 round(x, ndigits) 逐个计算结果相同的向量化四舍五入
+
+    numpy.round 先乘以10^ndigits再取整，放大时的舍入误差会让恰好落在.5附近的值
+    取整方向与Python不同；这些值以及非有限值改用Python的round重新计算。
+    """
+    factor = 10.0 ** ndigits
+    scaled = values * factor
+    result = np.rint(scaled) / factor
+
+    with np.errstate(invalid='ignore'):
+        distance = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+        tolerance = np.maximum(np.abs(scaled) * _HALF_TOLERANCE_FACTOR, 1e-12)
+        suspicious = ~np.isfinite(scaled) | (distance <= tolerance)
+    # 用扁平下标同时支持一维和二维数组
+    for i in np.flatnonzero(suspicious).tolist():
+        result.flat[i] = round(float(values.flat[i]), ndigits)
+    return result
+
+def descending_order(keys):
+    """返回与 list.sort(key=..., reverse=True) 相同的稳定降序下标
+
+    排序键含有NaN时Python的比较结果取决于元素顺序，无法向量化，返回None由调用方退回逐行排序。
+    """
+    if np.isnan(keys).any():
+        return None
+    return np.argsort(-keys, kind='stable')
@@ -0,0 +1,135 @@
+"""
+按需抓取数据的缓存层：快照未命中时的直接抓取、板块成分股等
+
+- 同一个键同时只有一个抓取在进行，其余请求等待它的结果（single-flight）
+- 结果在有效期（TTL）内直接返回；过期后、但距抓取还不到 max_stale 秒时先返回旧值，
+  同时在后台重新抓取（stale-while-revalidate），超过后请求等待新结果
+- 抓取在每个缓存自己的固定大小线程池中执行，请求线程最多等待 wait 秒，
+  大量请求同时未命中时也不会占满Web服务器的工作线程
+- 键的数量有上限，超过后淘汰最久未使用的
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+FETCH_CACHE_TTL = float(os.environ.get('FETCH_CACHE_TTL', '60'))
+FETCH_CACHE_MAX_STALE = float(os.environ.get('FETCH_CACHE_MAX_STALE', '600'))
+FETCH_CACHE_WAIT = float(os.environ.get('FETCH_CACHE_WAIT', '10'))
+FETCH_CACHE_WORKERS = int(os.environ.get('FETCH_CACHE_WORKERS', '2'))
+
+class FetchTimeout(Exception):
+    """等待抓取结果超时，且没有可用的旧值"""
+
+class CoalescingCache:
+    """合并并发抓取、过期后先返回旧值的LRU缓存"""
+
+    def __init__(self, name, size, ttl, max_stale, wait=FETCH_CACHE_WAIT, workers=FETCH_CACHE_WORKERS):
+        """
+        Args:
+            name: 缓存名，用于日志和指标
+            size: 键数上限
+            ttl: 有效期（秒），也可以是返回有效期的函数，在保存结果时计算
+            max_stale: 从抓取时算起，过期的结果还可以先返回的时间（秒），不大于ttl时不返回旧值
+            wait: 请求等待抓取结果的最长时间（秒）
+            workers: 抓取线程数
+        """
+        self.name = name
+        self.size = size
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.wait = wait
+        # key -> {'value', 'fetched_at', 'expires_at'}
+        self._entries = OrderedDict()
+        # key -> 正在进行的抓取 {'event', 'value', 'error'}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"fetch-{name}")
+
+    def _run(self, key, loader, flight):
+        """在线程池中执行抓取，保存结果并唤醒等待的请求"""
+        try:
+            value = loader()
+            ttl = self.ttl() if callable(self.ttl) else self.ttl
+            now = time.monotonic()
+            with self._lock:
+                self._entries[key] = {'value': value, 'fetched_at': now, 'expires_at': now + ttl}
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+            flight['value'] = value
+        except Exception as e:
+            logger.error(f"Error fetching {key} for {self.name} cache: {str(e)}")
+            flight['error'] = e
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight['event'].set()
+
+    def _start(self, key, loader):
+        """启动抓取（调用方持有锁），已经在抓取时返回正在进行的那一个"""
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = self._inflight[key] = {'event': threading.Event(), 'value': None, 'error': None}
+            self._executor.submit(self._run, key, loader, flight)
+            return flight, True
+        return flight, False
+
+    def _count(self, result):
+        metrics.inc('fund_flow_fetch_cache_requests_total', cache=self.name, result=result)
+
+    def get(self, key, loader):
+        """取出key对应的值，过期或不存在时用loader()抓取
+
+        Args:
+            key: 缓存键，例如 (board_type, period)
+            loader: 无参数的抓取函数
+
+        Returns:
+            缓存或抓取到的值
+
+        Raises:
+            FetchTimeout: 等待超过 wait 秒仍没有结果，且没有可以返回的旧值
+            Exception: 抓取失败且没有可以返回的旧值时，抛出抓取的异常
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry['expires_at']:
+                self._entries.move_to_end(key)
+                self._count('hit')
+                return entry['value']
+            flight, started = self._start(key, loader)
+            if entry is not None and now < entry['fetched_at'] + self.max_stale:
+                # 先返回旧值，后台抓取完成后下一个请求就能拿到新值
+                self._count('stale')
+                return entry['value']
+
+        self._count('miss' if started else 'coalesced')
+        if not flight['event'].wait(self.wait):
+            logger.warning(f"Fetching {key} for {self.name} cache did not finish within {self.wait}s")
+            raise FetchTimeout(f"fetching {key} timed out")
+        if flight['error'] is not None:
+            raise flight['error']
+        return flight['value']
+
+    def get_stats(self):
+        """缓存状态"""
+        with self._lock:
+            return {'entries': len(self._entries), 'inflight': len(self._inflight), 'size': self.size}
+
+# 快照中没有的板块/周期组合直接抓取的结果
+_default = CoalescingCache('combo', 32, FETCH_CACHE_TTL, FETCH_CACHE_MAX_STALE)
+
+def get(key, loader):
+    """从快照未命中时使用的缓存中取值，见 CoalescingCache.get"""
+    return _default.get(key, loader)
+
+def get_stats():
+    return _default.get_stats()
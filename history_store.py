@@ -0,0 +1,234 @@
+"""
+历史数据存储模块：把每轮刷新的快照批量写入SQLite，
+按 (board_id, period, ts) 建主键，并为按时间点查询建立索引
+"""
+import os
+import queue
+import sqlite3
+import logging
+import datetime
+import threading
+from contextlib import closing
+
+from cloud_storage import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# 数值字段，按原样存储为REAL
+NUMERIC_FIELDS = [
+    'change_percent',
+    'main_inflow', 'main_inflow_percent',
+    'super_large_inflow', 'super_large_inflow_percent',
+    'large_inflow', 'large_inflow_percent',
+    'medium_inflow', 'medium_inflow_percent',
+    'net_inflow', 'net_inflow_percent'
+]
+TEXT_FIELDS = ['name', 'stock_name', 'stock_code']
+COLUMNS = ['board_id', 'period', 'ts', 'board_type'] + TEXT_FIELDS + NUMERIC_FIELDS
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS board_history (
+    board_id TEXT NOT NULL,
+    period TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    board_type TEXT NOT NULL,
+    {', '.join(f'{field} TEXT' for field in TEXT_FIELDS)},
+    {', '.join(f'{field} REAL' for field in NUMERIC_FIELDS)},
+    PRIMARY KEY (board_id, period, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_board_history_ts ON board_history (board_type, period, ts);
+"""
+
+# 写入队列的长度上限，写入线程跟不上时丢弃最旧的快照而不是阻塞刷新
+MAX_PENDING = 32
+
+_queue = queue.Queue(maxsize=MAX_PENDING)
+_writer_thread = None
+_writer_lock = threading.Lock()
+# 已经建好表的数据库路径
+_initialized = set()
+_init_lock = threading.Lock()
+# 所有写入共用一个连接，由 _write_lock 保护
+_write_conn = None
+_write_path = None
+_write_lock = threading.Lock()
+
+def get_db_path():
+    """获取历史数据库路径，可通过环境变量 HISTORY_DB_PATH 覆盖"""
+    return os.environ.get('HISTORY_DB_PATH') or os.path.join(get_cache_dir(), 'history.db')
+
+def _init_db(path):
+    """每个数据库文件只建一次表并切换到WAL模式（WAL设置保存在文件中，对之后的连接都有效）"""
+    with _init_lock:
+        if path in _initialized:
+            return
+        with closing(sqlite3.connect(path, timeout=30)) as conn:
+            # WAL模式下读请求不会被写入阻塞
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        _initialized.add(path)
+
+def _connect():
+    """打开一个只在本次查询中使用的连接，调用方负责关闭"""
+    path = get_db_path()
+    _init_db(path)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _writer_connection():
+    """写入共用的连接（调用方持有 _write_lock），数据库路径变化时重新打开"""
+    global _write_conn, _write_path
+    path = get_db_path()
+    if _write_conn is None or _write_path != path:
+        if _write_conn is not None:
+            _write_conn.close()
+        _init_db(path)
+        _write_conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        _write_conn.execute('PRAGMA synchronous=NORMAL')
+        _write_path = path
+    return _write_conn
+
+def _to_number(value):
+    """将字段值转换为数字，带百分号的字符串按百分比处理"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.replace(',', '').strip()
+        try:
+            if text.endswith('%'):
+                return float(text[:-1]) / 100
+            return float(text)
+        except ValueError:
+            return None
+    return None
+
+def snapshot_rows(cached_data, ts):
+    """把 cache_data() 的结果展开成待写入的行"""
+    rows = []
+    for board_type, periods in (cached_data or {}).items():
+        if not isinstance(periods, dict):
+            continue
+        for period, items in periods.items():
+            for item in items or []:
+                board_id = item.get('id') or item.get('name')
+                if not board_id:
+                    continue
+                row = [board_id, period, ts, board_type]
+                row.extend(item.get(field) for field in TEXT_FIELDS)
+                row.extend(_to_number(item.get(field)) for field in NUMERIC_FIELDS)
+                rows.append(row)
+    return rows
+
+def write_snapshot(cached_data, ts):
+    """在当前线程中批量写入一个快照，返回写入的行数"""
+    rows = snapshot_rows(cached_data, ts)
+    if not rows:
+        return 0
+    placeholders = ', '.join('?' for _ in COLUMNS)
+    with _write_lock:
+        conn = _writer_connection()
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO board_history ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                rows
+            )
+    return len(rows)
+
+def _writer_loop():
+    """后台写入线程"""
+    while True:
+        cached_data, ts = _queue.get()
+        try:
+            count = write_snapshot(cached_data, ts)
+            logger.info(f"History snapshot at {ts} stored ({count} rows)")
+        except Exception as e:
+            logger.error(f"Failed to store history snapshot: {str(e)}")
+        finally:
+            _queue.task_done()
+
+def record_snapshot(cached_data, when=None):
+    """把一轮刷新的结果放入写入队列，由后台线程写入，不阻塞调用方"""
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None:
+            _writer_thread = threading.Thread(target=_writer_loop, daemon=True, name='history-writer')
+            _writer_thread.start()
+
+    ts = int((when or datetime.datetime.now()).timestamp())
+    try:
+        _queue.put_nowait((cached_data, ts))
+    except queue.Full:
+        logger.warning("History writer is falling behind, dropping snapshot")
+
+def flush():
+    """等待写入队列清空（用于测试和退出前）"""
+    _queue.join()
+
+def query_board_history(board_id, period='today', start=None, end=None, limit=None):
+    """查询单个板块在时间范围内的历史数据，按时间升序返回
+
+    Args:
+        board_id: 板块代码
+        period: 'today'、'5days' 或 '10days'
+        start/end: 时间范围（Unix时间戳，秒），为None时不限制
+        limit: 最多返回的条数，超过时返回最近的 limit 条
+    """
+    sql = f"SELECT {', '.join(COLUMNS)} FROM board_history WHERE board_id = ? AND period = ?"
+    params = [board_id, period]
+    if start is not None:
+        sql += " AND ts >= ?"
+        params.append(int(start))
+    if end is not None:
+        sql += " AND ts <= ?"
+        params.append(int(end))
+    if limit:
+        # 先倒序取最近的 limit 条，再还原为升序
+        sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(int(limit))
+    else:
+        sql += " ORDER BY ts"
+    with closing(_connect()) as conn:
+        rows = [dict(row) for row in conn.execute(sql, params)]
+    if limit:
+        rows.reverse()
+    return rows
+
+def iter_range(board_type, period, start=None, end=None, batch_size=500):
+    """按时间顺序逐批遍历某类板块在时间范围内的所有行，内存占用与总行数无关"""
+    sql = f"SELECT {', '.join(COLUMNS)} FROM board_history WHERE board_type = ? AND period = ?"
+    params = [board_type, period]
+    if start is not None:
+        sql += " AND ts >= ?"
+        params.append(int(start))
+    if end is not None:
+        sql += " AND ts <= ?"
+        params.append(int(end))
+    sql += " ORDER BY ts, main_inflow DESC"
+
+    with closing(_connect()) as conn:
+        cursor = conn.execute(sql, params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield dict(row)
+
+def query_snapshot_at(board_type, period, ts):
+    """查询某个时间点（不晚于ts的最近一次刷新）的完整板块列表"""
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT MAX(ts) FROM board_history WHERE ts <= ? AND board_type = ? AND period = ?",
+            (int(ts), board_type, period)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return []
+        cursor = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM board_history "
+            "WHERE ts = ? AND board_type = ? AND period = ? ORDER BY main_inflow DESC",
+            (row[0], board_type, period)
+        )
+        return [dict(item) for item in cursor]
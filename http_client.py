@@ -0,0 +1,168 @@
+"""
+共享的HTTP客户端模块：按主机复用keep-alive连接池、gzip压缩协商、
+有上限的指数退避重试以及单主机并发上限，供 scraper.py 和 data_validator.py 使用
+"""
+import os
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 每个主机连接池保留的连接数
+POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '8'))
+# 失败后的最大重试次数（不含首次请求）
+MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', '2'))
+# 指数退避的基准等待时间和上限（秒）
+BACKOFF_BASE = float(os.environ.get('HTTP_BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = float(os.environ.get('HTTP_BACKOFF_MAX', '4'))
+# 同一主机同时进行中的请求数上限
+PER_HOST_CONCURRENCY = int(os.environ.get('HTTP_PER_HOST_CONCURRENCY', '4'))
+
+# 需要重试的HTTP状态码
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive"
+}
+
+_session = None
+_session_lock = threading.Lock()
+_host_semaphores = {}
+_host_stats = {}
+_stats_lock = threading.Lock()
+
+def get_session():
+    """获取全局共享的Session，首次调用时创建"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+def _get_host_semaphore(host):
+    """获取限制单主机并发的信号量"""
+    with _stats_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(PER_HOST_CONCURRENCY)
+            _host_semaphores[host] = semaphore
+        return semaphore
+
+def _record(host, seconds, retried=False, failed=False):
+    """记录一次请求的耗时和结果"""
+    with _stats_lock:
+        stats = _host_stats.setdefault(host, {'requests': 0, 'retries': 0, 'errors': 0, 'total_seconds': 0.0})
+        stats['requests'] += 1
+        stats['total_seconds'] += seconds
+        if retried:
+            stats['retries'] += 1
+        if failed:
+            stats['errors'] += 1
+
+def _backoff_delay(attempt):
+    """计算第attempt次重试前的等待时间（带随机抖动）"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+def get(url, headers=None, timeout=10, max_retries=None):
+    """发送GET请求，连接错误和可重试状态码会按指数退避重试
+
+    读取超时不重试：服务端已经接受了请求却迟迟不返回，重试多半同样超时，
+    主接口和备用接口各重试几次就会超过单轮刷新的截止时间（REFRESH_DEADLINE），
+    不如直接失败，交给调用方改用下一个数据源。
+
+    Args:
+        url: 请求地址
+        headers: 额外的请求头
+        timeout: 单次请求超时时间（秒）
+        max_retries: 最大重试次数，默认使用 MAX_RETRIES
+
+    Returns:
+        最后一次请求的 requests.Response；所有尝试都发生连接错误时抛出最后一个异常
+    """
+    host = urlsplit(url).hostname or ''
+    semaphore = _get_host_semaphore(host)
+    session = get_session()
+    max_retries = MAX_RETRIES if max_retries is None else max_retries
+
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        response = None
+        error = None
+        try:
+            with semaphore:
+                response = session.get(url, headers=headers, timeout=timeout)
+        except requests.RequestException as e:
+            error = e
+
+        should_retry = error is not None or response.status_code in RETRY_STATUS_CODES
+        _record(host, time.perf_counter() - start, retried=attempt > 0, failed=should_retry)
+
+        if not should_retry or attempt >= max_retries or isinstance(error, requests.exceptions.ReadTimeout):
+            if error is not None:
+                raise error
+            return response
+
+        delay = _backoff_delay(attempt)
+        if response is not None and response.status_code == 429:
+            # 被限流时遵守服务端给出的 Retry-After（秒），但不超过退避上限
+            try:
+                delay = max(delay, min(float(response.headers.get('Retry-After', 0)), BACKOFF_MAX))
+            except ValueError:
+                pass
+        reason = str(error) if error is not None else f"status {response.status_code}"
+        logger.warning(f"Request to {host} failed ({reason}), retry {attempt + 1}/{max_retries} in {delay:.2f}s")
+        attempt += 1
+        time.sleep(delay)
+
+def get_stats():
+    """获取每个主机的请求统计，包括新建连接数（即TCP/TLS握手次数）"""
+    with _stats_lock:
+        stats = {host: dict(values) for host, values in _host_stats.items()}
+
+    # 从urllib3连接池读取新建连接数
+    if _session is not None:
+        for adapter in set(_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host_stats = stats.setdefault(pool.host, {'requests': 0, 'retries': 0, 'errors': 0, 'total_seconds': 0.0})
+                host_stats['connections'] = host_stats.get('connections', 0) + pool.num_connections
+
+    for host_stats in stats.values():
+        host_stats.setdefault('connections', 0)
+        requests_count = host_stats['requests']
+        host_stats['avg_ms'] = round(host_stats['total_seconds'] * 1000 / requests_count, 1) if requests_count else 0.0
+    return stats
+
+def diff_stats(before, after):
+    """计算两次 get_stats() 之间的增量，用于统计单轮刷新的请求情况"""
+    result = {}
+    for host, values in after.items():
+        old = before.get(host, {})
+        requests_count = values['requests'] - old.get('requests', 0)
+        total_seconds = values['total_seconds'] - old.get('total_seconds', 0.0)
+        result[host] = {
+            'requests': requests_count,
+            'retries': values['retries'] - old.get('retries', 0),
+            'errors': values['errors'] - old.get('errors', 0),
+            'connections': values['connections'] - old.get('connections', 0),
+            'avg_ms': round(total_seconds * 1000 / requests_count, 1) if requests_count else 0.0
+        }
+    return result
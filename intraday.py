@@ -0,0 +1,190 @@
+"""
+板块日内分钟级资金流曲线
+
+每个板块占用一段固定大小的缓冲区：240个交易分钟 x 4个字段（主力、超大单、大单、中单净流入，亿元），
+全部板块共用一个预先分配的 numpy 数组（INTRADAY_MAX_BOARDS x 240 x 4，float32），
+内存占用只取决于板块数上限，与刷新次数和运行时长无关。新的交易日开始时整块清空重用。
+
+数据来自每轮刷新的今日数据：把各板块的累计净流入写入刷新时刻所在的分钟，
+不额外请求接口（逐个板块请求分钟K线接口会让每轮刷新的请求数乘以板块数）。
+两次刷新之间的分钟没有数据，相邻两点的差就是这段时间流入的资金。
+进程重启或新worker启动后，从历史数据库中补齐当天已经记录的数据。
+"""
+import os
+import math
+import logging
+import datetime
+import threading
+
+import numpy as np
+
+import scheduler
+import history_store
+
+logger = logging.getLogger(__name__)
+
+INTRADAY_MAX_BOARDS = int(os.environ.get('INTRADAY_MAX_BOARDS', '1000'))
+MINUTES = 240
+FIELDS = ['main_inflow', 'super_large_inflow', 'large_inflow', 'medium_inflow']
+
+_lock = threading.Lock()
+_buffer = np.full((INTRADAY_MAX_BOARDS, MINUTES, len(FIELDS)), np.nan, dtype=np.float32)
+# (board_type, board_id) -> 在 _buffer 中的下标
+_slots = {}
+# 缓冲区中数据所属的交易日
+_day = None
+_full_warned = False
+
+def minute_index(moment):
+    """交易所时间moment对应的分钟下标（0~239），开盘前返回None
+
+    每分钟以结束时刻为准：(9:30, 9:31] 为第0分钟，(13:00, 13:01] 为第120分钟，开盘时刻本身也计入第0分钟；
+    午休时计入上午最后一分钟，收盘后计入最后一分钟。
+    """
+    (morning_open, morning_close), (afternoon_open, afternoon_close) = [
+        (datetime.datetime.combine(moment.date(), start, moment.tzinfo),
+         datetime.datetime.combine(moment.date(), end, moment.tzinfo))
+        for start, end in scheduler.SESSIONS
+    ]
+    if moment < morning_open:
+        return None
+    if moment < afternoon_open:
+        seconds = (min(moment, morning_close) - morning_open).total_seconds()
+        return min(max(math.ceil(seconds / 60) - 1, 0), MINUTES // 2 - 1)
+    seconds = (min(moment, afternoon_close) - afternoon_open).total_seconds()
+    return min(MINUTES // 2 + max(math.ceil(seconds / 60) - 1, 0), MINUTES - 1)
+
+def minute_label(index):
+    """分钟下标对应的时间标签（该分钟结束的时刻），例如 0 -> 09:31，120 -> 13:01"""
+    start, _ = scheduler.SESSIONS[0] if index < MINUTES // 2 else scheduler.SESSIONS[1]
+    offset = index % (MINUTES // 2) + 1
+    minutes = start.hour * 60 + start.minute + offset
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return np.nan
+
+def _reset(day):
+    """新的交易日：清空缓冲区和板块分配"""
+    global _day, _full_warned
+    _buffer.fill(np.nan)
+    _slots.clear()
+    _day = day
+    _full_warned = False
+
+def _slot(board_type, board_id):
+    """板块在缓冲区中的下标，缓冲区已满时返回None"""
+    global _full_warned
+    key = (board_type, board_id)
+    slot = _slots.get(key)
+    if slot is None:
+        if len(_slots) >= INTRADAY_MAX_BOARDS:
+            if not _full_warned:
+                logger.warning(f"Intraday buffer is full ({INTRADAY_MAX_BOARDS} boards), ignoring new boards today")
+                _full_warned = True
+            return None
+        slot = _slots[key] = len(_slots)
+    return slot
+
+def _write(board_type, rows, minute):
+    slots = []
+    values = []
+    for row in rows:
+        board_id = row.get('id')
+        if not board_id:
+            continue
+        slot = _slot(board_type, board_id)
+        if slot is None:
+            continue
+        slots.append(slot)
+        values.append([_number(row.get(field)) for field in FIELDS])
+    if slots:
+        _buffer[np.array(slots), minute] = np.array(values, dtype=np.float32)
+    return len(slots)
+
+def _backfill(day):
+    """从历史数据库中补齐当天已经记录的今日数据（调用方持有锁）"""
+    day_open = datetime.datetime.combine(day, scheduler.SESSIONS[0][0], scheduler.TZ)
+    day_close = datetime.datetime.combine(day, scheduler.SESSIONS[-1][1], scheduler.TZ)
+    count = 0
+    for board_type in scheduler.BOARD_TYPES:
+        batch = []
+        batch_ts = None
+        # 历史数据按时间排序，同一次刷新的行一起写入
+        for row in history_store.iter_range(board_type, 'today', day_open.timestamp(),
+                                            day_close.timestamp() + scheduler.REFRESH_CLOSE_DELAY * 2):
+            if row['ts'] != batch_ts and batch:
+                count += _write(board_type, [dict(item, id=item['board_id']) for item in batch],
+                                minute_index(datetime.datetime.fromtimestamp(batch_ts, scheduler.TZ)))
+                batch = []
+            batch_ts = row['ts']
+            batch.append(row)
+        if batch:
+            count += _write(board_type, [dict(item, id=item['board_id']) for item in batch],
+                            minute_index(datetime.datetime.fromtimestamp(batch_ts, scheduler.TZ)))
+    if count:
+        logger.info(f"Intraday buffers backfilled with {count} samples from history")
+
+def record(cached_data, when=None):
+    """记录一轮刷新的今日数据，非交易日和开盘前的数据不记录
+
+    Args:
+        cached_data: cache_data() 的结果
+        when: 数据的时间（本地时间或带时区的时间），默认为当前时间
+    """
+    moment = when.astimezone(scheduler.TZ) if when is not None else scheduler.now()
+    if not scheduler.is_trading_day(moment.date()):
+        return 0
+    minute = minute_index(moment)
+    if minute is None:
+        return 0
+    try:
+        with _lock:
+            if _day != moment.date():
+                _reset(moment.date())
+                try:
+                    _backfill(moment.date())
+                except Exception as e:
+                    logger.error(f"Failed to backfill intraday buffers: {str(e)}")
+            count = 0
+            for board_type, periods in (cached_data or {}).items():
+                if isinstance(periods, dict) and periods.get('today'):
+                    count += _write(board_type, periods['today'], minute)
+            return count
+    except Exception as e:
+        logger.error(f"Failed to record intraday data: {str(e)}")
+        return 0
+
+def get_series(board_id, board_type=None):
+    """板块当天有数据的分钟及各字段的累计净流入（亿元），板块不存在时返回None
+
+    Returns:
+        {'board_id', 'board_type', 'date', 'points': [{'time': '09:35', 'main_inflow': ..., ...}]}
+    """
+    with _lock:
+        if board_type is None:
+            board_type = next((key[0] for key in _slots if key[1] == board_id), None)
+        slot = _slots.get((board_type, board_id))
+        if slot is None:
+            return None
+        series = _buffer[slot].copy()
+        day = _day
+    filled = np.flatnonzero(~np.isnan(series).all(axis=1))
+    points = []
+    for minute in filled.tolist():
+        point = {'time': minute_label(minute)}
+        for field, value in zip(FIELDS, series[minute].tolist()):
+            point[field] = None if value != value else round(value, 2)
+        points.append(point)
+    return {'board_id': board_id, 'board_type': board_type, 'date': day.isoformat(), 'points': points}
+
+def get_stats():
+    """缓冲区占用情况"""
+    with _lock:
+        return {'date': _day.isoformat() if _day else None, 'boards': len(_slots),
+                'max_boards': INTRADAY_MAX_BOARDS, 'bytes': _buffer.nbytes}
@@ -0,0 +1,67 @@
+"""
+刷新任务的主进程选举
+
+同一台机器上的多个 gunicorn/waitress worker 通过一个文件锁选出唯一的主进程：
+持有锁的进程负责抓取数据并发布共享快照，其他进程只读取共享快照。
+锁随进程退出由操作系统自动释放，其他进程轮询时会接替成为主进程。
+"""
+import os
+import logging
+import threading
+
+from cloud_storage import get_cache_dir
+
+try:
+    import fcntl
+except ImportError:
+    # Windows没有fcntl，使用msvcrt的文件区域锁
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+_lock_file = None
+_lock = threading.Lock()
+
+def get_lock_path():
+    """获取锁文件路径，可通过环境变量 REFRESH_LOCK_PATH 覆盖"""
+    return os.environ.get('REFRESH_LOCK_PATH') or os.path.join(get_cache_dir(), 'refresh.lock')
+
+def _try_lock(f):
+    """以非阻塞方式加锁，锁已被其他进程持有时返回False"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def try_acquire():
+    """尝试成为主进程，已经是主进程或加锁成功时返回True"""
+    global _lock_file
+    with _lock:
+        if _lock_file is not None:
+            return True
+        try:
+            f = open(get_lock_path(), 'a+')
+        except OSError as e:
+            logger.error(f"Failed to open refresh lock file: {str(e)}")
+            return False
+        if not _try_lock(f):
+            f.close()
+            return False
+        # 写入进程号便于排查，锁本身不依赖文件内容
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        _lock_file = f
+        logger.info(f"Process {os.getpid()} became the refresh leader")
+        return True
+
+def is_leader():
+    """当前进程是否为主进程"""
+    return _lock_file is not None
@@ -0,0 +1,207 @@
+"""
+Prometheus文本格式的运行指标
+
+请求路径上的计数不加锁：每个线程把计数写入自己的分片（threading.local），
+只有 /metrics 输出时才把所有线程的分片合并。线程退出后它的分片会在下一个新线程
+注册时并入汇总分片，waitress/开发服务器为每个请求新建线程时分片数也不会无限增长。
+
+每个进程只报告本进程的指标，多个worker时由Prometheus分别抓取或按pid区分。
+"""
+import time
+import threading
+from bisect import bisect_left
+
+# 默认的耗时分桶（秒），覆盖从亚毫秒级的API响应到几十秒的整轮刷新
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 响应体大小分桶（字节）
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# 指标定义：name -> {'type', 'help', 'buckets'}
+_definitions = {}
+# 输出时计算的指标：name -> 返回 [(labels字典, 值)] 的函数
+_gauges = {}
+
+_local = threading.local()
+# (线程, 分片) 列表，只在新线程注册和合并时加锁
+_shards = []
+_shards_lock = threading.Lock()
+
+def _new_shard():
+    return {'counters': {}, 'histograms': {}}
+
+# 已退出线程的分片合并到这里
+_retired = _new_shard()
+
+def counter(name, help_text):
+    """声明一个计数器"""
+    _definitions[name] = {'type': 'counter', 'help': help_text}
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    """声明一个直方图"""
+    _definitions[name] = {'type': 'histogram', 'help': help_text, 'buckets': tuple(buckets)}
+
+def gauge(name, help_text, collect):
+    """声明一个在输出时计算的仪表值，collect() 返回 [(labels字典, 值)]"""
+    _definitions[name] = {'type': 'gauge', 'help': help_text}
+    _gauges[name] = collect
+
+def _merge_into(target, shard):
+    for key, value in shard['counters'].items():
+        target['counters'][key] = target['counters'].get(key, 0) + value
+    for key, (buckets, total, count) in shard['histograms'].items():
+        merged = target['histograms'].get(key)
+        if merged is None:
+            target['histograms'][key] = [list(buckets), total, count]
+        else:
+            for i, value in enumerate(buckets):
+                merged[0][i] += value
+            merged[1] += total
+            merged[2] += count
+
+def _register_shard():
+    """为当前线程创建分片，同时回收已退出线程的分片"""
+    shard = _new_shard()
+    with _shards_lock:
+        alive = []
+        for thread, old in _shards:
+            if thread.is_alive():
+                alive.append((thread, old))
+            else:
+                # 线程已经退出，不会再写入这个分片，可以安全合并
+                _merge_into(_retired, old)
+        alive.append((threading.current_thread(), shard))
+        _shards[:] = alive
+    _local.shard = shard
+    return shard
+
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        return _register_shard()
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+def inc(name, value=1, **labels):
+    """计数器加上value"""
+    counters = _shard()['counters']
+    key = _key(name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """直方图记录一个观测值"""
+    histograms = _shard()['histograms']
+    key = _key(name, labels)
+    entry = histograms.get(key)
+    if entry is None:
+        buckets = _definitions[name]['buckets']
+        # 各桶分别计数，最后一个位置是超过最大分桶的部分，输出时再累加
+        entry = histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+    entry[0][bisect_left(_definitions[name]['buckets'], value)] += 1
+    entry[1] += value
+    entry[2] += 1
+
+class timer:
+    """记录代码块耗时的上下文管理器：with metrics.timer('name', label=...):"""
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+def collect():
+    """合并所有线程的分片，返回 {'counters': {...}, 'histograms': {...}}"""
+    merged = _new_shard()
+    with _shards_lock:
+        # 新线程注册时会在锁内把退出线程的分片并入 _retired，合并它也要持有锁
+        _merge_into(merged, _retired)
+        shards = [shard for _, shard in _shards]
+    for shard in shards:
+        # 其他线程可能正在写入，复制一份再合并（dict复制在GIL下是原子的）
+        _merge_into(merged, {'counters': shard['counters'].copy(),
+                             'histograms': {key: (list(value[0]), value[1], value[2])
+                                            for key, value in shard['histograms'].copy().items()}})
+    return merged
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ''
+    escaped = []
+    for key, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def render():
+    """生成Prometheus文本格式（0.0.4）的输出"""
+    data = collect()
+    by_name = {}
+    for (name, labels), value in data['counters'].items():
+        by_name.setdefault(name, []).append((labels, value))
+    for (name, labels), value in data['histograms'].items():
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(_definitions):
+        definition = _definitions[name]
+        lines.append(f"# HELP {name} {definition['help']}")
+        lines.append(f"# TYPE {name} {definition['type']}")
+        if definition['type'] == 'gauge':
+            try:
+                samples = _gauges[name]()
+            except Exception:
+                samples = []
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        elif definition['type'] == 'counter':
+            for labels, value in sorted(by_name.get(name, [])):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        else:
+            for labels, (buckets, total, count) in sorted(by_name.get(name, []), key=lambda item: item[0]):
+                cumulative = 0
+                for bound, value in zip(definition['buckets'] + (float('inf'),), buckets):
+                    cumulative += value
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(float(bound)))])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+def reset():
+    """清空所有计数（用于测试和基准脚本）"""
+    global _retired
+    with _shards_lock:
+        for _, shard in _shards:
+            shard['counters'].clear()
+            shard['histograms'].clear()
+        _retired = _new_shard()
+
+# 抓取链路
+histogram('fund_flow_upstream_seconds', "Time spent fetching one board/period combo from each data source")
+counter('fund_flow_upstream_total', "Fetch attempts per data source and outcome")
+histogram('fund_flow_combo_seconds', "Time to refresh one board/period combination including fallbacks")
+counter('fund_flow_combo_source_total', "Data source that served each board/period refresh")
+histogram('fund_flow_parse_seconds', "Time spent parsing upstream rows")
+histogram('fund_flow_refresh_cycle_seconds', "Duration of a full refresh cycle")
+# API
+histogram('fund_flow_http_request_seconds', "HTTP request latency per route")
+histogram('fund_flow_http_response_bytes', "HTTP response body size per route", SIZE_BUCKETS)
+counter('fund_flow_cache_requests_total', "Board data lookups served from the snapshot (hit) or passed to the fetch cache (miss)")
+counter('fund_flow_fetch_cache_requests_total', "On-demand fetch cache lookups by cache and result (hit, stale, coalesced, miss)")
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线微基准：用 fixtures/ 中保存的接口响应测量解析、缓存读取、JSON序列化和导出的耗时
+
+fixtures/ 中每种规模（20、500、5000条）各有一份 clist 接口的JSONP响应和一份
+datacenter 接口的JSON响应（gzip压缩），格式与线上接口一致，运行时不访问网络。
+
+用法：
+    python microbenchmark.py run [--sizes 20,500,5000] [--save baseline.json]
+    python microbenchmark.py compare baseline.json [--threshold 0.25]
+    python microbenchmark.py record        # 重新生成 fixtures/ 中的响应文件
+"""
+
+import gc
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SIZES = (20, 500, 5000)
+# 每个用例至少运行的次数和总时长（秒）
+MIN_RUNS = 5
+MIN_SECONDS = 0.3
+# compare 模式下最短耗时变慢超过这个比例、且绝对差值超过噪声下限（毫秒）时判定为性能退化
+DEFAULT_THRESHOLD = 0.25
+NOISE_FLOOR_MS = 0.05
+
+# clist 接口今日周期返回的数值字段：金额字段（元）和百分比字段
+CLIST_AMOUNT_FIELDS = ['f62', 'f66', 'f72', 'f78', 'f84']
+CLIST_PERCENT_FIELDS = ['f2', 'f3', 'f184', 'f69', 'f75', 'f81', 'f87']
+DATACENTER_AMOUNT_FIELDS = ['MAIN_FORCE_NET', 'SUPER_NET', 'BIG_NET', 'MID_NET', 'SMALL_NET']
+DATACENTER_PERCENT_FIELDS = ['CHANGE_RATE', 'MAIN_FORCE_NET_RATE', 'SUPER_NET_RATE', 'BIG_NET_RATE',
+                             'MID_NET_RATE', 'SMALL_NET_RATE']
+
+def fixture_path(kind, rows):
+    """fixtures/ 中某种接口、某个规模的响应文件路径"""
+    extension = 'jsonp' if kind == 'clist' else 'json'
+    return os.path.join(FIXTURE_DIR, f"{kind}_{rows}.{extension}.gz")
+
+def make_clist_response(rows, seed):
+    """生成 push2 clist 接口（fltt=2）的JSONP响应文本，约1%的数值为停牌时的 '-'"""
+    rng = random.Random(seed)
+    diff = []
+    for i in range(rows):
+        item = {'f12': f"BK{i:04d}", 'f14': f"板块{i}", 'f124': 1700000000 + i,
+                'f204': f"股票{i}", 'f205': f"{600000 + i % 4000:06d}"}
+        for field in CLIST_AMOUNT_FIELDS:
+            item[field] = round(rng.uniform(-5e9, 5e9), 2)
+        for field in CLIST_PERCENT_FIELDS:
+            item[field] = round(rng.uniform(-10, 10), 2)
+        if rng.random() < 0.01:
+            item[rng.choice(CLIST_AMOUNT_FIELDS + CLIST_PERCENT_FIELDS)] = '-'
+        diff.append(item)
+    diff.sort(key=lambda item: item['f62'] if item['f62'] != '-' else 0, reverse=True)
+    payload = {'rc': 0, 'rt': 6, 'svr': 0, 'lt': 1, 'full': 1, 'dlmkts': '',
+               'data': {'total': rows, 'diff': diff}}
+    return 'jQuery(' + json.dumps(payload, ensure_ascii=False, separators=(',', ':')) + ');'
+
+def make_datacenter_response(rows, seed):
+    """生成 datacenter-web RPT_SECTOR_FUND_FLOW 接口的JSON响应文本"""
+    rng = random.Random(seed)
+    data = []
+    for i in range(rows):
+        item = {'SECURITY_CODE': f"BK{i:04d}", 'SECURITY_NAME_ABBR': f"板块{i}"}
+        for field in DATACENTER_AMOUNT_FIELDS:
+            item[field] = round(rng.uniform(-5e9, 5e9), 2)
+        for field in DATACENTER_PERCENT_FIELDS:
+            item[field] = round(rng.uniform(-10, 10), 2)
+        if rng.random() < 0.01:
+            item[rng.choice(DATACENTER_AMOUNT_FIELDS)] = None
+        data.append(item)
+    payload = {'version': None, 'result': {'pages': 1, 'data': data, 'count': rows},
+               'success': True, 'message': 'ok', 'code': 0}
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+def record_fixtures(sizes=SIZES):
+    """重新生成 fixtures/ 中的响应文件（固定随机种子，结果可复现）"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for rows in sizes:
+        for kind, text in (('clist', make_clist_response(rows, rows)),
+                           ('datacenter', make_datacenter_response(rows, rows))):
+            path = fixture_path(kind, rows)
+            # mtime=0 保证内容不变时压缩文件也不变，避免无意义的git变更
+            with open(path, 'wb') as f:
+                f.write(gzip.compress(text.encode('utf-8'), mtime=0))
+            print(f"wrote {path}")
+
+def load_fixture(kind, rows):
+    """读取一份响应文件，返回文本"""
+    with open(fixture_path(kind, rows), 'rb') as f:
+        return gzip.decompress(f.read()).decode('utf-8')
+
+def measure(function):
+    """多次运行function，返回耗时统计（毫秒）
+
+    与timeit一样在测量期间关闭垃圾回收，避免GC停顿落在个别用例上造成误报。
+    """
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        while len(timings) < MIN_RUNS or time.perf_counter() - started < MIN_SECONDS:
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        gc.enable()
+    return {
+        'runs': len(timings),
+        'min_ms': round(min(timings), 4),
+        'median_ms': round(statistics.median(timings), 4),
+    }
+
+def load_app():
+    """在临时目录中导入app，上游地址指向本机的关闭端口，保证不访问网络"""
+    os.environ.setdefault('HTTP_MAX_RETRIES', '0')
+    os.environ['EASTMONEY_PUSH2_BASE'] = 'http://127.0.0.1:9'
+    os.environ['EASTMONEY_DATACENTER_BASE'] = 'http://127.0.0.1:9'
+    os.chdir(tempfile.mkdtemp(prefix='fund-flow-microbench-'))
+
+    # 导入app时会直接调用 cache_data() 完成首次抓取（全部回退到模拟数据）并启动后台刷新线程；
+    # 先把所有组合标记为刚刚刷新过，刷新线程在下一次到期之前一直休眠，不会覆盖测量用的数据
+    import scheduler
+    scheduler.mark_refreshed(scheduler.COMBOS)
+    import app as app_module
+    return app_module
+
+def run_size(app_module, rows):
+    """测量一个规模下的所有用例"""
+    import scraper
+    import exports
+    from flask import jsonify
+
+    clist_text = load_fixture('clist', rows)
+    datacenter_text = load_fixture('datacenter', rows)
+    clist_items = scraper.diff_items(scraper.parse_jsonp(clist_text)['data']['diff'])
+    datacenter_items = json.loads(datacenter_text)['result']['data']
+    board_rows = scraper.parse_real_data(clist_items, 'industry', 'today')
+
+    data = {board_type: {period: [] for period in ('today', '5days', '10days')}
+            for board_type in ('industry', 'concept')}
+    data['industry']['today'] = board_rows
+    app_module.publish_cache(data, record=False)
+    client = app_module.app.test_client()
+
+    def export_uncached(url):
+        # 导出文件按数据版本缓存，每次先清空缓存，测量的是生成文件的耗时而不是缓存命中
+        exports.clear_cache()
+        client.get(url).get_data()
+
+    def jsonify_rows():
+        with app_module.app.test_request_context():
+            jsonify(board_rows).get_data()
+
+    cases = {
+        'decode_clist': lambda: scraper.diff_items(scraper.parse_jsonp(clist_text)['data']['diff']),
+        'parse_real_data': lambda: scraper.parse_real_data(clist_items, 'industry', 'today'),
+        'parse_backup_data': lambda: scraper.parse_backup_data(datacenter_items, 'industry', 'today'),
+        'get_cached_data': lambda: app_module.get_cached_data('industry', 'today'),
+        'jsonify': jsonify_rows,
+        'export_csv': lambda: export_uncached('/export/csv?type=industry&period=today'),
+        'export_xlsx': lambda: export_uncached('/export/excel?type=industry&period=today'),
+    }
+    return {f"{name}/{rows}": measure(case) for name, case in cases.items()}
+
+def run(sizes):
+    """运行全部用例，返回结果字典"""
+    logging.disable(logging.CRITICAL)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    app_module = load_app()
+    results = {}
+    for rows in sizes:
+        results.update(run_size(app_module, rows))
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+def compare(baseline, current, threshold):
+    """比较两次结果，返回 (报告行列表, 退化的用例列表)
+
+    以最短耗时比较：它受其他进程和GC干扰最小，中位数只作参考输出。
+    """
+    lines = []
+    regressions = []
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            lines.append(f"  {name:<28} {result['min_ms']:>10.3f} ms  (new)")
+            continue
+        ratio = result['min_ms'] / old['min_ms'] if old['min_ms'] else 1.0
+        regressed = (ratio > 1 + threshold and
+                     result['min_ms'] - old['min_ms'] > NOISE_FLOOR_MS)
+        if regressed:
+            regressions.append(name)
+        lines.append(f"  {name:<28} {old['min_ms']:>10.3f} -> {result['min_ms']:>10.3f} ms  "
+                     f"{ratio:6.2f}x  (median {old['median_ms']:.3f} -> {result['median_ms']:.3f})"
+                     f"{'  REGRESSION' if regressed else ''}")
+    return lines, regressions
+
+def print_results(report):
+    for name, result in report['results'].items():
+        print(f"  {name:<28} median {result['median_ms']:>10.3f} ms  min {result['min_ms']:>10.3f} ms  "
+              f"({result['runs']} runs)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="基于离线接口响应的微基准")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run', help="运行基准")
+    run_parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help="数据规模，逗号分隔")
+    run_parser.add_argument('--save', help="把结果保存为基线文件（JSON）")
+    compare_parser = sub.add_parser('compare', help="运行基准并与基线比较，有性能退化时退出码为1")
+    compare_parser.add_argument('baseline', help="基线文件")
+    compare_parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help="数据规模，逗号分隔")
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help="最短耗时变慢超过该比例时判定为退化（默认0.25）")
+    sub.add_parser('record', help="重新生成 fixtures/ 中的接口响应")
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        record_fixtures()
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    if args.command == 'compare':
+        # 先读取基线，run() 会切换到临时目录
+        with open(os.path.abspath(args.baseline), 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        current = run(sizes)
+        lines, regressions = compare(baseline, current, args.threshold)
+        print(f"baseline {baseline.get('created_at')} vs now (threshold {args.threshold:.0%}):")
+        print('\n'.join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+        print("\nno regressions")
+        return 0
+
+    save_path = os.path.abspath(args.save) if args.save else None
+    report = run(sizes)
+    print_results(report)
+    if save_path:
+        with open(save_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nbaseline saved to {save_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""
+紧凑的列式缓存文件格式
+
+data_cache.json 使用 indent=2 保存，启动时需要完整解析。这里把每个 (board_type, period)
+组合按列存成numpy数组，字符串统一放进一个去重的字符串表，启动时用 np.memmap 映射文件，
+直接从映射的内存中读取各列，不需要逐字符解析JSON。
+
+文件结构（小端序）：
+    8字节魔数 | 4字节头部长度 | JSON头部 | 对齐填充 | 数据区
+头部记录每一列在数据区中的偏移、类型和行数；数据区中每个数组按8字节对齐。
+
+列类型：
+    f8   - 浮点数
+    i8   - 整数
+    num  - 整数和浮点数混合，存储为f8，另有一个标记数组记录哪些行原来是整数
+    bool - 布尔值
+    str  - 字符串，存储为字符串表中的下标
+    json - 其他混合类型，存储为JSON文本在字符串表中的下标
+    none - 全部为None
+某列存在缺失字段或None时，额外保存一个状态数组：0表示该行没有这个字段，1表示有值，2表示None。
+
+命令行用法：
+    python packed_cache.py convert data_cache.json data_cache.bin
+    python packed_cache.py dump data_cache.bin [output.json]
+"""
+import os
+import sys
+import json
+import struct
+import logging
+import argparse
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FFPACK01'
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+# 能用float64精确表示的整数范围
+EXACT_FLOAT_INT = 2 ** 53
+
+STATE_ABSENT = 0
+STATE_VALUE = 1
+STATE_NULL = 2
+
+_MISSING = object()
+
+def _column_kind(values):
+    """根据一列中的非空值判断存储类型"""
+    kinds = set()
+    for value in values:
+        if isinstance(value, bool):
+            kinds.add('bool')
+        elif isinstance(value, int):
+            kinds.add('i8' if INT64_MIN <= value <= INT64_MAX else 'json')
+        elif isinstance(value, float):
+            kinds.add('f8')
+        elif isinstance(value, str):
+            kinds.add('str')
+        else:
+            kinds.add('json')
+    if kinds == {'i8', 'f8'}:
+        # 行情数据中常见0与小数混在一列，仍按数值列保存
+        if all(abs(value) <= EXACT_FLOAT_INT for value in values if type(value) is int):
+            return 'num'
+    if len(kinds) > 1:
+        # 类型不一致时按JSON文本保存，保证读回的类型与原数据完全一致
+        return 'json'
+    return kinds.pop() if kinds else 'none'
+
+class _Writer:
+    """构建数据区和字符串表"""
+
+    def __init__(self):
+        self.blob = bytearray()
+        self.strings = []
+        self.string_ids = {}
+
+    def append(self, array):
+        """追加一个数组，返回它在数据区中的偏移"""
+        padding = -len(self.blob) % ALIGNMENT
+        self.blob.extend(b'\0' * padding)
+        offset = len(self.blob)
+        self.blob.extend(np.ascontiguousarray(array).tobytes())
+        return offset
+
+    def string_id(self, text):
+        """返回字符串在字符串表中的下标，重复的字符串只保存一次"""
+        index = self.string_ids.get(text)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(text)
+            self.string_ids[text] = index
+        return index
+
+    def add_column(self, name, rows):
+        """把一列写入数据区，返回该列的头部描述"""
+        raw = [row.get(name, _MISSING) for row in rows]
+        states = [
+            STATE_ABSENT if value is _MISSING else STATE_NULL if value is None else STATE_VALUE
+            for value in raw
+        ]
+        values = [value for value in raw if value is not _MISSING and value is not None]
+        kind = _column_kind(values)
+        column = {'name': name, 'kind': kind, 'state': None, 'ints': None}
+
+        if any(state != STATE_VALUE for state in states):
+            column['state'] = self.append(np.array(states, dtype='<u1'))
+            # 缺失的位置填充占位值，保持数组与行一一对应
+            filled = [value if state == STATE_VALUE else None for value, state in zip(raw, states)]
+        else:
+            filled = raw
+
+        if kind == 'f8':
+            column['offset'] = self.append(np.array([0.0 if v is None else v for v in filled], dtype='<f8'))
+        elif kind == 'num':
+            column['offset'] = self.append(np.array([0.0 if v is None else v for v in filled], dtype='<f8'))
+            column['ints'] = self.append(np.array([type(v) is int for v in filled], dtype='<u1'))
+        elif kind == 'i8':
+            column['offset'] = self.append(np.array([0 if v is None else v for v in filled], dtype='<i8'))
+        elif kind == 'bool':
+            column['offset'] = self.append(np.array([bool(v) for v in filled], dtype='<u1'))
+        elif kind == 'str':
+            column['offset'] = self.append(np.array(
+                [-1 if v is None else self.string_id(v) for v in filled], dtype='<i4'))
+        elif kind == 'json':
+            column['offset'] = self.append(np.array(
+                [-1 if v is None else self.string_id(json.dumps(v, ensure_ascii=False)) for v in filled],
+                dtype='<i4'))
+        else:
+            column['offset'] = None
+        return column
+
+    def add_strings(self):
+        """写入字符串表：偏移数组加上拼接后的UTF-8字节"""
+        encoded = [text.encode('utf-8') for text in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+        if encoded:
+            offsets[1:] = np.cumsum([len(item) for item in encoded])
+        offsets_at = self.append(offsets)
+        data = b''.join(encoded)
+        data_at = len(self.blob)
+        self.blob.extend(data)
+        return {'count': len(encoded), 'offsets': offsets_at, 'data': data_at, 'size': len(data)}
+
+def pack(data):
+    """把 cache_data() 的结果编码为紧凑的二进制格式
+
+    Args:
+        data: {board_type: {period: [行字典]}} 结构的缓存数据，
+              其他不是列表的值原样保存在头部
+
+    Returns:
+        bytes
+    """
+    writer = _Writer()
+    tables = []
+    extra = {}
+
+    for board_type, periods in (data or {}).items():
+        if not isinstance(periods, dict):
+            extra[board_type] = periods
+            continue
+        for period, rows in periods.items():
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                extra.setdefault(board_type, {})[period] = rows
+                continue
+            names = []
+            seen = set()
+            for row in rows:
+                for name in row:
+                    if name not in seen:
+                        seen.add(name)
+                        names.append(name)
+            tables.append({
+                'board_type': board_type,
+                'period': period,
+                'rows': len(rows),
+                'columns': [writer.add_column(name, rows) for name in names]
+            })
+
+    header = {
+        'version': FORMAT_VERSION,
+        'tables': tables,
+        'strings': writer.add_strings(),
+        'extra': extra
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    prefix_size = len(MAGIC) + 4 + len(header_bytes)
+    padding = -prefix_size % ALIGNMENT
+    return MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes + b'\0' * padding + bytes(writer.blob)
+
+def write_packed(data, path):
+    """把缓存数据以紧凑格式写入文件，返回写入的字节数"""
+    payload = pack(data)
+    with open(path, 'wb') as f:
+        f.write(payload)
+    return len(payload)
+
+def _read_header(buffer):
+    """解析头部，返回 (header, 数据区起始偏移)"""
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a packed cache file")
+    (header_size,) = struct.unpack('<I', bytes(buffer[len(MAGIC):len(MAGIC) + 4]))
+    header_start = len(MAGIC) + 4
+    header = json.loads(bytes(buffer[header_start:header_start + header_size]).decode('utf-8'))
+    if header.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported packed cache version: {header.get('version')}")
+    data_start = header_start + header_size
+    data_start += -data_start % ALIGNMENT
+    return header, data_start
+
+def _read_strings(buffer, base, info):
+    """读取字符串表"""
+    count = info['count']
+    if not count:
+        return []
+    offsets = np.frombuffer(buffer, dtype='<u4', count=count + 1, offset=base + info['offsets']).tolist()
+    start = base + info['data']
+    raw = bytes(buffer[start:start + info['size']])
+    return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+
+def _read_column(buffer, base, column, count, strings):
+    """读取一列的值列表和状态列表（没有缺失值时状态为None）"""
+    kind = column['kind']
+    offset = column['offset']
+    if kind == 'none':
+        values = [None] * count
+    elif kind == 'f8':
+        values = np.frombuffer(buffer, dtype='<f8', count=count, offset=base + offset).tolist()
+    elif kind == 'num':
+        values = np.frombuffer(buffer, dtype='<f8', count=count, offset=base + offset).tolist()
+        ints = np.frombuffer(buffer, dtype='<u1', count=count, offset=base + column['ints'])
+        for i in np.flatnonzero(ints).tolist():
+            values[i] = int(values[i])
+    elif kind == 'i8':
+        values = np.frombuffer(buffer, dtype='<i8', count=count, offset=base + offset).tolist()
+    elif kind == 'bool':
+        values = np.frombuffer(buffer, dtype='<u1', count=count, offset=base + offset).astype(bool).tolist()
+    else:
+        indexes = np.frombuffer(buffer, dtype='<i4', count=count, offset=base + offset).tolist()
+        if kind == 'json':
+            decoded = {i: json.loads(strings[i]) for i in set(indexes) if i >= 0}
+            # 列表和字典每行单独解码，避免多行共享同一个可变对象
+            values = [
+                None if i < 0 else json.loads(strings[i]) if isinstance(decoded[i], (list, dict)) else decoded[i]
+                for i in indexes
+            ]
+        else:
+            values = [None if i < 0 else strings[i] for i in indexes]
+
+    states = None
+    if column['state'] is not None:
+        states = np.frombuffer(buffer, dtype='<u1', count=count, offset=base + column['state']).tolist()
+    return values, states
+
+def unpack(buffer):
+    """从字节或内存映射中解码出与 pack() 输入相同的缓存数据"""
+    header, base = _read_header(buffer)
+    strings = _read_strings(buffer, base, header['strings'])
+    data = {}
+
+    for table in header['tables']:
+        count = table['rows']
+        names = []
+        columns = []
+        has_states = False
+        for column in table['columns']:
+            values, states = _read_column(buffer, base, column, count, strings)
+            names.append(column['name'])
+            columns.append((values, states))
+            has_states = has_states or states is not None
+
+        if not has_states:
+            # 常见情况：每行字段相同且没有None，直接按列拼装
+            rows = [dict(zip(names, values)) for values in zip(*[values for values, _ in columns])] \
+                if names else [{} for _ in range(count)]
+        else:
+            rows = []
+            for i in range(count):
+                row = {}
+                for name, (values, states) in zip(names, columns):
+                    if states is None or states[i] == STATE_VALUE:
+                        row[name] = values[i]
+                    elif states[i] == STATE_NULL:
+                        row[name] = None
+                rows.append(row)
+        data.setdefault(table['board_type'], {})[table['period']] = rows
+
+    for board_type, value in header['extra'].items():
+        if isinstance(value, dict) and isinstance(data.get(board_type), dict):
+            data[board_type].update(value)
+        else:
+            data[board_type] = value
+    return data
+
+def load_packed(path):
+    """通过内存映射读取紧凑格式的缓存文件"""
+    if os.path.getsize(path) == 0:
+        raise ValueError("Empty packed cache file")
+    # 解码完成后映射随引用计数释放，返回的都是普通Python对象
+    return unpack(np.memmap(path, dtype=np.uint8, mode='r'))
+
+def is_packed_file(path):
+    """判断文件是否为紧凑格式"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def convert_json_file(json_path, packed_path):
+    """把已有的 data_cache.json 转换为紧凑格式，返回 (原大小, 新大小)"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    size = write_packed(data, packed_path)
+    return os.path.getsize(json_path), size
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="缓存文件格式转换工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help="把JSON缓存转换为紧凑格式")
+    convert_parser.add_argument('source', help="JSON缓存文件，例如 data_cache.json")
+    convert_parser.add_argument('target', help="输出文件，例如 data_cache.bin")
+
+    dump_parser = subparsers.add_parser('dump', help="把紧凑格式导出为JSON")
+    dump_parser.add_argument('source', help="紧凑格式的缓存文件")
+    dump_parser.add_argument('target', nargs='?', help="输出的JSON文件，省略时输出到标准输出")
+
+    args = parser.parse_args(argv)
+    if args.command == 'convert':
+        old_size, new_size = convert_json_file(args.source, args.target)
+        print(f"{args.source}: {old_size} bytes -> {args.target}: {new_size} bytes "
+              f"({new_size / old_size:.1%})" if old_size else f"Wrote {new_size} bytes")
+    else:
+        data = load_packed(args.source)
+        if args.target:
+            with open(args.target, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        else:
+            json.dump(data, sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write('\n')
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+刷新调度模块：按交易日历和每个板块/周期组合各自的刷新频率决定何时抓取哪些组合
+
+- 交易日历：周末和节假日文件（TRADING_HOLIDAYS_FILE）中的日期休市，文件修改后自动重新读取
+- 交易时段：9:30-11:30、13:00-15:00（北京时间），午休和收盘后不刷新
+- 每个时段收盘后稍等片刻（REFRESH_CLOSE_DELAY）再刷新一次，保存该时段的最终数据
+- 开盘和收盘前后 REFRESH_EDGE_MINUTES 分钟内，今日数据使用更快的频率（REFRESH_EDGE_CADENCE）
+- 刷新间隔带有随机抖动（REFRESH_JITTER），多个部署不会在同一时刻访问接口
+
+调度状态只保存在刷新主进程中。
+"""
+import os
+import random
+import logging
+import datetime
+import threading
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+logger = logging.getLogger(__name__)
+
+BOARD_TYPES = ['industry', 'concept']
+PERIODS = ['today', '5days', '10days']
+COMBOS = [(board_type, period) for board_type in BOARD_TYPES for period in PERIODS]
+
+# 交易时段（北京时间）
+SESSIONS = [(datetime.time(9, 30), datetime.time(11, 30)), (datetime.time(13, 0), datetime.time(15, 0))]
+
+HOLIDAYS_FILE = os.environ.get('TRADING_HOLIDAYS_FILE') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'trading_holidays.txt')
+MARKET_TIMEZONE = os.environ.get('MARKET_TIMEZONE', 'Asia/Shanghai')
+
+# 交易时段内各周期的刷新间隔（秒），也可以写 industry/today=240 单独设置某个组合
+DEFAULT_CADENCE = 'today=300,5days=1800,10days=3600'
+REFRESH_CADENCE = os.environ.get('REFRESH_CADENCE', DEFAULT_CADENCE)
+REFRESH_EDGE_CADENCE = float(os.environ.get('REFRESH_EDGE_CADENCE', '120'))
+REFRESH_EDGE_MINUTES = float(os.environ.get('REFRESH_EDGE_MINUTES', '15'))
+REFRESH_CLOSE_DELAY = float(os.environ.get('REFRESH_CLOSE_DELAY', '60'))
+REFRESH_JITTER = float(os.environ.get('REFRESH_JITTER', '0.1'))
+# 调度线程最长的休眠时间（秒），保证节假日文件和系统时间的变化能及时生效
+MAX_SLEEP = 600
+# 这段时间（秒）内先后到期的组合合并到同一轮刷新
+BATCH_SECONDS = 30
+# 今日数据使用开收盘附近的快速刷新
+EDGE_PERIODS = {'today'}
+# 节假日文件有误导致一个月内都没有交易日时，按这个间隔刷新
+FALLBACK_INTERVAL = 6 * 60 * 60
+
+def _market_timezone():
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(MARKET_TIMEZONE)
+        except Exception as e:
+            logger.warning(f"Unknown timezone {MARKET_TIMEZONE}, using UTC+8: {str(e)}")
+    return datetime.timezone(datetime.timedelta(hours=8))
+
+TZ = _market_timezone()
+
+def parse_cadence(text):
+    """解析刷新间隔配置，返回 {'today': 300, 'industry/today': 240, ...}"""
+    cadence = {}
+    for item in text.split(','):
+        if '=' not in item:
+            continue
+        key, value = item.split('=', 1)
+        cadence[key.strip()] = float(value)
+    return cadence
+
+CADENCE = dict(parse_cadence(DEFAULT_CADENCE), **parse_cadence(REFRESH_CADENCE))
+
+_holidays = {'path': None, 'mtime': None, 'days': frozenset()}
+_holidays_lock = threading.Lock()
+
+def parse_holidays(lines):
+    """解析节假日文件：每行一个日期或用 ~ 连接的日期范围，# 之后是注释"""
+    days = set()
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        start, _, end = line.partition('~')
+        start = datetime.date.fromisoformat(start.strip())
+        end = datetime.date.fromisoformat(end.strip()) if end else start
+        while start <= end:
+            days.add(start)
+            start += datetime.timedelta(days=1)
+    return frozenset(days)
+
+def get_holidays():
+    """读取节假日文件，文件没有变化时使用缓存的结果"""
+    try:
+        mtime = os.stat(HOLIDAYS_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _holidays_lock:
+        if _holidays['path'] == HOLIDAYS_FILE and _holidays['mtime'] == mtime:
+            return _holidays['days']
+        days = frozenset()
+        if mtime is not None:
+            try:
+                with open(HOLIDAYS_FILE, 'r', encoding='utf-8') as f:
+                    days = parse_holidays(f)
+                logger.info(f"Loaded {len(days)} holidays from {HOLIDAYS_FILE}")
+            except Exception as e:
+                logger.error(f"Error loading holidays file: {str(e)}")
+        else:
+            logger.warning(f"Holidays file {HOLIDAYS_FILE} not found, only weekends are treated as closed")
+        _holidays.update(path=HOLIDAYS_FILE, mtime=mtime, days=days)
+        return days
+
+def now():
+    """当前的交易所时间"""
+    return datetime.datetime.now(TZ)
+
+def is_trading_day(day):
+    return day.weekday() < 5 and day not in get_holidays()
+
+def sessions(day):
+    """某一天的交易时段列表 [(开盘时间, 收盘时间)]，休市日为空"""
+    if not is_trading_day(day):
+        return []
+    return [(datetime.datetime.combine(day, start, TZ), datetime.datetime.combine(day, end, TZ))
+            for start, end in SESSIONS]
+
+def session_at(moment):
+    """moment所在的交易时段，不在交易时段内时返回None"""
+    for start, end in sessions(moment.date()):
+        if start <= moment < end:
+            return start, end
+    return None
+
+def is_market_open(moment=None):
+    return session_at(moment or now()) is not None
+
+def next_open(moment, max_days=31):
+    """moment之后最近一个交易时段的开盘时间"""
+    day = moment.date()
+    for _ in range(max_days):
+        for start, _end in sessions(day):
+            if start > moment:
+                return start
+        day += datetime.timedelta(days=1)
+    return None
+
+def previous_close(moment, max_days=31):
+    """moment之前（含）最近一个交易时段的收盘时间"""
+    day = moment.date()
+    for _ in range(max_days):
+        for _start, end in reversed(sessions(day)):
+            if end <= moment:
+                return end
+        day -= datetime.timedelta(days=1)
+    return None
+
+def cadence(combo, moment):
+    """组合在moment时刻的刷新间隔（秒）"""
+    board_type, period = combo
+    interval = CADENCE.get(f"{board_type}/{period}", CADENCE.get(period, CADENCE['today']))
+    if period in EDGE_PERIODS:
+        day_sessions = sessions(moment.date())
+        if day_sessions:
+            edge = datetime.timedelta(minutes=REFRESH_EDGE_MINUTES)
+            day_open, day_close = day_sessions[0][0], day_sessions[-1][1]
+            if moment < day_open + edge or moment >= day_close - edge:
+                interval = min(interval, REFRESH_EDGE_CADENCE)
+    return interval
+
+def next_due(combo, last, rng=random):
+    """组合在last时刻刷新后，下一次应该刷新的时间
+
+    交易时段内按刷新间隔（带抖动）推算，越过收盘时改为收盘后补一次；
+    时段外刷新过收盘数据后等到下一个交易时段开盘。
+    """
+    session = session_at(last)
+    if session is not None:
+        interval = cadence(combo, last) * rng.uniform(1 - REFRESH_JITTER, 1 + REFRESH_JITTER)
+        due = last + datetime.timedelta(seconds=interval)
+        if due < session[1]:
+            return due
+        return session[1] + datetime.timedelta(seconds=REFRESH_CLOSE_DELAY)
+
+    # 收盘后还没等到数据稳定就刷新了，收盘补刷仍然需要
+    close = previous_close(last)
+    if close is not None and last < close + datetime.timedelta(seconds=REFRESH_CLOSE_DELAY):
+        return close + datetime.timedelta(seconds=REFRESH_CLOSE_DELAY)
+
+    opening = next_open(last)
+    if opening is None:
+        return last + datetime.timedelta(seconds=FALLBACK_INTERVAL)
+    # 开盘时只向后抖动，不会在开盘前刷新
+    return opening + datetime.timedelta(seconds=cadence(combo, opening) * rng.uniform(0, REFRESH_JITTER))
+
+# 组合 -> 上次刷新时间 / 下次刷新时间，只由刷新线程修改
+_last_run = {}
+_next_run = {}
+
+def due_combos(moment=None):
+    """到期需要刷新的组合，从未刷新过的组合立即到期
+
+    有组合到期时，随后 BATCH_SECONDS 秒内到期的组合也一起刷新，减少刷新轮数。
+    """
+    moment = moment or now()
+    due = [combo for combo in COMBOS if combo not in _next_run or _next_run[combo] <= moment]
+    if not due:
+        return []
+    window = moment + datetime.timedelta(seconds=BATCH_SECONDS)
+    return [combo for combo in COMBOS if combo in due or _next_run[combo] <= window]
+
+def mark_refreshed(combos, moment=None):
+    """记录组合已经刷新，并安排下一次刷新
+
+    合并到本轮而提前刷新的组合按原定的到期时间推算，避免收盘补刷被提前到收盘前后又重复一次。
+    """
+    moment = moment or now()
+    for combo in combos:
+        _last_run[combo] = moment
+        scheduled = _next_run.get(combo)
+        _next_run[combo] = next_due(combo, max(moment, scheduled) if scheduled else moment)
+
+def seconds_until_next(moment=None):
+    """距离最近一个组合到期的秒数，限制在 [1, MAX_SLEEP] 内"""
+    moment = moment or now()
+    if not _next_run or len(_next_run) < len(COMBOS):
+        return 1
+    seconds = (min(_next_run.values()) - moment).total_seconds()
+    return max(1, min(seconds, MAX_SLEEP))
+
+def get_status():
+    """调度状态，用于健康检查"""
+    moment = now()
+    return {
+        'market_open': is_market_open(moment),
+        'combos': {
+            f"{board_type}/{period}": {
+                'last': _last_run[(board_type, period)].isoformat() if (board_type, period) in _last_run else None,
+                'next': _next_run[(board_type, period)].isoformat() if (board_type, period) in _next_run else None
+            }
+            for board_type, period in COMBOS
+        }
+    }
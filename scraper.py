@@ -1,4 +1,4 @@
-import requests
+import http_client
 from bs4 import BeautifulSoup
 import json
 import time
@@ -6,6 +6,12 @@ import random
 import logging
 import datetime
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import fast_parse
+import metrics
+import source_health
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -15,18 +21,25 @@ logger = logging.getLogger(__name__)
 INDUSTRY_URL = "https://data.eastmoney.com/bkzj/hy.html"
 CONCEPT_URL = "https://data.eastmoney.com/bkzj/gn.html"
 
+# 接口的基础地址，压测时可以指向本地的模拟接口（fake_eastmoney.py）
+PUSH2_BASE = os.environ.get('EASTMONEY_PUSH2_BASE', 'https://push2.eastmoney.com').rstrip('/')
+DATACENTER_BASE = os.environ.get('EASTMONEY_DATACENTER_BASE', 'https://datacenter-web.eastmoney.com').rstrip('/')
+
 # 用于获取API数据的URL模板 - 使用更精确的东方财富API参数
 API_URL_TEMPLATES = {
-    "today": "https://push2.eastmoney.com/api/qt/clist/get?cb=jQuery&pn=1&pz=50&po=1&np=1&ut=bd1d9ddb04089700cf9c27f6f7426281&fltt=2&invt=2&fid=f62&fs=m:90+t:{board_type}&fields=f12,f14,f2,f3,f62,f184,f66,f69,f72,f75,f78,f81,f84,f87,f204,f205,f124&_={timestamp}",
-    "5days": "https://push2.eastmoney.com/api/qt/clist/get?cb=jQuery&pn=1&pz=50&po=1&np=1&ut=bd1d9ddb04089700cf9c27f6f7426281&fltt=2&invt=2&fid=f267&fs=m:90+t:{board_type}&fields=f12,f14,f2,f3,f267,f268,f269,f270,f271,f272,f273,f274,f275,f276,f204,f205,f124&_={timestamp}",
-    "10days": "https://push2.eastmoney.com/api/qt/clist/get?cb=jQuery&pn=1&pz=50&po=1&np=1&ut=bd1d9ddb04089700cf9c27f6f7426281&fltt=2&invt=2&fid=f160&fs=m:90+t:{board_type}&fields=f12,f14,f2,f3,f160,f161,f162,f163,f164,f165,f166,f167,f168,f169,f204,f205,f124&_={timestamp}"
+    "today": PUSH2_BASE + "/api/qt/clist/get?cb=jQuery&pn={page}&pz={page_size}&po=1&np=1&ut=bd1d9ddb04089700cf9c27f6f7426281&fltt=2&invt=2&fid=f62&fs=m:90+t:{board_type}&fields=f12,f14,f2,f3,f62,f184,f66,f69,f72,f75,f78,f81,f84,f87,f204,f205,f124&_={timestamp}",
+    "5days": PUSH2_BASE + "/api/qt/clist/get?cb=jQuery&pn={page}&pz={page_size}&po=1&np=1&ut=bd1d9ddb04089700cf9c27f6f7426281&fltt=2&invt=2&fid=f267&fs=m:90+t:{board_type}&fields=f12,f14,f2,f3,f267,f268,f269,f270,f271,f272,f273,f274,f275,f276,f204,f205,f124&_={timestamp}",
+    "10days": PUSH2_BASE + "/api/qt/clist/get?cb=jQuery&pn={page}&pz={page_size}&po=1&np=1&ut=bd1d9ddb04089700cf9c27f6f7426281&fltt=2&invt=2&fid=f160&fs=m:90+t:{board_type}&fields=f12,f14,f2,f3,f160,f161,f162,f163,f164,f165,f166,f167,f168,f169,f204,f205,f124&_={timestamp}"
 }
 
+# 板块成分股的资金流（今日），fs=b:<板块代码>
+STOCK_LIST_URL_TEMPLATE = PUSH2_BASE + "/api/qt/clist/get?cb=jQuery&pn={page}&pz={page_size}&po=1&np=1&ut=bd1d9ddb04089700cf9c27f6f7426281&fltt=2&invt=2&fid=f62&fs=b:{board_id}&fields=f12,f14,f2,f3,f62,f184,f66,f69,f72,f75,f78,f81,f84,f87,f124&_={timestamp}"
+
 # 备用API URL模板 - 尝试不同的接口
 BACKUP_API_TEMPLATES = {
-    "today": "https://datacenter-web.eastmoney.com/api/data/v1/get?sortColumns=TRADE_DATE,SECURITY_CODE&sortTypes=-1,-1&pageSize=50&pageNumber=1&reportName=RPT_SECTOR_FUND_FLOW&columns=SECURITY_CODE,SECURITY_NAME_ABBR,CHANGE_RATE,MAIN_FORCE_NET,MAIN_FORCE_NET_RATE,SUPER_NET,SUPER_NET_RATE,BIG_NET,BIG_NET_RATE,MID_NET,MID_NET_RATE,SMALL_NET,SMALL_NET_RATE&source=WEB&client=WEB&filter=(TRADE_DATE='{date}')AND(MARKET_TYPE=\"{board_type}\")",
-    "5days": "https://datacenter-web.eastmoney.com/api/data/v1/get?sortColumns=TRADE_DATE,SECURITY_CODE&sortTypes=-1,-1&pageSize=50&pageNumber=1&reportName=RPT_SECTOR_FUND_FLOW_5&columns=SECURITY_CODE,SECURITY_NAME_ABBR,CHANGE_RATE,MAIN_FORCE_NET,MAIN_FORCE_NET_RATE,SUPER_NET,SUPER_NET_RATE,BIG_NET,BIG_NET_RATE,MID_NET,MID_NET_RATE,SMALL_NET,SMALL_NET_RATE&source=WEB&client=WEB&filter=(TRADE_DATE='{date}')AND(MARKET_TYPE=\"{board_type}\")",
-    "10days": "https://datacenter-web.eastmoney.com/api/data/v1/get?sortColumns=TRADE_DATE,SECURITY_CODE&sortTypes=-1,-1&pageSize=50&pageNumber=1&reportName=RPT_SECTOR_FUND_FLOW_10&columns=SECURITY_CODE,SECURITY_NAME_ABBR,CHANGE_RATE,MAIN_FORCE_NET,MAIN_FORCE_NET_RATE,SUPER_NET,SUPER_NET_RATE,BIG_NET,BIG_NET_RATE,MID_NET,MID_NET_RATE,SMALL_NET,SMALL_NET_RATE&source=WEB&client=WEB&filter=(TRADE_DATE='{date}')AND(MARKET_TYPE=\"{board_type}\")"
+    "today": DATACENTER_BASE + "/api/data/v1/get?sortColumns=TRADE_DATE,SECURITY_CODE&sortTypes=-1,-1&pageSize={page_size}&pageNumber={page}&reportName=RPT_SECTOR_FUND_FLOW&columns=SECURITY_CODE,SECURITY_NAME_ABBR,CHANGE_RATE,MAIN_FORCE_NET,MAIN_FORCE_NET_RATE,SUPER_NET,SUPER_NET_RATE,BIG_NET,BIG_NET_RATE,MID_NET,MID_NET_RATE,SMALL_NET,SMALL_NET_RATE&source=WEB&client=WEB&filter=(TRADE_DATE='{date}')AND(MARKET_TYPE=\"{board_type}\")",
+    "5days": DATACENTER_BASE + "/api/data/v1/get?sortColumns=TRADE_DATE,SECURITY_CODE&sortTypes=-1,-1&pageSize={page_size}&pageNumber={page}&reportName=RPT_SECTOR_FUND_FLOW_5&columns=SECURITY_CODE,SECURITY_NAME_ABBR,CHANGE_RATE,MAIN_FORCE_NET,MAIN_FORCE_NET_RATE,SUPER_NET,SUPER_NET_RATE,BIG_NET,BIG_NET_RATE,MID_NET,MID_NET_RATE,SMALL_NET,SMALL_NET_RATE&source=WEB&client=WEB&filter=(TRADE_DATE='{date}')AND(MARKET_TYPE=\"{board_type}\")",
+    "10days": DATACENTER_BASE + "/api/data/v1/get?sortColumns=TRADE_DATE,SECURITY_CODE&sortTypes=-1,-1&pageSize={page_size}&pageNumber={page}&reportName=RPT_SECTOR_FUND_FLOW_10&columns=SECURITY_CODE,SECURITY_NAME_ABBR,CHANGE_RATE,MAIN_FORCE_NET,MAIN_FORCE_NET_RATE,SUPER_NET,SUPER_NET_RATE,BIG_NET,BIG_NET_RATE,MID_NET,MID_NET_RATE,SMALL_NET,SMALL_NET_RATE&source=WEB&client=WEB&filter=(TRADE_DATE='{date}')AND(MARKET_TYPE=\"{board_type}\")"
 }
 
 # 板块类型
@@ -42,6 +55,78 @@ PERIODS = {
     "10days": "10日"
 }
 
+# 主API的10日字段（f160~f169）映射有误，数值远小于实际（见 README_DATA_ISSUES.md），
+# 在修正映射之前这些周期不请求主API，直接使用备用API
+PRIMARY_DISABLED_PERIODS = {"10days"}
+
+# 刷新引擎配置：并发抓取的线程数上限和单轮刷新的截止时间（秒）
+REFRESH_MAX_WORKERS = int(os.environ.get('REFRESH_MAX_WORKERS', '6'))
+REFRESH_DEADLINE = float(os.environ.get('REFRESH_DEADLINE', '45'))
+
+# 主API不同时间周期的字段映射
+REAL_FIELD_MAPPINGS = {
+    "today": {
+        "net_inflow": "f62",
+        "net_inflow_percent": "f184", 
+        "main_inflow": "f66",
+        "main_inflow_percent": "f69",
+        "super_large_inflow": "f72",
+        "super_large_inflow_percent": "f75",
+        "large_inflow": "f78",
+        "large_inflow_percent": "f81",
+        "medium_inflow": "f84",
+        "medium_inflow_percent": "f87"
+    },
+    "5days": {
+        "net_inflow": "f267",
+        "net_inflow_percent": "f268",
+        "main_inflow": "f269", 
+        "main_inflow_percent": "f270",
+        "super_large_inflow": "f271",
+        "super_large_inflow_percent": "f272",
+        "large_inflow": "f273",
+        "large_inflow_percent": "f274",
+        "medium_inflow": "f275",
+        "medium_inflow_percent": "f276"
+    },
+    "10days": {
+        "net_inflow": "f160",
+        "net_inflow_percent": "f161",
+        "main_inflow": "f160",
+        "main_inflow_percent": "f161",
+        "super_large_inflow": "f162",
+        "super_large_inflow_percent": "f163",
+        "large_inflow": "f164",
+        "large_inflow_percent": "f165",
+        "medium_inflow": "f166",
+        "medium_inflow_percent": "f167"
+    }
+}
+
+# 主API的金额字段，每个金额字段在 REAL_FIELD_MAPPINGS 中都有对应的 *_percent 字段
+REAL_AMOUNT_COLUMNS = ['net_inflow', 'main_inflow', 'super_large_inflow', 'large_inflow', 'medium_inflow']
+
+# 备用API返回的金额字段（元）和百分比字段
+BACKUP_AMOUNT_COLUMNS = ['MAIN_FORCE_NET', 'SUPER_NET', 'BIG_NET', 'MID_NET']
+BACKUP_PERCENT_COLUMNS = ['CHANGE_RATE', 'MAIN_FORCE_NET_RATE', 'SUPER_NET_RATE', 'BIG_NET_RATE', 'MID_NET_RATE']
+
+# 分页抓取配置：每页条数、单个组合的最大页数以及同时抓取的分页数
+PAGE_SIZE = int(os.environ.get('EASTMONEY_PAGE_SIZE', '100'))
+MAX_PAGES = int(os.environ.get('EASTMONEY_MAX_PAGES', '20'))
+PAGE_WORKERS = int(os.environ.get('EASTMONEY_PAGE_WORKERS', '4'))
+
+# 最近一轮刷新的耗时统计
+last_refresh_stats = {}
+# 每个板块/周期组合最近一次使用的数据源（primary/backup/mock），键为 "board_type/period"
+last_sources = {}
+
+# 刷新线程池在各轮之间复用，线程数固定为 max_workers；
+# 超过截止时间的组合继续在池中运行，下一轮等待它或直接使用它已完成的结果，而不是重新提交，线程不会逐轮累积
+_refresh_executors = {}
+# (board_type, period) -> 结果还没有被任何一轮刷新使用的抓取
+_combo_futures = {}
+_refresh_lock = threading.Lock()
+
 def get_headers():
     """生成随机User-Agent头"""
     user_agents = [
@@ -79,6 +164,47 @@ def to_billion(value):
     """将金额从元转换为亿元，保留2位小数"""
     return round(safe_float_conversion(value) / 1e8, 2)
 
+def fetch_all_pages(fetch_page, page_size, key=None):
+    """先抓取第一页得到总条数，再并发抓取剩余分页，按页码顺序合并
+    
+    Args:
+        fetch_page: 函数，参数为页码，返回 (本页数据列表, 总条数)
+        page_size: 每页条数
+        key: 去重用的键函数；翻页期间排名变化可能导致同一条数据出现在相邻两页
+    
+    Returns:
+        合并后的数据列表；第一页失败时返回空列表
+    """
+    first_items, total = fetch_page(1)
+    if not first_items:
+        return []
+    
+    pages = min(MAX_PAGES, -(-int(total or 0) // page_size)) if total else 1
+    results = {1: first_items}
+    if pages > 1:
+        with ThreadPoolExecutor(max_workers=min(PAGE_WORKERS, pages - 1), thread_name_prefix='page') as executor:
+            futures = {executor.submit(fetch_page, page): page for page in range(2, pages + 1)}
+            for future, page in futures.items():
+                try:
+                    results[page] = future.result()[0] or []
+                except Exception as e:
+                    # 后面的分页是排名靠后的数据，缺一页时仍然返回已取得的部分
+                    logger.warning(f"Failed to fetch page {page}/{pages}: {str(e)}")
+                    results[page] = []
+    
+    items = []
+    seen = set()
+    for page in sorted(results):
+        for item in results[page]:
+            if key is not None:
+                item_key = key(item)
+                if item_key in seen:
+                    continue
+                seen.add(item_key)
+            items.append(item)
+    logger.info(f"Fetched {len(items)} items in {pages} pages (total reported: {total})")
+    return items
+
 def fetch_data_backup(board_type, period="today"):
     """使用备用API获取板块资金流数据"""
     try:
@@ -91,34 +217,40 @@ def fetch_data_backup(board_type, period="today"):
             "concept": "概念板块"
         }
         
-        api_url = BACKUP_API_TEMPLATES[period].format(
-            date=current_date,
-            board_type=market_type_map.get(board_type, "行业板块")
-        )
-        
         headers = get_headers()
         headers['Referer'] = 'https://data.eastmoney.com/'
-        response = requests.get(api_url, headers=headers, timeout=10)
         
-        if response.status_code == 200:
+        def fetch_page(page):
+            api_url = BACKUP_API_TEMPLATES[period].format(
+                date=current_date,
+                board_type=market_type_map.get(board_type, "行业板块"),
+                page=page,
+                page_size=PAGE_SIZE
+            )
+            response = http_client.get(api_url, headers=headers, timeout=10)
+            if response.status_code != 200:
+                raise ValueError(f"Backup API request failed with status {response.status_code}")
             data = response.json()
-            if data.get('success') and data.get('result'):
-                result_data = data['result']['data']
-                logger.info(f"Successfully fetched backup data from API for {board_type}, period: {period}")
+            if not (data.get('success') and data.get('result')):
+                return [], 0
+            result = data['result']
+            return result.get('data') or [], result.get('count') or 0
+        
+        result_data = fetch_all_pages(fetch_page, PAGE_SIZE, key=lambda item: item.get('SECURITY_CODE'))
+        if result_data:
+            logger.info(f"Successfully fetched backup data from API for {board_type}, period: {period}")
+            with metrics.timer('fund_flow_parse_seconds', parser='backup'):
                 return parse_backup_data(result_data, board_type, period)
-            else:
-                logger.warning(f"Backup API returned no data for {board_type}, period: {period}")
-                return []
         else:
-            logger.error(f"Backup API request failed with status {response.status_code}")
+            logger.warning(f"Backup API returned no data for {board_type}, period: {period}")
             return []
             
     except Exception as e:
         logger.error(f"Error fetching backup data: {str(e)}")
         return []
 
-def parse_backup_data(data_list, board_type, period="today"):
-    """解析备用API返回的数据"""
+def parse_backup_data_rowwise(data_list, board_type, period="today"):
+    """逐行解析备用API返回的数据（向量化解析的参考实现和回退路径）"""
     parsed_data = []
     
     if not isinstance(data_list, list):
@@ -128,9 +260,6 @@ def parse_backup_data(data_list, board_type, period="today"):
     logger.info(f"Processing backup data: {len(data_list)} items")
     
     for i, item in enumerate(data_list):
-        if i >= 20:  # 只取前20条
-            break
-            
         try:
             if not isinstance(item, dict):
                 continue
@@ -153,8 +282,8 @@ def parse_backup_data(data_list, board_type, period="today"):
                 "stock_change_percent": safe_float_conversion(item.get('CHANGE_RATE', 0)) / 100
             }
             
-            # 添加调试日志
-            logger.info(f"[{i}] 板块: {item.get('SECURITY_NAME_ABBR')}, 主力: {parsed_item['main_inflow']}, 超大单: {parsed_item['super_large_inflow']}")
+            # 添加调试日志（全量数据有数百条，只在调试级别输出）
+            logger.debug(f"[{i}] 板块: {item.get('SECURITY_NAME_ABBR')}, 主力: {parsed_item['main_inflow']}, 超大单: {parsed_item['super_large_inflow']}")
             
             parsed_data.append(parsed_item)
             
@@ -168,135 +297,265 @@ def parse_backup_data(data_list, board_type, period="today"):
     
     return parsed_data
 
+def parse_backup_data(data_list, board_type, period="today"):
+    """解析备用API返回的数据
+    
+    按列向量化处理，结果与 parse_backup_data_rowwise 完全一致；向量化失败时退回逐行解析。
+    """
+    if not isinstance(data_list, list):
+        logger.error(f"Expected list, got {type(data_list)}")
+        return []
+    
+    logger.info(f"Processing backup data: {len(data_list)} items")
+    try:
+        rows = [item for item in data_list if isinstance(item, dict)]
+        texts = fast_parse.records(rows, ['SECURITY_CODE', 'SECURITY_NAME_ABBR'], ['', ''])
+        keys = BACKUP_AMOUNT_COLUMNS + BACKUP_PERCENT_COLUMNS
+        values = fast_parse.float_matrix(rows, keys, [0] * len(keys), safe_float_conversion)
+        numbers = fast_parse.scale(values, len(BACKUP_AMOUNT_COLUMNS), 2)
+        
+        # 按主力净流入排序（从大到小）
+        order = fast_parse.descending_order(numbers[:, BACKUP_AMOUNT_COLUMNS.index('MAIN_FORCE_NET')])
+        if order is not None:
+            numbers = numbers[order]
+            texts = [texts[i] for i in order.tolist()]
+        parsed_data = [
+            {
+                "id": board_id,
+                "name": name,
+                "change_percent": change_percent,
+                "main_inflow": main_inflow,
+                "main_inflow_percent": main_inflow_percent,
+                "super_large_inflow": super_large_inflow,
+                "super_large_inflow_percent": super_large_inflow_percent,
+                "large_inflow": large_inflow,
+                "large_inflow_percent": large_inflow_percent,
+                "medium_inflow": medium_inflow,
+                "medium_inflow_percent": medium_inflow_percent,
+                "net_inflow": main_inflow,
+                "net_inflow_percent": main_inflow_percent,
+                "stock_name": name,
+                "stock_change_percent": change_percent
+            }
+            for (board_id, name),
+                (main_inflow, super_large_inflow, large_inflow, medium_inflow, change_percent,
+                 main_inflow_percent, super_large_inflow_percent, large_inflow_percent,
+                 medium_inflow_percent) in zip(texts, numbers.tolist())
+        ]
+        if order is None:
+            parsed_data.sort(key=lambda x: x.get('main_inflow', 0), reverse=True)
+    except Exception as e:
+        logger.warning(f"Vectorized backup parse failed ({str(e)}), falling back to row-wise parse")
+        return parse_backup_data_rowwise(data_list, board_type, period)
+    
+    logger.info(f"Successfully parsed {len(parsed_data)} backup items")
+    return parsed_data
+
+def _fetch_from(source, fetch, board_type, period):
+    """调用一个数据源并记录耗时和结果，主接口和备用接口的结果同时计入数据源健康状态"""
+    start = time.perf_counter()
+    result = None
+    try:
+        result = fetch(board_type, period)
+        return result
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe('fund_flow_upstream_seconds', seconds, source=source, combo=f"{board_type}/{period}")
+        metrics.inc('fund_flow_upstream_total', source=source, outcome='ok' if result else 'empty')
+        if source != 'mock':
+            source_health.record(source, f"{board_type}/{period}", bool(result), seconds)
+
 def fetch_data(board_type, period="today"):
     """获取板块资金流数据
     
+    依次尝试主API和备用API，跳过处于熔断状态的数据源（见 source_health.py），都没有数据时使用模拟数据。
+    
     Args:
         board_type: 'industry' 或 'concept'
         period: 'today', '5days', 或 '10days'
         
     Returns:
-        格式化后的资金流数据列表
+        格式化后的资金流数据列表，实际使用的数据源记录在 last_sources 中
     """
+    source = 'mock'
+    combo = f"{board_type}/{period}"
     try:
-        # 首先尝试主API
-        result = fetch_data_primary(board_type, period)
-        if result:
-            return result
-            
-        # 主API失败，尝试备用API
-        logger.info(f"Primary API failed, trying backup API for {board_type}, period: {period}")
-        result = fetch_data_backup(board_type, period)
-        if result:
-            return result
+        # 按优先级尝试真实数据源
+        for name, fetch in (('primary', fetch_data_primary), ('backup', fetch_data_backup)):
+            if name == 'primary' and period in PRIMARY_DISABLED_PERIODS:
+                continue
+            if not source_health.allow(name, combo):
+                logger.info(f"Skipping {name} API for {board_type}, period: {period} (circuit open)")
+                metrics.inc('fund_flow_upstream_total', source=name, outcome='skipped')
+                continue
+            result = _fetch_from(name, fetch, board_type, period)
+            if result:
+                source = name
+                return result
+            logger.info(f"{name.capitalize()} API returned no data for {board_type}, period: {period}")
             
         # 两个API都失败，返回模拟数据
         logger.warning(f"Both APIs failed, falling back to mock data for {board_type}, period: {period}")
-        return get_mock_data(board_type, period)
+        return _fetch_from('mock', get_mock_data, board_type, period)
         
     except Exception as e:
         logger.error(f"Error in fetch_data: {str(e)}")
-        return get_mock_data(board_type, period)
+        return _fetch_from('mock', get_mock_data, board_type, period)
+    finally:
+        last_sources[combo] = source
+        metrics.inc('fund_flow_combo_source_total', combo=combo, source=source)
+
+def get_data_source(board_type, period):
+    """获取某个组合最近一次使用的数据源，尚未抓取过时返回None"""
+    return last_sources.get(f"{board_type}/{period}")
+
+def parse_jsonp(text):
+    """解析JSONP响应"""
+    if text.startswith('jQuery('):
+        # 移除JSONP包装
+        start = text.find('(') + 1
+        end = text.rfind(')')
+        text = text[start:end]
+    return json.loads(text)
+
+def diff_items(diff):
+    """clist接口的diff字段可能是列表，也可能是以序号为键的字典，统一转换为按序号排列的列表"""
+    if isinstance(diff, dict):
+        return [diff[key] for key in sorted(diff, key=lambda k: int(k) if str(k).isdigit() else 0)]
+    return diff or []
 
 def fetch_data_primary(board_type, period="today"):
-    """使用主API获取板块资金流数据"""
+    """使用主API获取板块资金流数据，PRIMARY_DISABLED_PERIODS 中的周期不发请求，直接返回空列表"""
+    if period in PRIMARY_DISABLED_PERIODS:
+        logger.info(f"Primary API is disabled for {period} data, use the backup API")
+        return []
     try:
-        # 生成时间戳
-        timestamp = int(time.time() * 1000)
-        
-        # 尝试从真实API获取数据
-        api_url = API_URL_TEMPLATES[period].format(
-            board_type=BOARD_TYPES[board_type],
-            timestamp=timestamp
-        )
-        
         headers = get_headers()
         headers['Referer'] = 'https://data.eastmoney.com/'
-        response = requests.get(api_url, headers=headers, timeout=10)
         
-        if response.status_code == 200:
-            # 处理JSONP响应
-            text = response.text
-            if text.startswith('jQuery('):
-                # 移除JSONP包装
-                start = text.find('(') + 1
-                end = text.rfind(')')
-                json_text = text[start:end]
-            else:
-                json_text = text
-            
-            data = json.loads(json_text)
-            
+        def fetch_page(page):
+            # 生成时间戳
+            timestamp = int(time.time() * 1000)
+            api_url = API_URL_TEMPLATES[period].format(
+                board_type=BOARD_TYPES[board_type],
+                timestamp=timestamp,
+                page=page,
+                page_size=PAGE_SIZE
+            )
+            response = http_client.get(api_url, headers=headers, timeout=10)
+            if response.status_code != 200:
+                raise ValueError(f"Primary API request failed with status {response.status_code}")
+            data = parse_jsonp(response.text)
             if data.get('rc') == 0 and data.get('data') and data['data'].get('diff'):
-                result_data = data['data']['diff']
-                logger.info(f"Successfully fetched real data from API for {board_type}, period: {period}")
+                return diff_items(data['data']['diff']), data['data'].get('total') or 0
+            return [], 0
+        
+        result_data = fetch_all_pages(fetch_page, PAGE_SIZE, key=lambda item: item.get('f12'))
+        if result_data:
+            logger.info(f"Successfully fetched real data from API for {board_type}, period: {period}")
+            with metrics.timer('fund_flow_parse_seconds', parser='real'):
                 parsed_data = parse_real_data(result_data, board_type, period)
-                
-                # 检查10日数据是否有效（主力流入不为0）
-                if period == "10days" and parsed_data:
-                    total_inflow = sum(item.get('main_inflow', 0) for item in parsed_data[:5])
-                    if total_inflow < 1000000:  # 如果前5名总流入小于100万，认为数据无效
-                        logger.warning(f"10days data seems invalid (total inflow: {total_inflow}), will try backup API")
-                        return []
-                
-                return parsed_data
-            else:
-                logger.warning(f"Primary API returned no data for {board_type}, period: {period}")
-                return []
+            return parsed_data
         else:
-            logger.error(f"Primary API request failed with status {response.status_code}")
+            logger.warning(f"Primary API returned no data for {board_type}, period: {period}")
             return []
             
     except Exception as e:
         logger.error(f"Error fetching primary data: {str(e)}")
         return []
 
-def parse_real_data(data_list, board_type, period="today"):
-    """解析从东方财富API获取的真实数据"""
-    parsed_data = []
+# 成分股的金额字段（元）和百分比字段
+STOCK_AMOUNT_FIELDS = {
+    'main_inflow': 'f62', 'super_large_inflow': 'f66', 'large_inflow': 'f72',
+    'medium_inflow': 'f78', 'small_inflow': 'f84'
+}
+STOCK_PERCENT_FIELDS = {
+    'change_percent': 'f3', 'main_inflow_percent': 'f184', 'super_large_inflow_percent': 'f69',
+    'large_inflow_percent': 'f75', 'medium_inflow_percent': 'f81', 'small_inflow_percent': 'f87'
+}
+
+def parse_stock_data(items):
+    """向量化解析板块成分股，金额换算为亿元（保留4位小数，个股的金额较小），按主力净流入从大到小排序"""
+    texts = fast_parse.records(items, ['f12', 'f14'], ['', ''])
+    keys = list(STOCK_AMOUNT_FIELDS.values()) + list(STOCK_PERCENT_FIELDS.values()) + ['f2']
+    values = fast_parse.float_matrix(items, keys, [0] * len(keys), safe_float_conversion)
+    numbers = fast_parse.scale(values[:, :-1], len(STOCK_AMOUNT_FIELDS), 4)
+    prices = values[:, -1]
     
-    # 定义不同时间周期的字段映射
-    field_mappings = {
-        "today": {
-            "net_inflow": "f62",
-            "net_inflow_percent": "f184", 
-            "main_inflow": "f66",
-            "main_inflow_percent": "f69",
-            "super_large_inflow": "f72",
-            "super_large_inflow_percent": "f75",
-            "large_inflow": "f78",
-            "large_inflow_percent": "f81",
-            "medium_inflow": "f84",
-            "medium_inflow_percent": "f87"
-        },
-        "5days": {
-            "net_inflow": "f267",
-            "net_inflow_percent": "f268",
-            "main_inflow": "f269", 
-            "main_inflow_percent": "f270",
-            "super_large_inflow": "f271",
-            "super_large_inflow_percent": "f272",
-            "large_inflow": "f273",
-            "large_inflow_percent": "f274",
-            "medium_inflow": "f275",
-            "medium_inflow_percent": "f276"
-        },
-        "10days": {
-            "net_inflow": "f160",
-            "net_inflow_percent": "f161",
-            "main_inflow": "f160",
-            "main_inflow_percent": "f161",
-            "super_large_inflow": "f162",
-            "super_large_inflow_percent": "f163",
-            "large_inflow": "f164",
-            "large_inflow_percent": "f165",
-            "medium_inflow": "f166",
-            "medium_inflow_percent": "f167"
+    order = fast_parse.descending_order(numbers[:, list(STOCK_AMOUNT_FIELDS).index('main_inflow')])
+    if order is not None:
+        numbers = numbers[order]
+        prices = prices[order]
+        texts = [texts[i] for i in order.tolist()]
+    rows = [
+        {
+            'code': code,
+            'name': name,
+            'price': price,
+            'change_percent': change_percent,
+            'main_inflow_percent': main_inflow_percent,
+            'super_large_inflow_percent': super_large_inflow_percent,
+            'large_inflow_percent': large_inflow_percent,
+            'medium_inflow_percent': medium_inflow_percent,
+            'small_inflow_percent': small_inflow_percent,
+            'main_inflow': main_inflow,
+            'super_large_inflow': super_large_inflow,
+            'large_inflow': large_inflow,
+            'medium_inflow': medium_inflow,
+            'small_inflow': small_inflow
         }
-    }
+        for (code, name), price,
+            (main_inflow, super_large_inflow, large_inflow, medium_inflow, small_inflow,
+             change_percent, main_inflow_percent, super_large_inflow_percent, large_inflow_percent,
+             medium_inflow_percent, small_inflow_percent) in zip(texts, prices.tolist(), numbers.tolist())
+    ]
+    if order is None:
+        rows.sort(key=lambda x: x['main_inflow'], reverse=True)
+    return rows
+
+def fetch_board_stocks(board_id):
+    """从主API抓取一个板块全部成分股的今日资金流
+    
+    Returns:
+        按主力净流入排序的成分股列表，板块不存在时为空列表
+    
+    Raises:
+        接口请求失败时抛出异常，由调用方决定是否沿用旧数据
+    """
+    headers = get_headers()
+    headers['Referer'] = 'https://data.eastmoney.com/'
+    
+    def fetch_page(page):
+        api_url = STOCK_LIST_URL_TEMPLATE.format(
+            board_id=board_id,
+            timestamp=int(time.time() * 1000),
+            page=page,
+            page_size=PAGE_SIZE
+        )
+        response = http_client.get(api_url, headers=headers, timeout=10)
+        if response.status_code != 200:
+            raise ValueError(f"Stock list request failed with status {response.status_code}")
+        data = parse_jsonp(response.text)
+        if data.get('rc') == 0 and data.get('data') and data['data'].get('diff'):
+            return diff_items(data['data']['diff']), data['data'].get('total') or 0
+        return [], 0
+    
+    start = time.perf_counter()
+    items = fetch_all_pages(fetch_page, PAGE_SIZE, key=lambda item: item.get('f12'))
+    # 成分股按板块抓取，板块数没有上限，不按板块区分标签
+    metrics.observe('fund_flow_upstream_seconds', time.perf_counter() - start, source='stocks', combo='stocks')
+    metrics.inc('fund_flow_upstream_total', source='stocks', outcome='ok' if items else 'empty')
+    with metrics.timer('fund_flow_parse_seconds', parser='stocks'):
+        stocks = parse_stock_data([item for item in items if isinstance(item, dict)])
+    logger.info(f"Fetched {len(stocks)} constituent stocks for board {board_id}")
+    return stocks
+
+def parse_real_data_rowwise(data_list, board_type, period="today"):
+    """逐行解析从东方财富API获取的真实数据（向量化解析的参考实现和回退路径）"""
+    parsed_data = []
     
     # 获取当前周期的字段映射
-    fields = field_mappings.get(period, field_mappings["today"])
+    fields = REAL_FIELD_MAPPINGS.get(period, REAL_FIELD_MAPPINGS["today"])
     
     # 处理字典或列表格式的数据
     if isinstance(data_list, dict):
@@ -310,9 +569,6 @@ def parse_real_data(data_list, board_type, period="today"):
         return []
     
     for i, item in enumerate(items):
-        if i >= 20:  # 只取前20条
-            break
-            
         try:
             if not isinstance(item, dict):
                 logger.warning(f"Item {i} is not a dict: {type(item)}")
@@ -351,8 +607,8 @@ def parse_real_data(data_list, board_type, period="today"):
                 "rank": i + 1  # 排名
             }
             
-            # 添加调试日志
-            logger.info(f"[{i}] 板块: {item.get('f14')}, 主力: {main_inflow}, 超大单: {super_large_inflow}")
+            # 添加调试日志（全量数据有数百条，只在调试级别输出）
+            logger.debug(f"[{i}] 板块: {item.get('f14')}, 主力: {main_inflow}, 超大单: {super_large_inflow}")
             
             parsed_data.append(parsed_item)
             
@@ -368,6 +624,79 @@ def parse_real_data(data_list, board_type, period="today"):
     
     return parsed_data
 
+def parse_real_data(data_list, board_type, period="today"):
+    """解析从东方财富API获取的真实数据
+    
+    先把diff列表按字段取成列，一次性完成数值转换、换算亿元、四舍五入和排序，
+    结果与 parse_real_data_rowwise 完全一致；向量化失败时退回逐行解析。
+    """
+    fields = REAL_FIELD_MAPPINGS.get(period, REAL_FIELD_MAPPINGS["today"])
+    
+    # 处理字典或列表格式的数据
+    if isinstance(data_list, dict):
+        logger.info(f"Processing dict with {len(data_list)} items from API")
+        items = list(data_list.values())
+    elif isinstance(data_list, list):
+        logger.info(f"Processing list with {len(data_list)} items from API")
+        items = data_list
+    else:
+        logger.error(f"Unexpected data type: {type(data_list)}")
+        return []
+    
+    try:
+        # 排名按原始位置计算，非字典的条目被跳过但仍占一个名次
+        positions = [i for i, item in enumerate(items) if isinstance(item, dict)]
+        rows = items if len(positions) == len(items) else [items[i] for i in positions]
+        
+        texts = fast_parse.records(rows, ['f12', 'f14', 'f204', 'f205'], ['', '未知板块', '', ''])
+        amount_keys = [fields[name] for name in REAL_AMOUNT_COLUMNS]
+        percent_keys = ['f3'] + [fields[f"{name}_percent"] for name in REAL_AMOUNT_COLUMNS]
+        keys = amount_keys + percent_keys
+        values = fast_parse.float_matrix(rows, keys, [0] * len(keys), safe_float_conversion)
+        numbers = fast_parse.scale(values, len(amount_keys), 2)
+        
+        # 按主力净流入排序（从大到小）
+        order = fast_parse.descending_order(numbers[:, REAL_AMOUNT_COLUMNS.index('main_inflow')])
+        if order is not None:
+            numbers = numbers[order]
+            order = order.tolist()
+            texts = [texts[i] for i in order]
+            positions = [positions[i] for i in order]
+        parsed_data = [
+            {
+                "id": board_id,
+                "name": name,
+                "change_percent": change_percent,
+                "net_inflow": net_inflow,
+                "net_inflow_percent": net_inflow_percent,
+                "main_inflow": main_inflow,
+                "main_inflow_percent": main_inflow_percent,
+                "super_large_inflow": super_large_inflow,
+                "super_large_inflow_percent": super_large_inflow_percent,
+                "large_inflow": large_inflow,
+                "large_inflow_percent": large_inflow_percent,
+                "medium_inflow": medium_inflow,
+                "medium_inflow_percent": medium_inflow_percent,
+                "stock_name": stock_name,
+                "stock_code": stock_code,
+                "stock_change_percent": change_percent,
+                "rank": position + 1
+            }
+            for (board_id, name, stock_name, stock_code), position,
+                (net_inflow, main_inflow, super_large_inflow, large_inflow, medium_inflow,
+                 change_percent, net_inflow_percent, main_inflow_percent, super_large_inflow_percent,
+                 large_inflow_percent, medium_inflow_percent) in zip(texts, positions, numbers.tolist())
+        ]
+        logger.info(f"Successfully parsed {len(parsed_data)} items")
+        if order is None:
+            parsed_data.sort(key=lambda x: x.get('main_inflow', 0), reverse=True)
+        logger.info("Data sorted by main_inflow (descending)")
+    except Exception as e:
+        logger.warning(f"Vectorized parse failed ({str(e)}), falling back to row-wise parse")
+        return parse_real_data_rowwise(data_list, board_type, period)
+    
+    return parsed_data
+
 def get_data(board_type="industry", period="today"):
     """获取指定类型和周期的板块资金流数据"""
     # 尝试获取真实数据，如果失败则回退到模拟数据
@@ -998,44 +1327,126 @@ def get_mock_data(board_type="industry", period="today"):
         
         return base_data
 
-def cache_data():
-    """抓取数据并缓存到文件"""
+def _fetch_combo(board_type, period):
+    """抓取单个板块/周期组合，返回数据和耗时（秒）"""
+    start = time.perf_counter()
+    data = get_data(board_type, period)
+    seconds = time.perf_counter() - start
+    metrics.observe('fund_flow_combo_seconds', seconds, combo=f"{board_type}/{period}")
+    return data, seconds
+
+def _submit_combos(combos, max_workers):
+    """提交本轮要刷新的组合，上一轮超时的组合沿用它的抓取（仍在运行或已经完成但结果还没用过）"""
+    with _refresh_lock:
+        executor = _refresh_executors.get(max_workers)
+        if executor is None:
+            executor = _refresh_executors[max_workers] = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix='refresh')
+        futures = {}
+        for board_type, period in combos:
+            future = _combo_futures.get((board_type, period))
+            if future is None:
+                future = _combo_futures[(board_type, period)] = executor.submit(_fetch_combo, board_type, period)
+            elif future.done():
+                logger.info(f"Using the result of {board_type} {period} that finished after the previous cycle")
+            else:
+                logger.info(f"Refresh of {board_type} {period} from the previous cycle is still running, waiting for it")
+            futures[future] = (board_type, period)
+        return futures
+
+def _release_combos(futures):
+    """本轮已经使用了结果的抓取不再保留，下一轮重新提交"""
+    with _refresh_lock:
+        for future, combo in futures.items():
+            if _combo_futures.get(combo) is future:
+                del _combo_futures[combo]
+
+def get_refresh_stats():
+    """获取最近一轮刷新的耗时统计"""
+    return dict(last_refresh_stats)
+
+def cache_data(previous=None, max_workers=None, deadline=None, combos=None):
+    """并发抓取板块/周期组合并缓存到文件
+    
+    Args:
+        previous: 上一轮的缓存数据，超过截止时间未完成或本轮不刷新的组合沿用旧数据
+        max_workers: 并发线程数上限，默认使用 REFRESH_MAX_WORKERS
+        deadline: 单轮刷新截止时间（秒），默认使用 REFRESH_DEADLINE
+        combos: 本轮刷新的 (board_type, period) 列表，默认刷新全部组合
+    """
+    global last_refresh_stats
+    
     try:
         logger.info("Starting data cache process")
         cached_data = {}
+        max_workers = max_workers or REFRESH_MAX_WORKERS
+        deadline = deadline or REFRESH_DEADLINE
         
         # 抓取行业板块数据
         board_types = ['industry', 'concept']
         periods = ['today', '5days', '10days']
+        all_combos = [(board_type, period) for board_type in board_types for period in periods]
+        combos = [combo for combo in all_combos if combos is None or combo in combos]
         
-        for board_type in board_types:
-            cached_data[board_type] = {}
-            for period in periods:
-                logger.info(f"Caching data for {board_type}, period: {period}")
-                try:
-                    data = get_data(board_type, period)
-                    cached_data[board_type][period] = data
-                except Exception as e:
-                    logger.error(f"Error caching {board_type} {period} data: {str(e)}")
-                    cached_data[board_type][period] = []
+        # 本轮不刷新的组合沿用上一轮的数据
+        for board_type, period in all_combos:
+            if (board_type, period) not in combos:
+                cached_data.setdefault(board_type, {})[period] = (previous or {}).get(board_type, {}).get(period) or []
         
-        # 保存到文件
-        try:
-            # 尝试使用云存储模块
+        # 每个组合的主API -> 备用API -> 模拟数据回退链在各自的线程中并行执行
+        http_before = http_client.get_stats()
+        cycle_start = time.perf_counter()
+        futures = _submit_combos(combos, max_workers)
+        # 超时的组合本轮沿用旧数据，抓取在池中继续，下一轮直接取它的结果
+        wait(futures, timeout=deadline)
+        cycle_seconds = time.perf_counter() - cycle_start
+        metrics.observe('fund_flow_refresh_cycle_seconds', cycle_seconds)
+        
+        # 本轮不刷新的组合保留上一次的统计
+        combo_stats = dict(last_refresh_stats.get('combos', {}))
+        consumed = {}
+        for future, (board_type, period) in futures.items():
+            cached_data.setdefault(board_type, {})
+            key = f"{board_type}/{period}"
+            if not future.done():
+                logger.warning(f"Refresh of {board_type} {period} missed the {deadline}s deadline, keeping previous data")
+                old_data = (previous or {}).get(board_type, {}).get(period)
+                cached_data[board_type][period] = old_data or []
+                combo_stats[key] = {'status': 'timeout', 'seconds': None, 'rows': len(old_data or [])}
+                continue
+            consumed[future] = (board_type, period)
             try:
-                from cloud_storage import save_cache_to_cloud
-                if save_cache_to_cloud(cached_data):
-                    logger.info("Data cached to cloud storage")
-                else:
-                    # 如果云存储失败，回退到本地文件
-                    with open('data_cache.json', 'w', encoding='utf-8') as f:
-                        json.dump(cached_data, f, ensure_ascii=False, indent=2)
-                    logger.info("Data cached at " + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-            except ImportError:
-                # 如果没有云存储模块，使用本地文件
-                with open('data_cache.json', 'w', encoding='utf-8') as f:
-                    json.dump(cached_data, f, ensure_ascii=False, indent=2)
-                logger.info("Data cached at " + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                data, seconds = future.result()
+                cached_data[board_type][period] = data
+                combo_stats[key] = {'status': 'ok', 'seconds': round(seconds, 3), 'rows': len(data),
+                                    'source': last_sources.get(key)}
+                logger.info(f"Cached data for {board_type}, period: {period} in {seconds:.2f}s")
+            except Exception as e:
+                logger.error(f"Error caching {board_type} {period} data: {str(e)}")
+                cached_data[board_type][period] = []
+                combo_stats[key] = {'status': 'error', 'seconds': None, 'rows': 0}
+        _release_combos(consumed)
+        
+        # 顺序执行时的耗时为各组合耗时之和，用来衡量并发节省的时间
+        sequential_seconds = sum(combo_stats[f"{board_type}/{period}"]['seconds'] or 0
+                                 for board_type, period in combos)
+        last_refresh_stats = {
+            'finished_at': datetime.datetime.now().isoformat(),
+            'max_workers': max_workers,
+            'deadline': deadline,
+            'cycle_seconds': round(cycle_seconds, 3),
+            'sequential_seconds': round(sequential_seconds, 3),
+            'saved_seconds': round(max(sequential_seconds - cycle_seconds, 0), 3),
+            'refreshed': [f"{board_type}/{period}" for board_type, period in combos],
+            'combos': combo_stats,
+            'http': http_client.diff_stats(http_before, http_client.get_stats())
+        }
+        logger.info(f"Refresh cycle took {cycle_seconds:.2f}s (sequential would take {sequential_seconds:.2f}s)")
+        
+        # 交给后台线程原子地写入文件，不阻塞下一轮刷新
+        try:
+            from cloud_storage import save_cache_async
+            save_cache_async(cached_data)
         except Exception as e:
             logger.error(f"Error saving cache file: {str(e)}")
         
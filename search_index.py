@@ -0,0 +1,245 @@
+"""
+板块/股票名称搜索索引：支持名称和代码的前缀匹配、名称的子串匹配以及拼音首字母匹配，供输入联想使用
+
+索引在每轮刷新发布快照时更新，只处理新增、删除或改名的条目，名称不变的板块不会重新计算。
+索引按来源分组（快照中的板块和领涨股、各板块的成分股），同一条目可以来自多个分组，
+所有分组都删除它时才从索引中移除。
+
+安装 pypinyin 时用它计算拼音首字母（能正确处理多音字），否则按GB2312一级汉字的
+拼音排序区间推算，二级汉字没有首字母。
+"""
+import logging
+import threading
+from bisect import bisect_left, insort
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:
+    lazy_pinyin = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# GB2312一级汉字按拼音排序，每个首字母对应的起始编码
+_GB2312_INITIALS = [
+    (0xB0A1, 'a'), (0xB0C5, 'b'), (0xB2C1, 'c'), (0xB4EE, 'd'), (0xB6EA, 'e'),
+    (0xB7A2, 'f'), (0xB8C1, 'g'), (0xB9FE, 'h'), (0xBBF7, 'j'), (0xBFA6, 'k'),
+    (0xC0AC, 'l'), (0xC2E8, 'm'), (0xC4C3, 'n'), (0xC5B6, 'o'), (0xC5BE, 'p'),
+    (0xC6DA, 'q'), (0xC8BB, 'r'), (0xC8F6, 's'), (0xCBFA, 't'), (0xCDDA, 'w'),
+    (0xCEF4, 'x'), (0xD1B9, 'y'), (0xD4D1, 'z')
+]
+_GB2312_CODES = [code for code, _ in _GB2312_INITIALS]
+_GB2312_LEVEL1_END = 0xD7F9
+# 板块名称中常见多音字的读音（GB2312按其他读音排序）
+_POLYPHONE_INITIALS = {'行': 'h', '藏': 'z', '调': 't'}
+
+# 匹配方式，结果按这个顺序排列：完全匹配、名称前缀、代码前缀、首字母前缀、名称或代码子串
+EXACT, NAME_PREFIX, CODE_PREFIX, INITIALS_PREFIX, SUBSTRING = range(5)
+MATCH_NAMES = ('exact', 'prefix', 'code', 'initials', 'substring')
+
+_lock = threading.Lock()
+# key -> 条目 {'type', 'id', 'name', 'initials'}
+_docs = {}
+# key -> 提供该条目的分组集合
+_owners = {}
+# 分组 -> {key: 条目}
+_groups = {}
+# 前缀匹配用的有序列表，每种匹配方式一个：(小写的名称/代码/首字母, key)
+_terms = {NAME_PREFIX: [], CODE_PREFIX: [], INITIALS_PREFIX: []}
+# 子串匹配用的倒排表：字符 -> key集合
+_chars = {}
+
+def _char_initial(char):
+    """不使用pypinyin时推算一个字符的拼音首字母"""
+    if char in _POLYPHONE_INITIALS:
+        return _POLYPHONE_INITIALS[char]
+    if char.isascii():
+        return char.lower() if char.isalnum() else ''
+    try:
+        encoded = char.encode('gb2312')
+    except UnicodeEncodeError:
+        return ''
+    if len(encoded) != 2:
+        return ''
+    code = (encoded[0] << 8) | encoded[1]
+    if code < _GB2312_CODES[0] or code >= _GB2312_LEVEL1_END:
+        return ''
+    return _GB2312_INITIALS[bisect_left(_GB2312_CODES, code + 1) - 1][1]
+
+def pinyin_initials(name):
+    """名称的拼音首字母（小写），例如 银行 -> yh，字母和数字原样保留"""
+    if not name:
+        return ''
+    if lazy_pinyin is not None:
+        letters = []
+        for part in lazy_pinyin(name, style=Style.FIRST_LETTER, errors=lambda chars: list(chars)):
+            letters.append(part.lower() if part.isascii() and part.isalnum() else '')
+        return ''.join(letters)
+    return ''.join(_char_initial(char) for char in name)
+
+def make_doc(kind, doc_id, name):
+    """生成一个索引条目，kind 为 industry/concept/stock"""
+    return {'type': kind, 'id': str(doc_id), 'name': name or '', 'initials': pinyin_initials(name or '')}
+
+def _doc_terms(key, doc):
+    terms = []
+    if doc['name']:
+        terms.append((NAME_PREFIX, (doc['name'].lower(), key)))
+    if doc['id']:
+        terms.append((CODE_PREFIX, (doc['id'].lower(), key)))
+    if doc['initials']:
+        terms.append((INITIALS_PREFIX, (doc['initials'], key)))
+    return terms
+
+def _add(key, doc):
+    _docs[key] = doc
+    for match, term in _doc_terms(key, doc):
+        insort(_terms[match], term)
+    for char in set(doc['name'].lower()) | set(doc['id'].lower()):
+        _chars.setdefault(char, set()).add(key)
+
+def _remove(key):
+    doc = _docs.pop(key)
+    for match, term in _doc_terms(key, doc):
+        terms = _terms[match]
+        position = bisect_left(terms, term)
+        if position < len(terms) and terms[position] == term:
+            del terms[position]
+    for char in set(doc['name'].lower()) | set(doc['id'].lower()):
+        keys = _chars.get(char)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _chars[char]
+
+def sync(group, docs):
+    """用一个分组的最新条目更新索引，只处理新增、删除和内容变化的条目
+
+    Args:
+        group: 分组名，例如 'snapshot'、'stocks:BK0477'
+        docs: {key: make_doc(...) 的结果}
+
+    Returns:
+        变化的条目数
+    """
+    changed = 0
+    with _lock:
+        old_docs = _groups.get(group, {})
+        for key in old_docs.keys() - docs.keys():
+            owners = _owners[key]
+            owners.discard(group)
+            if not owners:
+                del _owners[key]
+                _remove(key)
+                changed += 1
+        for key, doc in docs.items():
+            current = _docs.get(key)
+            if current != doc:
+                if current is not None:
+                    _remove(key)
+                _add(key, doc)
+                changed += 1
+            _owners.setdefault(key, set()).add(group)
+        if docs:
+            _groups[group] = dict(docs)
+        else:
+            _groups.pop(group, None)
+    return changed
+
+def snapshot_docs(current_snapshot):
+    """从快照中收集所有板块和领涨股的条目，同一板块在各个周期中只出现一次
+
+    用到的代码和名称字段在原始数据中与转换后相同，这里读取原始数据，
+    worker读取共享快照时不会因此转换全部行。
+    """
+    docs = {}
+    for (board_type, _period), entry in current_snapshot['entries'].items():
+        for row in entry['raw']:
+            board_id = row.get('id')
+            if board_id:
+                key = f"{board_type}:{board_id}"
+                if key not in docs:
+                    docs[key] = make_doc(board_type, board_id, row.get('name'))
+            stock_code = row.get('stock_code')
+            if stock_code:
+                key = f"stock:{stock_code}"
+                if key not in docs:
+                    docs[key] = make_doc('stock', stock_code, row.get('stock_name'))
+    return docs
+
+def update_from_snapshot(current_snapshot):
+    """快照发布后更新索引中的板块和领涨股"""
+    if not current_snapshot:
+        return 0
+    try:
+        changed = sync('snapshot', snapshot_docs(current_snapshot))
+        if changed:
+            logger.info(f"Search index updated: {changed} entries changed, {len(_docs)} total")
+        return changed
+    except Exception as e:
+        logger.error(f"Failed to update search index: {str(e)}")
+        return 0
+
+def _scan_prefix(terms, q, match, results, limit, kind, exact_only=False):
+    """在有序列表中二分定位q，按字典序向后收集以q开头的条目，结果够数时提前结束"""
+    position = bisect_left(terms, (q,))
+    while position < len(terms) and len(results) < limit:
+        term, key = terms[position]
+        if exact_only and term != q or not term.startswith(q):
+            break
+        if key not in results and (kind is None or _docs[key]['type'] == kind):
+            results[key] = match
+        position += 1
+
+def search(query, limit=DEFAULT_LIMIT, kind=None):
+    """搜索名称、代码和拼音首字母
+
+    Args:
+        query: 关键字，不区分大小写
+        limit: 最多返回的条数
+        kind: 只返回某一类条目（industry/concept/stock），为None时不限
+
+    Returns:
+        条目列表，依次为完全匹配、名称前缀、代码前缀、首字母前缀和子串匹配，每条带 'match' 字段
+    """
+    q = (query or '').strip().lower()
+    if not q or limit <= 0:
+        return []
+    # key -> 匹配方式，按插入顺序就是结果顺序
+    results = {}
+    with _lock:
+        _scan_prefix(_terms[NAME_PREFIX], q, EXACT, results, limit, kind, exact_only=True)
+        _scan_prefix(_terms[CODE_PREFIX], q, EXACT, results, limit, kind, exact_only=True)
+        for match in (NAME_PREFIX, CODE_PREFIX, INITIALS_PREFIX):
+            _scan_prefix(_terms[match], q, match, results, limit, kind)
+
+        if len(results) < limit:
+            # 子串：用包含q中最少见字符的条目作为候选，再逐个确认
+            candidates = None
+            for char in set(q):
+                keys = _chars.get(char)
+                if not keys:
+                    candidates = ()
+                    break
+                if candidates is None or len(keys) < len(candidates):
+                    candidates = keys
+            found = []
+            for key in candidates or ():
+                if key in results:
+                    continue
+                doc = _docs[key]
+                if (kind is None or doc['type'] == kind) and (q in doc['name'].lower() or q in doc['id'].lower()):
+                    found.append((len(doc['name']), doc['id'], key))
+            found.sort()
+            for _, _, key in found[:limit - len(results)]:
+                results[key] = SUBSTRING
+
+        return [dict(_docs[key], match=MATCH_NAMES[match]) for key, match in results.items()]
+
+def get_stats():
+    """索引规模"""
+    with _lock:
+        return {'entries': len(_docs), 'terms': sum(len(terms) for terms in _terms.values()), 'groups': len(_groups),
+                'pinyin': 'pypinyin' if lazy_pinyin is not None else 'gb2312'}
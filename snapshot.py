@@ -0,0 +1,335 @@
+"""
+数据快照模块：每轮刷新后一次性完成字段转换和JSON序列化，
+API请求直接返回快照中保存好的字节，不再逐条转换数据。
+
+主进程把快照写成共享文件，其他worker用 load_shared() 以内存映射方式读取，
+各种预先序列化和压缩好的响应体直接引用映射的页面，多个进程共用同一份物理内存。
+读取时不转换行数据，只有排序、过滤、分页、导出等需要逐行数据的请求才在第一次用到时生成。
+"""
+import json
+import gzip
+import mmap
+import time
+import struct
+import hashlib
+import datetime
+import logging
+import threading
+
+import numpy as np
+
+import packed_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 新字段名 -> 前端期望的老字段名
+FIELD_MAPPING = {
+    'main_inflow': 'main_net_inflow',
+    'main_inflow_percent': 'main_net_ratio',
+    'super_large_inflow': 'super_net_inflow',
+    'super_large_inflow_percent': 'super_net_ratio',
+    'stock_name': 'top_stock'
+}
+
+# 需要格式化为百分比字符串的字段
+PERCENT_FIELDS = ['change_percent', 'main_net_ratio', 'super_net_ratio']
+
+# 支持服务端排序的字段，每个快照条目预先计算好这些字段的升序和降序行顺序
+SORT_FIELDS = [
+    'main_inflow', 'main_inflow_percent',
+    'super_large_inflow', 'super_large_inflow_percent',
+    'large_inflow', 'large_inflow_percent',
+    'medium_inflow', 'medium_inflow_percent',
+    'net_inflow', 'net_inflow_percent',
+    'change_percent'
+]
+# 前端使用的老字段名也可以作为排序字段
+SORT_ALIASES = {old_field: new_field for new_field, old_field in FIELD_MAPPING.items() if new_field in SORT_FIELDS}
+# 参与关键字过滤的字段
+SEARCH_FIELDS = ['id', 'name', 'stock_name', 'stock_code']
+
+# brotli最高压缩级别（11）对几百KB的数据需要数百毫秒，超过这个大小时改用较低的级别
+BROTLI_MAX_QUALITY_BYTES = 64 * 1024
+BROTLI_LARGE_QUALITY = 9
+
+def convert_item(item):
+    """将一条抓取结果转换为前端使用的格式"""
+    converted_item = item.copy()
+
+    # 保留原字段，同时增加老字段名以确保兼容性
+    for new_field, old_field in FIELD_MAPPING.items():
+        if new_field in converted_item:
+            converted_item[old_field] = converted_item[new_field]
+
+    # 格式化百分比字段为字符串（前端期望字符串格式）
+    for field in PERCENT_FIELDS:
+        if field in converted_item and isinstance(converted_item[field], (int, float)):
+            converted_item[field] = f"{converted_item[field] * 100:.2f}%"
+
+    return converted_item
+
+def convert_data(raw_data):
+    """转换一个板块/周期组合的全部数据"""
+    return [convert_item(item) for item in raw_data]
+
+def serialize(data):
+    """将数据序列化为紧凑的UTF-8 JSON字节"""
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def compress_variants(body):
+    """预先生成gzip/brotli压缩版本，只保留比原始数据更小的版本"""
+    variants = {}
+    # mtime固定为0，保证相同内容压缩结果一致
+    gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(gzip_body) < len(body):
+        variants['gzip'] = gzip_body
+    if brotli is not None:
+        quality = 11 if len(body) <= BROTLI_MAX_QUALITY_BYTES else BROTLI_LARGE_QUALITY
+        br_body = brotli.compress(body, mode=brotli.MODE_TEXT, quality=quality)
+        if len(br_body) < len(body):
+            variants['br'] = br_body
+    return variants
+
+def _sort_value(value):
+    """排序使用的数值，无法转换时返回NaN"""
+    if isinstance(value, bool) or value is None:
+        return float('nan')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+def build_index(raw_data):
+    """预先计算各排序字段的行顺序和关键字过滤用的文本
+
+    Returns:
+        {'orders': {字段: {'desc': 下标数组, 'asc': 下标数组}}, 'search_text': [每行的小写文本]}
+        排序是稳定的，无法解析的值在两个方向上都排在最后
+    """
+    orders = {}
+    for field in SORT_FIELDS:
+        keys = np.array([_sort_value(item.get(field)) for item in raw_data], dtype=np.float64)
+        missing = np.isnan(keys)
+        orders[field] = {
+            'desc': np.argsort(np.where(missing, np.inf, -keys), kind='stable'),
+            'asc': np.argsort(np.where(missing, np.inf, keys), kind='stable')
+        }
+    search_text = [' '.join(str(item.get(field) or '') for field in SEARCH_FIELDS).lower()
+                   for item in raw_data]
+    return {'orders': orders, 'search_text': search_text}
+
+def query_entry(entry, sort=None, order='desc', q=None, offset=0, limit=None):
+    """按排序字段、关键字和分页参数从快照条目中取出一页数据
+
+    排序使用预先计算的行顺序，每次请求只需要过滤和切片。
+
+    Returns:
+        (本页的行列表, 过滤后的总行数)
+    """
+    rows = entry['rows']
+    index = entry['index']
+    if sort:
+        indices = index['orders'][SORT_ALIASES.get(sort, sort)][order]
+    else:
+        # 不指定排序字段时使用快照本身的顺序（主力净流入降序）
+        indices = np.arange(len(rows))
+        if order == 'asc':
+            indices = indices[::-1]
+    if q:
+        q = q.lower()
+        search_text = index['search_text']
+        indices = [i for i in indices.tolist() if q in search_text[i]]
+    total = len(indices)
+    end = None if limit is None else offset + limit
+    page = indices[offset:end]
+    if not isinstance(page, list):
+        page = page.tolist()
+    return [rows[i] for i in page], total
+
+def content_hash(body):
+    """计算序列化数据的内容哈希，用作ETag"""
+    return hashlib.sha1(body).hexdigest()
+
+def build_snapshot(raw_cache, previous=None, sources=None):
+    """根据 cache_data() 的结果构建快照
+
+    每个条目带有内容哈希、版本号和最后修改时间。内容与上一个快照相同的条目
+    沿用旧的版本号和修改时间，客户端的缓存校验因此可以继续命中。
+
+    Args:
+        raw_cache: {board_type: {period: [原始数据]}} 结构的缓存数据
+        previous: 上一个快照，用于生成递增的版本号
+        sources: {"board_type/period": 数据源} 各组合实际使用的数据源（primary/backup/mock）
+
+    Returns:
+        包含版本号、生成时间以及每个 (board_type, period) 条目的字典
+    """
+    # 使用毫秒时间戳作为版本号，重启后也不会与旧版本号重复
+    version = int(time.time() * 1000)
+    if previous and version <= previous['version']:
+        version = previous['version'] + 1
+    # HTTP日期精确到秒，这里直接去掉微秒便于和 If-Modified-Since 比较
+    created_at = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+    entries = {}
+    for board_type, periods in (raw_cache or {}).items():
+        if not isinstance(periods, dict):
+            continue
+        for period, raw_data in periods.items():
+            if not isinstance(raw_data, list):
+                continue
+            rows = convert_data(raw_data)
+            body = serialize(rows)
+            etag = content_hash(body)
+
+            old_entry = get_entry(previous, board_type, period)
+            if old_entry is not None and old_entry['etag'] == etag:
+                entry_version = old_entry['version']
+                last_modified = old_entry['last_modified']
+                # 内容没有变化，沿用已经压缩好的版本和排序索引
+                encoded = old_entry['encoded']
+                index = old_entry['index']
+            else:
+                entry_version = version
+                last_modified = created_at
+                encoded = compress_variants(body)
+                index = build_index(raw_data)
+
+            entries[(board_type, period)] = {
+                'raw': raw_data,
+                'rows': rows,
+                'body': body,
+                'encoded': encoded,
+                'etag': etag,
+                'version': entry_version,
+                'last_modified': last_modified,
+                'index': index,
+                'source': (sources or {}).get(f"{board_type}/{period}")
+            }
+
+    logger.info(f"Built snapshot {version} with {len(entries)} entries")
+    return {
+        'version': version,
+        'created_at': created_at,
+        'entries': entries
+    }
+
+def get_entry(snapshot, board_type, period):
+    """从快照中取出指定组合的条目，不存在时返回None"""
+    if not snapshot:
+        return None
+    return snapshot['entries'].get((board_type, period))
+
+# ---- 多进程共享的快照文件 ----
+
+SHARED_MAGIC = b'FFSNAP01'
+
+class _SharedEntry(dict):
+    """共享快照中的条目：rows 和 index 在第一次访问时才由原始数据生成
+
+    直接返回完整数据的请求只用到预先序列化的响应体，worker读取新快照时不必为每个组合
+    转换全部行并计算排序索引。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def __missing__(self, key):
+        builders = {'rows': convert_data, 'index': build_index}
+        if key not in builders:
+            raise KeyError(key)
+        with self._lock:
+            if not dict.__contains__(self, key):
+                self[key] = builders[key](self['raw'])
+                logger.debug(f"Built {key} for {self['board_type']} {self['period']} on first use")
+            return dict.__getitem__(self, key)
+
+def dump_shared(snapshot, raw_cache, meta=None):
+    """把快照编码为共享文件的内容
+
+    文件结构：8字节魔数 | 4字节头部长度 | JSON头部 | 数据区。
+    数据区依次存放原始数据（packed_cache格式）和每个条目的响应体，头部记录它们的偏移和长度。
+    """
+    blob = bytearray()
+
+    def add(data):
+        blob.extend(b'\0' * (-len(blob) % packed_cache.ALIGNMENT))
+        offset = len(blob)
+        blob.extend(data)
+        return [offset, len(data)]
+
+    entries = []
+    for (board_type, period), entry in snapshot['entries'].items():
+        entries.append({
+            'board_type': board_type,
+            'period': period,
+            'etag': entry['etag'],
+            'version': entry['version'],
+            'last_modified': entry['last_modified'].isoformat(),
+            'body': add(entry['body']),
+            'encoded': {encoding: add(body) for encoding, body in entry['encoded'].items()},
+            'source': entry.get('source')
+        })
+
+    header = {
+        'version': snapshot['version'],
+        'created_at': snapshot['created_at'].isoformat(),
+        'meta': meta or {},
+        'raw': add(packed_cache.pack(raw_cache)),
+        'entries': entries
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    prefix = SHARED_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes
+    # 数据区和其中每一段都按8字节对齐，内嵌的packed_cache数组可以直接映射
+    padding = -len(prefix) % packed_cache.ALIGNMENT
+    return prefix + b'\0' * padding + bytes(blob)
+
+def load_shared(path):
+    """以内存映射方式读取共享快照文件
+
+    Returns:
+        (snapshot, raw_cache, meta)；响应体是指向映射内存的memoryview
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    if bytes(view[:len(SHARED_MAGIC)]) != SHARED_MAGIC:
+        raise ValueError("Not a shared snapshot file")
+    (header_size,) = struct.unpack('<I', bytes(view[len(SHARED_MAGIC):len(SHARED_MAGIC) + 4]))
+    header_start = len(SHARED_MAGIC) + 4
+    header = json.loads(bytes(view[header_start:header_start + header_size]).decode('utf-8'))
+    base = header_start + header_size
+    base += -base % packed_cache.ALIGNMENT
+
+    def part(location):
+        offset, size = location
+        return view[base + offset:base + offset + size]
+
+    raw_cache = packed_cache.unpack(part(header['raw']))
+    entries = {}
+    for item in header['entries']:
+        board_type, period = item['board_type'], item['period']
+        entries[(board_type, period)] = _SharedEntry({
+            'board_type': board_type,
+            'period': period,
+            'raw': raw_cache.get(board_type, {}).get(period, []),
+            'body': part(item['body']),
+            'encoded': {encoding: part(location) for encoding, location in item['encoded'].items()},
+            'etag': item['etag'],
+            'version': item['version'],
+            'last_modified': datetime.datetime.fromisoformat(item['last_modified']),
+            'source': item.get('source')
+        })
+
+    snapshot = {
+        'version': header['version'],
+        'created_at': datetime.datetime.fromisoformat(header['created_at']),
+        'entries': entries
+    }
+    return snapshot, raw_cache, header['meta']
@@ -0,0 +1,118 @@
+"""
+数据源健康状态和熔断
+
+按 (数据源, 板块/周期组合) 记录最近 SOURCE_HEALTH_WINDOW 次抓取的成败和耗时。
+窗口内失败比例达到 CIRCUIT_ERROR_RATE 时熔断（open），之后的刷新直接跳过这个数据源；
+冷却 CIRCUIT_PROBE_SECONDS 秒后放行一次探测（half_open），探测成功恢复（closed），
+失败则继续熔断并把冷却时间加倍，最长 CIRCUIT_PROBE_MAX 秒。
+
+例如主接口持续超时或返回错误时，熔断后每轮刷新不再先白白等待主接口，而是直接使用备用接口。
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+SOURCE_HEALTH_WINDOW = int(os.environ.get('SOURCE_HEALTH_WINDOW', '20'))
+CIRCUIT_ERROR_RATE = float(os.environ.get('CIRCUIT_ERROR_RATE', '0.5'))
+CIRCUIT_MIN_SAMPLES = int(os.environ.get('CIRCUIT_MIN_SAMPLES', '3'))
+CIRCUIT_PROBE_SECONDS = float(os.environ.get('CIRCUIT_PROBE_SECONDS', '300'))
+CIRCUIT_PROBE_MAX = float(os.environ.get('CIRCUIT_PROBE_MAX', '3600'))
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+# 指标中的熔断状态取值
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# (数据源, 组合) -> 状态
+_states = {}
+_lock = threading.Lock()
+
+def _state(source, combo):
+    key = (source, combo)
+    state = _states.get(key)
+    if state is None:
+        state = _states[key] = {
+            'window': deque(maxlen=SOURCE_HEALTH_WINDOW),
+            'status': CLOSED,
+            'opened_at': None,
+            'cooldown': CIRCUIT_PROBE_SECONDS
+        }
+    return state
+
+def allow(source, combo, now=None):
+    """本次刷新是否应该请求这个数据源
+
+    熔断中的数据源在冷却时间过后放行一次探测，探测结果记录之前不再放行。
+    """
+    now = time.monotonic() if now is None else now
+    with _lock:
+        state = _state(source, combo)
+        if state['status'] == CLOSED:
+            return True
+        if state['status'] == OPEN and now >= state['opened_at'] + state['cooldown']:
+            state['status'] = HALF_OPEN
+            logger.info(f"Probing {source} for {combo} after {state['cooldown']:.0f}s cooldown")
+            return True
+        return False
+
+def _open(state, source, combo, now):
+    state['status'] = OPEN
+    state['opened_at'] = now
+    logger.warning(f"Circuit for {source} {combo} opened, skipping it for {state['cooldown']:.0f}s")
+
+def record(source, combo, ok, seconds, now=None):
+    """记录一次抓取的结果（ok为False表示异常或返回空数据）"""
+    now = time.monotonic() if now is None else now
+    with _lock:
+        state = _state(source, combo)
+        window = state['window']
+        window.append((ok, seconds))
+        if state['status'] == HALF_OPEN:
+            if ok:
+                state['status'] = CLOSED
+                state['opened_at'] = None
+                state['cooldown'] = CIRCUIT_PROBE_SECONDS
+                # 恢复后重新开始统计，熔断前的失败不再计入
+                window.clear()
+                window.append((ok, seconds))
+                logger.info(f"Circuit for {source} {combo} closed after a successful probe")
+            else:
+                state['cooldown'] = min(state['cooldown'] * 2, CIRCUIT_PROBE_MAX)
+                _open(state, source, combo, now)
+        elif state['status'] == CLOSED and len(window) >= CIRCUIT_MIN_SAMPLES:
+            failures = sum(1 for success, _ in window if not success)
+            if failures / len(window) >= CIRCUIT_ERROR_RATE:
+                _open(state, source, combo, now)
+
+def _summary(state, now):
+    window = state['window']
+    samples = len(window)
+    retry_in = None
+    if state['status'] == OPEN:
+        retry_in = round(max(state['opened_at'] + state['cooldown'] - now, 0), 1)
+    return {
+        'state': state['status'],
+        'samples': samples,
+        'error_rate': round(sum(1 for ok, _ in window if not ok) / samples, 3) if samples else 0.0,
+        'avg_seconds': round(sum(seconds for _, seconds in window) / samples, 3) if samples else None,
+        'retry_in': retry_in
+    }
+
+def get_status():
+    """所有数据源的健康状态：{组合: {数据源: {...}}}"""
+    now = time.monotonic()
+    with _lock:
+        status = {}
+        for (source, combo), state in sorted(_states.items()):
+            status.setdefault(combo, {})[source] = _summary(state, now)
+        return status
+
+def reset():
+    """清空所有状态（用于测试和基准脚本）"""
+    with _lock:
+        _states.clear()
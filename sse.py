@@ -0,0 +1,275 @@
+"""
+Server-Sent Events 推送模块
+
+每次发布新快照时只序列化一次事件，然后广播给所有订阅者。订阅连接有两种承载方式：
+1. 独立的事件循环服务器（设置 SSE_PORT 后启动）：单个线程用 selectors 管理全部空闲连接，
+   不占用 waitress/gunicorn 的工作线程，可以承载数千个客户端；
+2. Flask 路由 /api/stream：没有独立端口时使用，同时在线的数量和单次连接时长都有上限，
+   超过上限时返回503，前端退回到轮询。每个连接占用一个工作线程，只在多线程的WSGI服务器
+   （gunicorn gthread、waitress）下可用；gunicorn默认的sync worker只有一个线程，
+   一个连接就会让其他请求全部排队直到worker超时，所以此时直接返回503。
+"""
+import os
+import json
+import time
+import socket
+import logging
+import selectors
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 心跳间隔（秒），防止代理断开空闲连接
+HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', '15'))
+# 客户端断线后的重连等待时间（毫秒）
+RETRY_MILLISECONDS = int(os.environ.get('SSE_RETRY_MILLISECONDS', '5000'))
+# 独立服务器的最大连接数，以及单个慢客户端允许积压的字节数
+MAX_CLIENTS = int(os.environ.get('SSE_MAX_CLIENTS', '5000'))
+MAX_CLIENT_BUFFER = 64 * 1024
+# Flask路由方式的并发上限和单次连接的最长时间（秒），到时后浏览器会自动重连；
+# 连接时长要小于gunicorn的worker超时（默认30秒）
+INLINE_MAX_CLIENTS = int(os.environ.get('SSE_INLINE_MAX_CLIENTS', '2'))
+INLINE_MAX_SECONDS = float(os.environ.get('SSE_INLINE_MAX_SECONDS', '25'))
+
+HEARTBEAT = b": ping\n\n"
+
+_condition = threading.Condition()
+_event_id = 0
+_latest_payload = None
+_inline_clients = 0
+_inline_lock = threading.Lock()
+
+# 独立服务器的唤醒管道，发布事件时写入一个字节通知事件循环
+_wake_reader = None
+_wake_writer = None
+_server_thread = None
+
+def format_event(event_id, event_type, data):
+    """按SSE格式编码一个事件"""
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event_type}\ndata: {body}\n\n".encode('utf-8')
+
+def publish(event_type, data):
+    """发布事件：只序列化一次，然后唤醒所有订阅者"""
+    global _event_id, _latest_payload
+    with _condition:
+        _event_id += 1
+        _latest_payload = format_event(_event_id, event_type, data)
+        _condition.notify_all()
+
+    if _wake_writer is not None:
+        try:
+            _wake_writer.send(b'x')
+        except (BlockingIOError, OSError):
+            # 管道已满说明事件循环还没处理上一次唤醒，它会读取最新事件
+            pass
+
+def _latest_since(last_event_id):
+    """返回客户端尚未收到的最新事件，没有则返回None"""
+    with _condition:
+        if _latest_payload is None or str(_event_id) == str(last_event_id):
+            return None
+        return _latest_payload
+
+def acquire_inline_slot():
+    """占用一个Flask路由方式的推送名额，名额已满时返回False"""
+    global _inline_clients
+    with _inline_lock:
+        if _inline_clients >= INLINE_MAX_CLIENTS:
+            return False
+        _inline_clients += 1
+        return True
+
+def release_inline_slot():
+    """释放Flask路由方式的推送名额"""
+    global _inline_clients
+    with _inline_lock:
+        _inline_clients = max(_inline_clients - 1, 0)
+
+def stream_events(last_event_id=None):
+    """Flask路由使用的事件生成器，所有连接共享同一个条件变量等待新事件"""
+    yield f"retry: {RETRY_MILLISECONDS}\n\n".encode('utf-8')
+
+    seen = last_event_id
+    deadline = time.monotonic() + INLINE_MAX_SECONDS
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        with _condition:
+            if _latest_payload is None or str(_event_id) == str(seen):
+                # 等待不能越过截止时间，保证连接在worker超时之前结束
+                _condition.wait(timeout=min(HEARTBEAT_SECONDS, remaining))
+            event_id, payload = _event_id, _latest_payload
+
+        if payload is not None and str(event_id) != str(seen):
+            seen = event_id
+            yield payload
+        else:
+            yield HEARTBEAT
+
+# ---- 独立的事件循环服务器 ----
+
+class _Client:
+    """事件循环中的一个连接"""
+    __slots__ = ('sock', 'inbuf', 'outbuf', 'streaming', 'closing')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = b''
+        self.outbuf = b''
+        self.streaming = False
+        self.closing = False
+
+def _parse_request(raw):
+    """解析请求行和请求头，返回 (path, headers)"""
+    lines = raw.decode('latin-1').split('\r\n')
+    parts = lines[0].split(' ')
+    path = parts[1] if len(parts) >= 2 else ''
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return path, headers
+
+def _serve_loop(listener):
+    """单线程事件循环：接受连接、解析请求、广播事件和心跳"""
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ, 'accept')
+    selector.register(_wake_reader, selectors.EVENT_READ, 'wake')
+    clients = {}
+    last_sent_id = None
+    last_heartbeat = time.monotonic()
+
+    def close(client):
+        clients.pop(client.sock, None)
+        try:
+            selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+
+    def flush(client):
+        try:
+            while client.outbuf:
+                sent = client.sock.send(client.outbuf)
+                client.outbuf = client.outbuf[sent:]
+        except BlockingIOError:
+            pass
+        except OSError:
+            close(client)
+            return
+        if not client.outbuf and client.closing:
+            close(client)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbuf else 0)
+        selector.modify(client.sock, events, client)
+
+    def send(client, payload):
+        client.outbuf += payload
+        if len(client.outbuf) > MAX_CLIENT_BUFFER:
+            # 客户端读取太慢，断开连接，浏览器会自动重连
+            close(client)
+            return
+        flush(client)
+
+    def handle_request(client):
+        path, headers = _parse_request(client.inbuf.split(b'\r\n\r\n', 1)[0])
+        client.inbuf = b''
+        if not path.split('?', 1)[0].rstrip('/').endswith('/api/stream'):
+            client.closing = True
+            send(client, b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            return
+        client.streaming = True
+        head = (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream; charset=utf-8\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: keep-alive\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            "X-Accel-Buffering: no\r\n\r\n"
+            f"retry: {RETRY_MILLISECONDS}\n\n"
+        ).encode('utf-8')
+        send(client, head + (_latest_since(headers.get('last-event-id')) or b''))
+
+    while True:
+        for key, mask in selector.select(timeout=HEARTBEAT_SECONDS):
+            if key.data == 'accept':
+                try:
+                    conn, _ = listener.accept()
+                except (BlockingIOError, OSError):
+                    continue
+                if len(clients) >= MAX_CLIENTS:
+                    conn.close()
+                    continue
+                conn.setblocking(False)
+                client = _Client(conn)
+                clients[conn] = client
+                selector.register(conn, selectors.EVENT_READ, client)
+            elif key.data == 'wake':
+                try:
+                    _wake_reader.recv(4096)
+                except BlockingIOError:
+                    pass
+                with _condition:
+                    event_id, payload = _event_id, _latest_payload
+                if payload is not None and event_id != last_sent_id:
+                    last_sent_id = event_id
+                    for client in list(clients.values()):
+                        if client.streaming:
+                            send(client, payload)
+            else:
+                client = key.data
+                if client.sock not in clients:
+                    continue
+                if mask & selectors.EVENT_READ:
+                    try:
+                        data = client.sock.recv(4096)
+                    except BlockingIOError:
+                        data = None
+                    except OSError:
+                        data = b''
+                    if data == b'':
+                        close(client)
+                        continue
+                    if data and not client.streaming:
+                        client.inbuf += data
+                        if b'\r\n\r\n' in client.inbuf:
+                            handle_request(client)
+                        elif len(client.inbuf) > 8192:
+                            close(client)
+                            continue
+                if mask & selectors.EVENT_WRITE and client.sock in clients:
+                    flush(client)
+
+        now = time.monotonic()
+        if now - last_heartbeat >= HEARTBEAT_SECONDS:
+            last_heartbeat = now
+            for client in list(clients.values()):
+                if client.streaming:
+                    send(client, HEARTBEAT)
+
+def start_server(host, port):
+    """在后台线程中启动独立的SSE服务器，端口被占用时返回False"""
+    global _wake_reader, _wake_writer, _server_thread
+    if _server_thread is not None:
+        return True
+
+    try:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((host, port))
+        listener.listen(512)
+        listener.setblocking(False)
+    except OSError as e:
+        logger.error(f"Failed to start SSE server on {host}:{port}: {str(e)}")
+        return False
+
+    _wake_reader, _wake_writer = socket.socketpair()
+    _wake_reader.setblocking(False)
+    _wake_writer.setblocking(False)
+    _server_thread = threading.Thread(target=_serve_loop, args=(listener,), daemon=True, name='sse-server')
+    _server_thread.start()
+    logger.info(f"SSE server listening on {host}:{port}")
+    return True
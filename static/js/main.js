@@ -1,9 +1,19 @@
 // 全局变量
 let currentDataType = 'industry'; // 'industry' 或 'concept'
 let currentPeriod = 'today';      // 'today', '5days', 或 '10days'
-let currentData = [];             // 当前显示的数据
+let currentData = [];             // 当前页显示的数据
+let currentSort = 'main_inflow';  // 服务端排序字段
+let currentOrder = 'desc';        // 排序方向：'desc' 或 'asc'
+let currentQuery = '';            // 搜索关键字（服务端过滤）
+let currentPage = 0;              // 当前页码（从0开始）
+let currentTotal = 0;             // 过滤后的总条数
+const PAGE_SIZE = 20;             // 每页条数
+let suggestTimer = null;          // 输入联想的防抖定时器
 let autoRefreshTimer = null;      // 自动刷新计时器
 let lastUpdateCheckTimer = null;  // 最后更新时间检查计时器
+let responseCache = {};           // 按请求地址缓存的数据及其ETag/Last-Modified
+let eventSource = null;           // 服务器推送连接
+let streamConnected = false;      // 推送连接是否可用
 
 // 统一的金额格式化函数，支持负值高亮
 function formatBillion(value) {
@@ -47,8 +57,8 @@ $(document).ready(function() {
     // 绑定事件处理函数
     bindEvents();
     
-    // 启动自动检查最后更新时间
-    startUpdateTimeCheck();
+    // 订阅服务器推送，不支持时退回到轮询
+    connectStream();
 });
 
 // 测试API连通性
@@ -76,6 +86,7 @@ function bindEvents() {
         $('#timeRangeTab a').removeClass('active');
         $(this).addClass('active');
         currentPeriod = $(this).data('period');
+        currentPage = 0;
         console.log("切换时间周期:", currentPeriod);
         loadData();
     });
@@ -83,6 +94,7 @@ function bindEvents() {
     // 板块类型切换
     $('#industryBtn').on('click', function() {
         currentDataType = 'industry';
+        currentPage = 0;
         $(this).addClass('active').removeClass('btn-outline-secondary').addClass('btn-secondary');
         $('#conceptBtn').removeClass('active').removeClass('btn-secondary').addClass('btn-outline-secondary');
         console.log("切换到行业板块");
@@ -91,6 +103,7 @@ function bindEvents() {
     
     $('#conceptBtn').on('click', function() {
         currentDataType = 'concept';
+        currentPage = 0;
         $(this).addClass('active').removeClass('btn-outline-secondary').addClass('btn-secondary');
         $('#industryBtn').removeClass('active').removeClass('btn-secondary').addClass('btn-outline-secondary');
         console.log("切换到概念板块");
@@ -116,6 +129,15 @@ function bindEvents() {
         }
     });
     
+    // 输入联想：按名称、代码或拼音首字母从服务器搜索当前类型的板块
+    $('#searchInput').on('input', function() {
+        clearTimeout(suggestTimer);
+        const query = $(this).val().trim();
+        suggestTimer = setTimeout(function() {
+            loadSuggestions(query);
+        }, 150);
+    });
+    
     // 表格排序
     $('.sortable').on('click', function() {
         const sortField = $(this).data('sort');
@@ -123,6 +145,27 @@ function bindEvents() {
         sortData(sortField);
     });
     
+    // 点击板块名称展开/收起成分股
+    $('#tableBody').on('click', '.board-link', function(e) {
+        e.preventDefault();
+        toggleBoardStocks($(this).closest('tr'), $(this).data('id'));
+    });
+    
+    // 翻页
+    $('#prevPage').on('click', function() {
+        if (currentPage > 0) {
+            currentPage--;
+            loadData();
+        }
+    });
+    
+    $('#nextPage').on('click', function() {
+        if ((currentPage + 1) * PAGE_SIZE < currentTotal) {
+            currentPage++;
+            loadData();
+        }
+    });
+    
     // 自动刷新设置
     $('#autoRefreshCheck').on('change', function() {
         if ($(this).prop('checked')) {
@@ -156,30 +199,83 @@ function bindEvents() {
     });
 }
 
-// 加载数据
+// 当前板块类型对应的API端点
+function currentEndpoint() {
+    return currentDataType === 'industry' ? '/api/industry_data' : '/api/concept_data';
+}
+
+// 当前页的查询参数：排序、过滤和分页都由服务器完成
+function currentParams() {
+    const params = {
+        period: currentPeriod,
+        sort: currentSort,
+        order: currentOrder,
+        offset: currentPage * PAGE_SIZE,
+        limit: PAGE_SIZE
+    };
+    if (currentQuery) {
+        params.q = currentQuery;
+    }
+    return params;
+}
+
+// 当前页在本地缓存中的键
+function currentCacheKey() {
+    return `${currentEndpoint()}?${$.param(currentParams())}`;
+}
+
+// 加载当前页数据
 function loadData() {
-    // 显示加载指示器
-    $('#tableBody').html('<tr><td colspan="8" class="text-center">加载中...</td></tr>');
-    
     // 根据当前数据类型选择API端点
-    const endpoint = currentDataType === 'industry' ? '/api/industry_data' : '/api/concept_data';
-    console.log(`正在从 ${endpoint} 加载数据，时间周期: ${currentPeriod}`);
+    const endpoint = currentEndpoint();
+    const params = currentParams();
+    const cacheKey = currentCacheKey();
+    const cached = responseCache[cacheKey];
+    console.log(`正在从 ${endpoint} 加载数据，时间周期: ${currentPeriod}，第 ${currentPage + 1} 页`);
+    
+    // 没有本地缓存时显示加载指示器
+    if (!cached) {
+        $('#tableBody').html('<tr><td colspan="8" class="text-center">加载中...</td></tr>');
+    }
+    
+    // 带上缓存校验头，数据未变化时服务器返回304
+    const headers = {};
+    if (cached && cached.etag) {
+        headers['If-None-Match'] = cached.etag;
+    }
+    if (cached && cached.lastModified) {
+        headers['If-Modified-Since'] = cached.lastModified;
+    }
     
     // 发送AJAX请求
     $.ajax({
         url: endpoint,
         method: 'GET',
-        data: { period: currentPeriod },
+        data: params,
         dataType: 'json',
-        success: function(data) {
-            console.log(`成功加载数据，共 ${data ? data.length : 0} 条记录`);
+        headers: headers,
+        success: function(page, textStatus, xhr) {
+            if (xhr.status === 304 && cached) {
+                console.log("数据未变化，使用本地缓存");
+                page = cached.page;
+            } else {
+                console.log(`成功加载数据，本页 ${page && page.rows ? page.rows.length : 0} 条，共 ${page ? page.total : 0} 条`);
+                responseCache[cacheKey] = {
+                    etag: xhr.getResponseHeader('ETag'),
+                    lastModified: xhr.getResponseHeader('Last-Modified'),
+                    version: page ? page.version : null,
+                    page: page
+                };
+            }
             
             // 保存数据并渲染表格
-            if (data && Array.isArray(data)) {
-                currentData = data;
-                renderTable(currentData);
+            if (page && Array.isArray(page.rows)) {
+                currentData = page.rows;
+                currentTotal = page.total;
+                renderTable(currentData, page.offset);
+                renderPager();
             } else {
-                console.error("加载的数据不是数组:", data);
+                console.error("加载的数据格式错误:", page);
                 $('#tableBody').html('<tr><td colspan="8" class="text-center text-danger">数据格式错误</td></tr>');
             }
             
@@ -193,11 +289,12 @@ function loadData() {
     });
 }
 
-// 渲染表格
-function renderTable(data) {
+// 渲染表格，offset为本页第一行的序号偏移
+function renderTable(data, offset) {
     console.log("开始渲染表格");
     const tbody = $('#tableBody');
     tbody.empty();
+    offset = offset || 0;
     
     // 没有数据时显示提示
     if (!data || data.length === 0) {
@@ -206,17 +303,17 @@ function renderTable(data) {
         return;
     }
     
-    // 限制显示前20条数据
-    const displayData = data.slice(0, 20);
-    console.log(`显示前 ${displayData.length} 条数据`);
-    
-    displayData.forEach((item, index) => {
+    data.forEach((item, index) => {
         try {
             const tr = $('<tr></tr>');
             
             // 构建表格行
-            tr.append(`<td>${index + 1}</td>`);
-            tr.append(`<td>${item.name || '未知'}</td>`);
+            tr.append(`<td>${offset + index + 1}</td>`);
+            if (item.id) {
+                tr.append(`<td><a href="#" class="board-link" data-id="${item.id}">${item.name || '未知'}</a></td>`);
+            } else {
+                tr.append(`<td>${item.name || '未知'}</td>`);
+            }
             
             // 涨跌幅 - 根据正负值添加颜色
             const changePercent = formatPercent(item.change_percent);
@@ -245,33 +342,81 @@ function renderTable(data) {
             
             tbody.append(tr);
         } catch (e) {
-            console.error(`渲染第 ${index + 1} 行数据时出错:`, e, item);
+            console.error(`渲染第 ${offset + index + 1} 行数据时出错:`, e, item);
         }
     });
     
     console.log("表格渲染完成");
 }
 
-// 过滤数据
-function filterData() {
-    const searchTerm = $('#searchInput').val().toLowerCase().trim();
-    console.log(`执行过滤，搜索词: "${searchTerm}"`);
-    
-    if (!searchTerm) {
-        renderTable(currentData);
+// 展开或收起板块的成分股（主力净流入前10名）
+function toggleBoardStocks(tr, boardId) {
+    const next = tr.next('.stock-detail');
+    if (next.length) {
+        next.remove();
         return;
     }
+    const detail = $('<tr class="stock-detail"><td colspan="8" class="text-center">加载中...</td></tr>');
+    tr.after(detail);
     
-    const filteredData = currentData.filter(item => 
-        (item.name && item.name.toLowerCase().includes(searchTerm)) || 
-        (item.top_stock && item.top_stock.toLowerCase().includes(searchTerm))
-    );
-    
-    console.log(`过滤后数据: ${filteredData.length} 条记录`);
-    renderTable(filteredData);
+    $.getJSON(`/api/board/${boardId}/stocks`, { limit: 10 }, function(data) {
+        if (!data.stocks || data.stocks.length === 0) {
+            detail.find('td').text('暂无成分股数据');
+            return;
+        }
+        const table = $('<table class="table table-sm mb-0"><thead><tr><th>代码</th><th>名称</th><th>最新价</th><th>涨跌幅(%)</th><th>主力净流入</th><th>超大单净流入</th></tr></thead><tbody></tbody></table>');
+        data.stocks.forEach(stock => {
+            const changeClass = stock.change_percent >= 0 ? 'positive' : 'negative';
+            const main = formatBillionWithClass(stock.main_inflow);
+            const superLarge = formatBillionWithClass(stock.super_large_inflow);
+            table.find('tbody').append(`<tr><td>${stock.code}</td><td>${stock.name}</td><td>${stock.price}</td>` +
+                `<td class="${changeClass}">${formatPercent(stock.change_percent)}</td>` +
+                `<td class="${main.className}">${main.value}亿</td>` +
+                `<td class="${superLarge.className}">${superLarge.value}亿</td></tr>`);
+        });
+        detail.find('td').removeClass('text-center').empty().append(table)
+            .append(`<div class="text-muted small">共 ${data.total} 只成分股，按主力净流入排序</div>`);
+    }).fail(function() {
+        detail.find('td').addClass('text-danger').text('成分股加载失败，请稍后重试');
+    });
+}
+
+// 渲染翻页控件
+function renderPager() {
+    const pages = Math.max(1, Math.ceil(currentTotal / PAGE_SIZE));
+    $('#pageInfo').text(`第 ${currentPage + 1} / ${pages} 页，共 ${currentTotal} 条`);
+    $('#prevPage').prop('disabled', currentPage === 0);
+    $('#nextPage').prop('disabled', (currentPage + 1) * PAGE_SIZE >= currentTotal);
 }
 
-// 排序数据
+// 过滤数据：关键字交给服务器过滤，从第一页开始显示
+function filterData() {
+    currentQuery = $('#searchInput').val().trim();
+    currentPage = 0;
+    console.log(`执行过滤，搜索词: "${currentQuery}"`);
+    loadData();
+}
+
+// 加载输入联想的候选项
+function loadSuggestions(query) {
+    const list = $('#searchSuggestions');
+    if (!query) {
+        list.empty();
+        return;
+    }
+    $.getJSON('/api/search', { q: query, type: currentDataType, limit: 10 }, function(results) {
+        // 输入已经变化时丢弃过期的结果
+        if ($('#searchInput').val().trim() !== query) {
+            return;
+        }
+        list.empty();
+        results.forEach(item => {
+            list.append($('<option></option>').attr('value', item.name).text(item.id));
+        });
+    });
+}
+
+// 排序数据：由服务器按预先计算好的顺序返回
 function sortData(field) {
     // 查找当前排序列和方向
     const th = $(`.sortable[data-sort="${field}"]`);
@@ -286,46 +431,10 @@ function sortData(field) {
     
     console.log(`按字段 ${field} 排序，方向: ${isAsc ? '升序' : '降序'}`);
     
-    // 执行排序
-    try {
-        currentData.sort((a, b) => {
-            let valA, valB;
-            
-            // 映射新旧字段名
-            let actualField = field;
-            if (field === 'main_net_inflow') {
-                actualField = 'main_inflow';
-            } else if (field === 'main_net_ratio') {
-                actualField = 'main_inflow_percent';
-            } else if (field === 'super_net_inflow') {
-                actualField = 'super_large_inflow';
-            } else if (field === 'super_net_ratio') {
-                actualField = 'super_large_inflow_percent';
-            }
-            
-            if (typeof a[actualField] === 'string' && a[actualField].includes('%')) {
-                valA = parseFloat(a[actualField].replace('%', '')) || 0;
-            } else {
-                valA = a[actualField] || 0;
-            }
-            
-            if (typeof b[actualField] === 'string' && b[actualField].includes('%')) {
-                valB = parseFloat(b[actualField].replace('%', '')) || 0;
-            } else {
-                valB = b[actualField] || 0;
-            }
-            
-            if (isAsc) {
-                return valA - valB;
-            } else {
-                return valB - valA;
-            }
-        });
-        
-        renderTable(currentData);
-    } catch (e) {
-        console.error(`排序时出错:`, e);
-    }
+    currentSort = field;
+    currentOrder = isAsc ? 'asc' : 'desc';
+    currentPage = 0;
+    loadData();
 }
 
 // 启动自动刷新
@@ -334,6 +443,12 @@ function startAutoRefresh() {
     
     stopAutoRefresh();
     
+    // 推送连接可用时由服务器通知触发刷新，不需要定时轮询
+    if (streamConnected) {
+        console.log("推送连接可用，自动刷新由服务器推送触发");
+        return;
+    }
+    
     console.log(`启动自动刷新，间隔: ${interval}ms`);
     autoRefreshTimer = setInterval(() => {
         loadData();
@@ -374,10 +489,87 @@ function startUpdateTimeCheck() {
     console.log("启动自动检查最后更新时间，间隔: 60秒");
 }
 
-// 页面关闭时清理定时器
-$(window).on('beforeunload', function() {
-    stopAutoRefresh();
+// 停止自动检查最后更新时间
+function stopUpdateTimeCheck() {
     if (lastUpdateCheckTimer) {
         clearInterval(lastUpdateCheckTimer);
+        lastUpdateCheckTimer = null;
+    }
+}
+
+// 启动轮询（推送不可用时使用）
+function startPolling() {
+    stopUpdateTimeCheck();
+    startUpdateTimeCheck();
+    if ($('#autoRefreshCheck').prop('checked')) {
+        startAutoRefresh();
+    }
+}
+
+// 停止轮询
+function stopPolling() {
+    stopUpdateTimeCheck();
+    stopAutoRefresh();
+}
+
+// 订阅服务器推送的快照通知
+function connectStream() {
+    const streamUrl = $('body').data('stream-url');
+    if (!window.EventSource || !streamUrl) {
+        console.log("浏览器不支持服务器推送，使用轮询");
+        startPolling();
+        return;
+    }
+    
+    console.log(`订阅服务器推送: ${streamUrl}`);
+    eventSource = new EventSource(streamUrl);
+    
+    eventSource.onopen = function() {
+        console.log("推送连接已建立，停止轮询");
+        streamConnected = true;
+        stopPolling();
+    };
+    
+    eventSource.addEventListener('snapshot', function(e) {
+        try {
+            handleSnapshotEvent(JSON.parse(e.data));
+        } catch (err) {
+            console.error("处理推送消息时出错:", err);
+        }
+    });
+    
+    eventSource.onerror = function() {
+        // 连接被服务器拒绝（例如连接数已满）时浏览器不会重连，退回到轮询
+        if (eventSource.readyState === EventSource.CLOSED) {
+            console.warn("推送连接已关闭，退回到轮询");
+            streamConnected = false;
+            eventSource = null;
+            startPolling();
+        }
+    };
+}
+
+// 处理新快照通知
+function handleSnapshotEvent(event) {
+    console.log(`收到新快照通知，版本: ${event.version}`);
+    $('#lastUpdateTime').text(event.last_update || "未知");
+    
+    if (!$('#autoRefreshCheck').prop('checked')) {
+        return;
+    }
+    
+    // 只有当前查看的数据版本变化时才重新加载当前页
+    const key = `${currentDataType}/${currentPeriod}`;
+    const cached = responseCache[currentCacheKey()];
+    if (!cached || !cached.version || String(event.entries[key]) !== String(cached.version)) {
+        loadData();
+    }
+}
+
+// 页面关闭时清理定时器和推送连接
+$(window).on('beforeunload', function() {
+    stopPolling();
+    if (eventSource) {
+        eventSource.close();
     }
 });
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+向量化解析与逐行解析的一致性测试
+
+用随机生成的接口数据（包含 '-'、空字符串、None、缺失字段、带百分号和千分位的字符串、
+恰好落在四舍五入边界上的金额等）比较 parse_real_data / parse_backup_data 与各自逐行实现的输出，
+按JSON文本逐字比较，连 -0.0 和 0.0、整数和浮点数的差别也会被发现。
+
+直接运行 python test_parse_parity.py 还会输出两种实现的耗时对比。
+"""
+import json
+import random
+import time
+import logging
+
+import fast_parse
+import scraper
+
+logging.disable(logging.CRITICAL)
+
+REAL_FIELDS = sorted({field for fields in scraper.REAL_FIELD_MAPPINGS.values() for field in fields.values()} | {'f3'})
+# 金额字段（元），其余为百分比
+REAL_AMOUNT_FIELDS = {'f62', 'f66', 'f72', 'f78', 'f84', 'f267', 'f269', 'f271', 'f273', 'f275',
+                      'f160', 'f162', 'f164', 'f166'}
+BACKUP_FIELDS = ['CHANGE_RATE', 'MAIN_FORCE_NET', 'MAIN_FORCE_NET_RATE', 'SUPER_NET', 'SUPER_NET_RATE',
+                 'BIG_NET', 'BIG_NET_RATE', 'MID_NET', 'MID_NET_RATE']
+
+def random_value(rng, amount):
+    """生成一个接口字段值，大部分是正常数字，少量是各种异常值"""
+    roll = rng.random()
+    if roll < 0.70:
+        return round(rng.uniform(-5e9, 5e9), 2) if amount else round(rng.uniform(-10, 10), 2)
+    if roll < 0.75:
+        # 除以1e8后恰好落在两位小数的.5边界上
+        return (rng.randint(-10 ** 6, 10 ** 6) + 0.5) * 1e6 if amount else rng.randint(-20, 20) + 0.005
+    if roll < 0.80:
+        return rng.randint(-10 ** 10, 10 ** 10) if amount else rng.randint(-10, 10)
+    choices = ['-', '', None, '1,234,567.89', '3.5%', ' 42 ', 'abc', True, 0, -0.0, 1e300, '-0']
+    return rng.choice(choices)
+
+def make_real_items(rng, count, anomalies=True):
+    items = []
+    for i in range(count):
+        item = {'f12': f"BK{i:04d}", 'f14': f"板块{i}", 'f204': f"股票{i}", 'f205': f"{600000 + i}"}
+        for field in REAL_FIELDS:
+            if anomalies and rng.random() < 0.03:
+                continue
+            amount = field in REAL_AMOUNT_FIELDS
+            item[field] = random_value(rng, amount) if anomalies else round(rng.uniform(-5e9, 5e9), 2)
+        if anomalies and rng.random() < 0.02:
+            item.pop('f14', None)
+        items.append(item)
+    if anomalies and count > 3:
+        # 非字典条目会被跳过，但仍占用一个名次
+        items.insert(count // 2, "not a dict")
+        items.insert(1, None)
+    return items
+
+def make_backup_items(rng, count, anomalies=True):
+    items = []
+    for i in range(count):
+        item = {'SECURITY_CODE': f"BK{i:04d}", 'SECURITY_NAME_ABBR': f"板块{i}"}
+        for field in BACKUP_FIELDS:
+            if anomalies and rng.random() < 0.03:
+                continue
+            amount = not field.endswith('RATE')
+            item[field] = random_value(rng, amount) if anomalies else round(rng.uniform(-5e9, 5e9), 2)
+        items.append(item)
+    if anomalies and count > 3:
+        items.insert(count // 2, ["not", "a", "dict"])
+    return items
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False)
+
+def test_real_data_parity():
+    for seed in range(30):
+        rng = random.Random(seed)
+        items = make_real_items(rng, rng.randint(0, 300))
+        for period in ('today', '5days', '10days'):
+            expected = scraper.parse_real_data_rowwise(items, 'industry', period)
+            actual = scraper.parse_real_data(items, 'industry', period)
+            assert dumps(actual) == dumps(expected), f"seed {seed} period {period}"
+
+def test_real_data_dict_diff_parity():
+    rng = random.Random(1234)
+    items = make_real_items(rng, 120)
+    diff = {str(i): item for i, item in enumerate(items)}
+    assert dumps(scraper.parse_real_data(diff, 'concept', 'today')) == \
+        dumps(scraper.parse_real_data_rowwise(diff, 'concept', 'today'))
+
+def test_real_data_nan_sort_parity():
+    rng = random.Random(99)
+    items = make_real_items(rng, 50, anomalies=False)
+    items[3]['f66'] = 'nan'
+    items[10]['f66'] = 'inf'
+    assert dumps(scraper.parse_real_data(items, 'industry', 'today')) == \
+        dumps(scraper.parse_real_data_rowwise(items, 'industry', 'today'))
+
+def test_backup_data_parity():
+    for seed in range(30):
+        rng = random.Random(seed)
+        items = make_backup_items(rng, rng.randint(0, 300))
+        expected = scraper.parse_backup_data_rowwise(items, 'concept', 'today')
+        actual = scraper.parse_backup_data(items, 'concept', 'today')
+        assert dumps(actual) == dumps(expected), f"seed {seed}"
+
+def test_invalid_input_parity():
+    for value in (None, "text", 42):
+        assert scraper.parse_real_data(value, 'industry') == scraper.parse_real_data_rowwise(value, 'industry')
+        assert scraper.parse_backup_data(value, 'industry') == scraper.parse_backup_data_rowwise(value, 'industry')
+
+def measure(function, items, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(items, 'industry', 'today')
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+def print_speedup():
+    """输出板块全量（500条）和个股列表（5000条）规模下两种实现的耗时
+
+    "floor" 是只从diff字典中取出全部字段、再复制一遍输出的行字典（不做任何转换）所需的时间，
+    输入和输出都是字典列表时任何实现都快不过它，最后一列是逐行实现相对它的倍数，即加速比的上限。
+    """
+    rng = random.Random(7)
+    for count in (500, 5000):
+        real_items = make_real_items(rng, count, anomalies=False)
+        backup_items = make_backup_items(rng, count, anomalies=False)
+        real_keys = ['f12', 'f14', 'f204', 'f205', 'f3'] + sorted(set(scraper.REAL_FIELD_MAPPINGS['today'].values()))
+        backup_keys = ['SECURITY_CODE', 'SECURITY_NAME_ABBR'] + BACKUP_FIELDS
+        for name, fast, slow, items, keys in (
+            ('parse_real_data', scraper.parse_real_data, scraper.parse_real_data_rowwise, real_items, real_keys),
+            ('parse_backup_data', scraper.parse_backup_data, scraper.parse_backup_data_rowwise, backup_items,
+             backup_keys),
+        ):
+            slow_ms = measure(slow, items, 5)
+            fast_ms = measure(fast, items, 5)
+            output = fast(items, 'industry', 'today')
+            floor_ms = measure(lambda rows, *args: (fast_parse.records(rows, keys, [0] * len(keys)),
+                                                    list(map(dict, output))), items, 5)
+            print(f"{name:<18} {count:>5} rows: row-wise {slow_ms:8.2f} ms, vectorized {fast_ms:7.2f} ms, "
+                  f"{slow_ms / fast_ms:5.1f}x (floor {floor_ms:6.2f} ms, at most {slow_ms / floor_ms:5.1f}x)")
+
+if __name__ == "__main__":
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")
+    print_speedup()